@@ -12,6 +12,7 @@ import sys
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
 
 from src.model_yield import YieldModel
+from src.preprocessing import decode_predictions, load_contract, preprocess_batch
 
 # Page Configuration
 st.set_page_config(
@@ -67,6 +68,8 @@ st.markdown("""
 </style>
 """, unsafe_allow_html=True)
 
+VISION_MODEL_PATH = "models/leaf_quality_model.h5"
+
 # --- Model Loading ---
 @st.cache_resource
 def load_models():
@@ -81,7 +84,7 @@ def load_models():
 
     # Load Vision Model
     try:
-        vision_model = tf.keras.models.load_model("models/leaf_quality_model.h5")
+        vision_model = tf.keras.models.load_model(VISION_MODEL_PATH)
     except Exception as e:
         st.error(f"Failed to load Vision Model: {e}")
         vision_model = None
@@ -90,17 +93,15 @@ def load_models():
 
 yield_model, vision_model = load_models()
 
+# Scaling and class names saved with the model by src/train_vision.py
+contract = load_contract(VISION_MODEL_PATH)
+
 # --- Preprocessing Helper ---
 def preprocess_image(image):
-    # Resize to 224x224
-    img = image.resize((224, 224))
-    # Convert to array
-    img_array = tf.keras.preprocessing.image.img_to_array(img)
-    # Expand dims to (1, 224, 224, 3)
-    img_array = np.expand_dims(img_array, axis=0)
-    # Preprocess (MobileNetV2: scales to [-1, 1])
-    img_array = tf.keras.applications.mobilenet_v2.preprocess_input(img_array)
-    return img_array
+    # Resize to the model's input size (height, width) and scale as in training
+    height, width = contract["input_size"]
+    img = image.convert("RGB").resize((width, height))
+    return preprocess_batch([np.asarray(img)], contract)
 
 # --- UI Layout ---
 
@@ -134,11 +135,9 @@ with col1:
                 processed_img = preprocess_image(img_input)
                 predictions = vision_model.predict(processed_img)
                 
-                # Class mapping: {'Excellent': 0, 'Moderate': 1, 'Poor': 2}
-                classes = ['Excellent', 'Moderate', 'Poor']
-                class_idx = np.argmax(predictions[0])
-                confidence = np.max(predictions[0])
-                result_class = classes[class_idx]
+                class_names, confidences = decode_predictions(predictions, contract)
+                result_class = class_names[0]
+                confidence = confidences[0]
                 
                 # Designator color
                 color_map = {
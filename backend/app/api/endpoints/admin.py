@@ -0,0 +1,74 @@
+from fastapi import APIRouter, Depends, Header, HTTPException
+from fastapi.responses import FileResponse
+from typing import Optional
+from app.core.config import settings
+from app.services.ml_service import ml_service, ReloadInProgressError
+from app.services.model_registry import UnknownModelVersionError
+from app.services.profiling_service import profile_store
+import hmac
+
+def require_admin_token(x_admin_token: Optional[str] = Header(None)):
+    if not settings.ADMIN_TOKEN:
+        raise HTTPException(status_code=404, detail="Admin endpoints are disabled.")
+    if x_admin_token is None or not hmac.compare_digest(x_admin_token, settings.ADMIN_TOKEN):
+        raise HTTPException(status_code=403, detail="Invalid admin token.")
+
+router = APIRouter(prefix="/admin", dependencies=[Depends(require_admin_token)])
+
+def _models_status():
+    previous = ml_service.previous_bundle
+    return {
+        "serving": ml_service.model_version,
+        # Still loaded and warm, so rollback is instant
+        "previous": previous.version if previous is not None else None,
+        "reload": ml_service.reload_status,
+        "manifest": ml_service.registry.manifest(),
+    }
+
+@router.get("/models")
+async def list_models():
+    """
+    Returns the serving and previous model versions, the state of the last
+    reload and the registry manifest.
+    """
+    return _models_status()
+
+@router.post("/models/reload", status_code=202)
+async def reload_models(version: Optional[str] = None):
+    """
+    Loads a model version (default: the manifest's active version) in the
+    background, warms it and swaps it in. The current version keeps serving
+    until then; poll GET /admin/models for the result.
+    """
+    try:
+        ml_service.reload(version)
+    except UnknownModelVersionError:
+        raise HTTPException(status_code=404, detail=f"Unknown model version '{version}'.")
+    except ReloadInProgressError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    return _models_status()
+
+@router.post("/models/rollback")
+async def rollback_models():
+    """Swaps the previous model version back in."""
+    try:
+        ml_service.rollback()
+    except (ReloadInProgressError, ValueError) as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    return _models_status()
+
+@router.get("/profiles")
+async def list_profiles():
+    """Stored request profiles, newest first."""
+    return {"profiles": profile_store.list()}
+
+@router.get("/profiles/{name}")
+async def download_profile(name: str):
+    """
+    Downloads one profile in folded-stack format; open it in speedscope or
+    render it with flamegraph.pl.
+    """
+    path = profile_store.path(name)
+    if path is None:
+        raise HTTPException(status_code=404, detail="Profile not found.")
+    return FileResponse(path, media_type="text/plain", filename=name)
@@ -1,17 +1,113 @@
-from fastapi import APIRouter, HTTPException, File, UploadFile
+from fastapi import APIRouter, HTTPException, File, UploadFile, Query, Request
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import JSONResponse, StreamingResponse
 from pydantic import BaseModel
-from app.services.ml_service import ml_service
+from typing import List, Literal, Optional
+from app.core.config import settings
+from app.core.metrics import CACHE_HITS, CACHE_MISSES, STAGES
+from app.services.ml_service import ml_service, ModelNotReadyError
 from app.services.cache_service import cache_service
-from app.utils.image_utils import get_image_hash
+from app.services.executor_service import inference_executor, ExecutorOverloadedError
+from app.services.singleflight import inference_flights
+from app.services.near_duplicate_service import near_duplicate_index, dhash
+from app.services.profiling_service import ProfilingRoute
+from app.utils.image_utils import (
+    ArchiveTooLargeError, get_image_hash, is_image_archive, extract_images_from_archive
+)
+from app.utils.preprocessing import InvalidImageError, ImageTooLargeError
+from app.utils.yield_utils import YIELD_FEATURE_COLUMNS, parse_yield_csv, parse_yield_json
+import asyncio
+import io
+import json
+import numpy as np
 import time
 
-router = APIRouter()
+# Profiles opted-in requests; see app/services/profiling_service.py
+router = APIRouter(route_class=ProfilingRoute)
 
 class YieldPredictionRequest(BaseModel):
     avg_quality: float
     temperature: float
     humidity: float
 
+def _cache_key(model_version, image_hash):
+    """Predictions are cached per model version, so a swapped-in model never serves stale results."""
+    return f"{model_version}:{image_hash}"
+
+def _predict_with_near_duplicates(image_bytes, model_version):
+    """
+    Decodes the image and reuses the cached result of a perceptually
+    near-identical image when the index has one; otherwise runs the model.
+    Returns: (class_name, confidence, phash, near_duplicate_of)
+    """
+    img = ml_service.decode_image(image_bytes)
+    phash = dhash(img)
+    match = near_duplicate_index.find(phash)
+    if match is not None:
+        cached_result = cache_service.get(_cache_key(model_version, match[0]))
+        if cached_result:
+            return cached_result["class_name"], cached_result["confidence"], phash, match[0]
+
+    class_name, confidence = ml_service.classify_decoded(img)
+    return class_name, confidence, phash, None
+
+async def _infer_image(image_bytes, image_hash, model_version):
+    """Runs inference for one image and stores the result in the cache."""
+    # Decode and inference run on the inference pool, off the event loop
+    if settings.PHASH_ENABLED:
+        class_name, confidence, phash, near_duplicate_of = await inference_executor.run(
+            _predict_with_near_duplicates, image_bytes, model_version
+        )
+    else:
+        class_name, confidence = await inference_executor.run(ml_service.predict_leaf_quality, image_bytes)
+        phash = near_duplicate_of = None
+
+    result = {
+        "prediction_type": "leaf_quality",
+        "class_name": class_name,
+        "confidence": round(confidence, 4),
+        "image_hash": image_hash,
+        "model_version": model_version
+    }
+    if near_duplicate_of:
+        result["near_duplicate_of"] = near_duplicate_of
+
+    # Save to cache, unless another model version was swapped in while this
+    # image was scored (the result may then come from either version)
+    if ml_service.model_version == model_version:
+        cache_service.set(_cache_key(model_version, image_hash), result)
+        if phash is not None and near_duplicate_of is None:
+            near_duplicate_index.add(phash, image_hash)
+    return result
+
+async def _classify_image(image_bytes, image_hash):
+    """
+    Scores one image, answering from the prediction cache when possible.
+    Identical images already being scored share that inference.
+    Returns: (result, cached)
+    """
+    model_version = ml_service.model_version
+    cache_key = _cache_key(model_version, image_hash)
+    lookup_started = time.perf_counter()
+    cached_result = await cache_service.aget(cache_key)
+    STAGES["cache_lookup"].observe(time.perf_counter() - lookup_started)
+    if cached_result:
+        CACHE_HITS.inc()
+        return cached_result, True
+    CACHE_MISSES.inc()
+
+    result = await inference_flights.do(cache_key, lambda: _infer_image(image_bytes, image_hash, model_version))
+    return result, False
+
+def _invalid_image_status(error):
+    return 413 if isinstance(error, ImageTooLargeError) else 400
+
+def _hash_image(image_bytes):
+    started = time.perf_counter()
+    image_hash = get_image_hash(image_bytes)
+    STAGES["hashing"].observe(time.perf_counter() - started)
+    return image_hash
+
 @router.post("/predict/leaf-quality")
 async def predict_leaf_quality(file: UploadFile = File(...)):
     """
@@ -20,42 +116,166 @@ async def predict_leaf_quality(file: UploadFile = File(...)):
     if not file.content_type.startswith("image/"):
         raise HTTPException(status_code=400, detail="File must be an image.")
     
+    if file.size is not None and file.size > settings.MAX_IMAGE_BYTES:
+        raise HTTPException(status_code=413, detail=f"Image is larger than {settings.MAX_IMAGE_BYTES} bytes.")
+
     start_time = time.time()
+    read_started = time.perf_counter()
     image_bytes = await file.read()
-    image_hash = get_image_hash(image_bytes)
-    
-    # Check cache first
-    cached_result = cache_service.get(image_hash)
-    if cached_result:
-        prediction_time = time.time() - start_time
-        return {
-            **cached_result,
-            "prediction_time": round(prediction_time, 4),
-            "cached": True
-        }
+    STAGES["upload_read"].observe(time.perf_counter() - read_started)
+    image_hash = _hash_image(image_bytes)
     
     try:
-        class_name, confidence = ml_service.predict_leaf_quality(image_bytes)
+        result, cached = await _classify_image(image_bytes, image_hash)
         prediction_time = time.time() - start_time
         
-        result = {
-            "prediction_type": "leaf_quality",
-            "class_name": class_name,
-            "confidence": round(confidence, 4),
-            "image_hash": image_hash
-        }
-        
-        # Save to cache
-        cache_service.set(image_hash, result)
-        
-        return {
+        serialize_started = time.perf_counter()
+        response = JSONResponse({
             **result,
             "prediction_time": round(prediction_time, 4),
-            "cached": False
-        }
+            "cached": cached
+        })
+        STAGES["serialization"].observe(time.perf_counter() - serialize_started)
+        return response
+    except (ExecutorOverloadedError, ModelNotReadyError) as e:
+        raise HTTPException(
+            status_code=503,
+            detail=str(e),
+            headers={"Retry-After": str(e.retry_after)}
+        )
+    except InvalidImageError as e:
+        raise HTTPException(status_code=_invalid_image_status(e), detail=str(e))
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+async def _stream_batch_results(images):
+    """
+    Scores (filename, image_bytes) pairs concurrently and yields one NDJSON
+    line per image in completion order. At most BATCH_MAX_CONCURRENCY images
+    of a request are in the inference pool at once, so a large upload cannot
+    fill the queue by itself; concurrent images still share model batches.
+    """
+    semaphore = asyncio.Semaphore(settings.BATCH_MAX_CONCURRENCY)
+
+    async def score(index, filename, image_bytes):
+        entry = {"index": index, "filename": filename}
+        async with semaphore:
+            start_time = time.time()
+            try:
+                result, cached = await _classify_image(image_bytes, _hash_image(image_bytes))
+            except (ExecutorOverloadedError, ModelNotReadyError) as e:
+                return {**entry, "error": str(e), "status_code": 503, "retry_after": e.retry_after}
+            except InvalidImageError as e:
+                return {**entry, "error": str(e), "status_code": _invalid_image_status(e)}
+            except Exception as e:
+                return {**entry, "error": str(e), "status_code": 500}
+            return {
+                **entry,
+                **result,
+                "prediction_time": round(time.time() - start_time, 4),
+                "cached": cached
+            }
+
+    tasks = [asyncio.ensure_future(score(i, name, data)) for i, (name, data) in enumerate(images)]
+    try:
+        for next_result in asyncio.as_completed(tasks):
+            entry = await next_result
+            serialize_started = time.perf_counter()
+            line = json.dumps(entry) + "\n"
+            STAGES["serialization"].observe(time.perf_counter() - serialize_started)
+            yield line
+    finally:
+        # Client went away mid-stream: stop scoring the rest
+        for task in tasks:
+            task.cancel()
+
+@router.get("/predict/leaf-quality/by-hash/{image_hash}")
+async def predict_leaf_quality_by_hash(image_hash: str):
+    """
+    Hash-first lookup: returns the stored prediction for an image by the
+    SHA-256 hex digest of its bytes, without uploading the image. Answers
+    from the in-memory cache and the persistent cache tier. On 404 the client
+    should upload the image to /predict/leaf-quality.
+    """
+    image_hash = image_hash.lower()
+    if len(image_hash) != 64 or any(c not in "0123456789abcdef" for c in image_hash):
+        raise HTTPException(status_code=400, detail="Hash must be a 64-character SHA-256 hex digest.")
+
+    start_time = time.time()
+    cached_result = await cache_service.aget(_cache_key(ml_service.model_version, image_hash))
+    if not cached_result:
+        CACHE_MISSES.inc()
+        raise HTTPException(status_code=404, detail="No prediction for this image; upload it instead.")
+    CACHE_HITS.inc()
+
+    return {
+        **cached_result,
+        "prediction_time": round(time.time() - start_time, 4),
+        "cached": True
+    }
+
+@router.post("/predict/leaf-quality/batch")
+async def predict_leaf_quality_batch(files: List[UploadFile] = File(...)):
+    """
+    Endpoint to predict leaf quality for many images in one request.
+    Accepts several image files or zip/tar archives of images and streams back
+    one NDJSON line per image (with its upload `index` and `filename`) as soon
+    as that image has been scored. Failed images get a line with `error`.
+    """
+    images = []
+    # Bytes of every image held for this request, from plain parts and archives
+    extracted_bytes = 0
+    for file in files:
+        archive = is_image_archive(file.filename, file.content_type)
+        if not archive and not (file.content_type and file.content_type.startswith("image/")):
+            raise HTTPException(
+                status_code=400,
+                detail=f"File '{file.filename}' must be an image or a zip/tar archive."
+            )
+        # Checked before reading, like the single-image endpoint
+        if file.size is not None:
+            if not archive and file.size > settings.MAX_IMAGE_BYTES:
+                raise HTTPException(
+                    status_code=413, detail=f"Image '{file.filename}' is larger than {settings.MAX_IMAGE_BYTES} bytes."
+                )
+            if extracted_bytes + file.size > settings.BATCH_MAX_EXTRACTED_BYTES:
+                raise HTTPException(
+                    status_code=413, detail=f"Uploads expand to more than {settings.BATCH_MAX_EXTRACTED_BYTES} bytes."
+                )
+
+        read_started = time.perf_counter()
+        data = await file.read()
+        STAGES["upload_read"].observe(time.perf_counter() - read_started)
+        if archive:
+            try:
+                members = await run_in_threadpool(
+                    extract_images_from_archive, data, settings.BATCH_MAX_IMAGES, settings.MAX_IMAGE_BYTES,
+                    settings.BATCH_MAX_EXTRACTED_BYTES - extracted_bytes
+                )
+            except ArchiveTooLargeError as e:
+                raise HTTPException(status_code=413, detail=str(e))
+            except ValueError as e:
+                raise HTTPException(status_code=400, detail=str(e))
+        else:
+            members = [(file.filename, data)]
+        extracted_bytes += sum(len(image_bytes) for _, image_bytes in members)
+        if extracted_bytes > settings.BATCH_MAX_EXTRACTED_BYTES:
+            raise HTTPException(
+                status_code=413, detail=f"Uploads expand to more than {settings.BATCH_MAX_EXTRACTED_BYTES} bytes."
+            )
+        images.extend(members)
+
+        if len(images) > settings.BATCH_MAX_IMAGES:
+            raise HTTPException(
+                status_code=413,
+                detail=f"At most {settings.BATCH_MAX_IMAGES} images per batch."
+            )
+
+    if not images:
+        raise HTTPException(status_code=400, detail="No images found in upload.")
+
+    return StreamingResponse(_stream_batch_results(images), media_type="application/x-ndjson")
+
 @router.post("/predict/yield")
 async def predict_yield(request: YieldPredictionRequest):
     """
@@ -75,5 +295,89 @@ async def predict_yield(request: YieldPredictionRequest):
             "estimated_yield": round(yield_prediction, 4),
             "prediction_time": round(prediction_time, 4)
         }
+    except ModelNotReadyError as e:
+        raise HTTPException(
+            status_code=503,
+            detail=str(e),
+            headers={"Retry-After": str(e.retry_after)}
+        )
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
+
+async def _stream_yield_results(features, output_format):
+    """
+    Scores an (N, 3) feature matrix in chunks of YIELD_BATCH_CHUNK_SIZE rows,
+    one vectorized model call per chunk, and yields CSV or NDJSON text.
+    """
+    chunk_size = settings.YIELD_BATCH_CHUNK_SIZE
+    if output_format == "csv":
+        yield ",".join(YIELD_FEATURE_COLUMNS + ["estimated_yield"]) + "\n"
+
+    for start in range(0, len(features), chunk_size):
+        chunk = features[start:start + chunk_size]
+        predictions = np.round(await run_in_threadpool(ml_service.predict_yield_batch, chunk), 4)
+
+        if output_format == "csv":
+            buffer = io.StringIO()
+            np.savetxt(buffer, np.column_stack((chunk, predictions)), fmt="%.10g,%.10g,%.10g,%.4f")
+            yield buffer.getvalue()
+        else:
+            yield "".join(
+                json.dumps({
+                    "index": start + i,
+                    "avg_quality": row[0],
+                    "temperature": row[1],
+                    "humidity": row[2],
+                    "estimated_yield": prediction
+                }) + "\n"
+                for i, (row, prediction) in enumerate(zip(chunk.tolist(), predictions.tolist()))
+            )
+
+@router.post("/predict/yield/batch")
+async def predict_yield_batch(
+    request: Request,
+    output_format: Optional[Literal["ndjson", "csv"]] = Query(None, alias="format")
+):
+    """
+    Endpoint to predict cocoon yield for many rows in one request.
+    Accepts a JSON array of `{avg_quality, temperature, humidity}` objects, a
+    `text/csv` body, or a CSV upload (multipart field `file`) with
+    `avg_quality_score, temperature, humidity` columns. Streams results as
+    NDJSON (default) or CSV (`?format=csv` or `Accept: text/csv`).
+    """
+    if output_format is None:
+        output_format = "csv" if "text/csv" in request.headers.get("accept", "") else "ndjson"
+
+    if ml_service.is_loading:
+        error = ModelNotReadyError(settings.INFERENCE_RETRY_AFTER_SECONDS)
+        raise HTTPException(status_code=503, detail=str(error), headers={"Retry-After": str(error.retry_after)})
+    if ml_service.yield_model is None:
+        raise HTTPException(status_code=500, detail="Yield model not loaded.")
+
+    content_type = request.headers.get("content-type", "")
+    max_rows, chunk_size = settings.YIELD_BATCH_MAX_ROWS, settings.YIELD_BATCH_CHUNK_SIZE
+    try:
+        # Parsing is CPU-bound for large bodies; it runs in a worker thread
+        if content_type.startswith("application/json"):
+            body = await request.body()
+            features = await run_in_threadpool(parse_yield_json, body, max_rows, chunk_size)
+        elif content_type.startswith("multipart/form-data"):
+            form = await request.form()
+            upload = form.get("file")
+            if upload is None or isinstance(upload, str):
+                raise ValueError("Upload the CSV as multipart field 'file'.")
+            text = (await upload.read()).decode("utf-8-sig")
+            features = await run_in_threadpool(parse_yield_csv, text, max_rows, chunk_size)
+        elif content_type.startswith("text/csv"):
+            text = (await request.body()).decode("utf-8-sig")
+            features = await run_in_threadpool(parse_yield_csv, text, max_rows, chunk_size)
+        else:
+            raise HTTPException(
+                status_code=415,
+                detail="Send application/json, text/csv or a multipart CSV upload."
+            )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    media_type = "text/csv" if output_format == "csv" else "application/x-ndjson"
+    return StreamingResponse(_stream_yield_results(features, output_format), media_type=media_type)
@@ -1,5 +1,5 @@
 from pydantic_settings import BaseSettings, SettingsConfigDict
-from typing import Optional
+from typing import List, Literal, Optional
 
 class Settings(BaseSettings):
     # App Settings
@@ -12,6 +12,123 @@ class Settings(BaseSettings):
     SUPABASE_KEY: Optional[str] = None
     SUPABASE_BUCKET: str = "mulberry-leaf-images"
 
+    # Inference Settings
+    # "keras" serves models/leaf_quality_model.h5, "tflite" serves the
+    # quantized models/leaf_quality_model.tflite through a pool of
+    # TFLITE_POOL_SIZE interpreters, each using TFLITE_NUM_THREADS CPU threads.
+    INFERENCE_BACKEND: Literal["keras", "tflite"] = "keras"
+    TFLITE_NUM_THREADS: int = 2
+    TFLITE_POOL_SIZE: int = 2
+
+    # Concurrent leaf-quality requests are grouped into one model call. A batch
+    # is flushed when it reaches INFERENCE_MAX_BATCH_SIZE images or when the
+    # oldest queued image has waited INFERENCE_MAX_WAIT_MS milliseconds.
+    INFERENCE_BATCHING_ENABLED: bool = True
+    INFERENCE_MAX_BATCH_SIZE: int = 16
+    INFERENCE_MAX_WAIT_MS: float = 5.0
+
+    # Decode and inference run on a dedicated thread pool. Keep INFERENCE_WORKERS
+    # at least INFERENCE_MAX_BATCH_SIZE so a full batch can be queued at once.
+    # Once INFERENCE_MAX_QUEUE_DEPTH jobs are waiting, new requests get a 503
+    # with a Retry-After header instead of queueing behind them.
+    INFERENCE_WORKERS: int = 16
+    INFERENCE_MAX_QUEUE_DEPTH: int = 64
+    INFERENCE_RETRY_AFTER_SECONDS: int = 1
+
+    # Uploads above either limit are rejected with 413 before pixels are decoded
+    MAX_IMAGE_BYTES: int = 20 * 1024 * 1024
+    MAX_IMAGE_PIXELS: int = 50_000_000
+
+    # /predict/leaf-quality/batch limits: images per request, how many of
+    # one request's images may be in the inference pool at the same time, and
+    # the total bytes of a request's images, uploaded or extracted from archives.
+    BATCH_MAX_IMAGES: int = 500
+    BATCH_MAX_CONCURRENCY: int = 16
+    BATCH_MAX_EXTRACTED_BYTES: int = 256 * 1024 * 1024
+
+    # /predict/yield/batch limits: rows per request, and rows per parsing step
+    # and vectorized model call (bounds the memory used while scoring). A
+    # JSON body is decoded whole, at a few hundred bytes per row.
+    YIELD_BATCH_MAX_ROWS: int = 100_000
+    YIELD_BATCH_CHUNK_SIZE: int = 10_000
+
+    # Prediction Cache Settings
+    # LRU cache bounded by entry count and approximate bytes. Entries expire
+    # after CACHE_TTL_SECONDS (unset = never). Keys are spread over
+    # CACHE_STRIPES independently locked segments.
+    CACHE_MAX_ENTRIES: int = 100_000
+    CACHE_MAX_BYTES: Optional[int] = 256 * 1024 * 1024
+    CACHE_TTL_SECONDS: Optional[float] = None
+    CACHE_STRIPES: int = 16
+
+    # Optional second cache tier on local disk (SQLite) that survives restarts.
+    # Writes are asynchronous; the file is compacted past
+    # PERSISTENT_CACHE_MAX_ENTRIES rows. On startup the newest
+    # PERSISTENT_CACHE_PREWARM entries are loaded into memory (0 disables).
+    PERSISTENT_CACHE_ENABLED: bool = False
+    PERSISTENT_CACHE_PATH: str = "cache/predictions.sqlite3"
+    PERSISTENT_CACHE_MAX_ENTRIES: int = 1_000_000
+    PERSISTENT_CACHE_PREWARM: int = 50_000
+
+    # Near-duplicate lookup: on an exact-hash miss, a 64-bit perceptual hash
+    # of the decoded image is matched against recently scored images. A stored
+    # hash within PHASH_MAX_DISTANCE bits reuses that image's cached result.
+    PHASH_ENABLED: bool = False
+    PHASH_MAX_DISTANCE: int = 4
+    PHASH_INDEX_MAX_ENTRIES: int = 1_000_000
+
+    # Serve the yield model from its flat-array export (yield_model.npz) when
+    # the model version has one; otherwise through sklearn
+    YIELD_FLAT_FOREST: bool = True
+
+    # Optional yield lookup grid. When the yield model loads, its predictions
+    # are precomputed on a YIELD_GRID_POINTS grid from YIELD_GRID_MIN to
+    # YIELD_GRID_MAX (avg_quality, temperature, humidity) and cached as float32
+    # under YIELD_GRID_DIR, memory-mapped so workers share one copy. Rows inside
+    # the grid are answered by trilinear interpolation, others by the model.
+    # A grid whose measured error exceeds YIELD_GRID_MAX_ERROR is not used.
+    YIELD_GRID_ENABLED: bool = False
+    YIELD_GRID_MIN: List[float] = [0.0, 15.0, 30.0]
+    YIELD_GRID_MAX: List[float] = [10.0, 40.0, 100.0]
+    YIELD_GRID_POINTS: List[int] = [101, 101, 141]
+    YIELD_GRID_DIR: str = "cache/yield_grid"
+    YIELD_GRID_MAX_ERROR: Optional[float] = None
+
+    # Optional early-exit cascade for leaf quality. A NumPy color/texture
+    # classifier (leaf_cascade.npz, see scripts/train_cascade.py) scores each
+    # image first and answers when its confidence exceeds the threshold
+    # calibrated against the CNN, or CASCADE_THRESHOLD when set (higher: fewer
+    # early exits, closer to CNN accuracy). A CASCADE_SHADOW_RATE share of
+    # early exits is also scored by the CNN to measure live agreement.
+    CASCADE_ENABLED: bool = False
+    CASCADE_THRESHOLD: Optional[float] = None
+    CASCADE_SHADOW_RATE: float = 0.0
+
+    # Directory holding manifest.json and the model artifacts (default: backend/models)
+    MODELS_DIR: Optional[str] = None
+
+    # Startup warmup: models load in the background after the server binds,
+    # then run WARMUP_ITERATIONS dummy batches at each batch size before the
+    # service reports ready. Default sizes: 1 and INFERENCE_MAX_BATCH_SIZE.
+    WARMUP_ENABLED: bool = True
+    WARMUP_BATCH_SIZES: Optional[List[int]] = None
+    WARMUP_ITERATIONS: int = 2
+
+    # Admin endpoints (/admin/...) require this value in the X-Admin-Token
+    # header; they are disabled while it is unset
+    ADMIN_TOKEN: Optional[str] = None
+
+    # Request profiling on the prediction routes. When enabled, requests with
+    # `X-Profile: 1` or `?profile=1` (plus a PROFILING_SAMPLE_RATE share of all
+    # requests) are profiled into a ring of PROFILING_MAX_FILES files under
+    # PROFILING_DIR, downloadable from /admin/profiles.
+    PROFILING_ENABLED: bool = False
+    PROFILING_SAMPLE_RATE: float = 0.0
+    PROFILING_INTERVAL_MS: float = 5.0
+    PROFILING_MAX_SECONDS: float = 60.0
+    PROFILING_DIR: str = "profiles"
+    PROFILING_MAX_FILES: int = 50
+
     model_config = SettingsConfigDict(env_file=".env")
 
 settings = Settings()
@@ -0,0 +1,112 @@
+from prometheus_client import REGISTRY, Counter, Gauge, Histogram
+from prometheus_client.core import GaugeMetricFamily
+from prometheus_client.exposition import CONTENT_TYPE_LATEST as CONTENT_TYPE, generate_latest  # noqa: F401
+from prometheus_client.registry import Collector
+
+# Seconds; from sub-millisecond cache lookups up to slow CPU inference
+LATENCY_BUCKETS = (
+    0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025,
+    0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0,
+)
+
+
+class CallbackGauge(Collector):
+    """
+    Labelled gauge read when /metrics is scraped. `fn` returns an iterable of
+    (label values tuple, number). prometheus_client's Gauge.set_function only
+    covers gauges without labels.
+    """
+
+    def __init__(self, name, documentation, labelnames=(), registry=REGISTRY):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._fn = None
+        if registry is not None:
+            registry.register(self)
+
+    def set_function(self, fn):
+        self._fn = fn
+
+    def collect(self):
+        family = GaugeMetricFamily(self.name, self.documentation, labels=self.labelnames)
+        for values, value in (self._fn() if self._fn is not None else ()):
+            family.add_metric([str(v) for v in values], value)
+        yield family
+
+    def describe(self):
+        # Registering without calling collect(), which may not be ready yet
+        return [GaugeMetricFamily(self.name, self.documentation, labels=self.labelnames)]
+
+
+# -------------------------------------------------------------------------
+# Application metrics
+# -------------------------------------------------------------------------
+
+STAGE_SECONDS = Histogram(
+    "mulberry_stage_duration_seconds",
+    "Time spent in each stage of scoring an image.",
+    labelnames=("stage",),
+    buckets=LATENCY_BUCKETS,
+)
+# Children are created up front; record with STAGES["decode"].observe(seconds)
+STAGES = {
+    stage: STAGE_SECONDS.labels(stage)
+    for stage in (
+        "upload_read", "hashing", "cache_lookup", "decode", "resize",
+        "queue_wait", "cascade", "inference", "serialization",
+    )
+}
+
+BATCH_SIZE = Histogram(
+    "mulberry_inference_batch_size",
+    "Number of images per model call.",
+    buckets=(1, 2, 4, 8, 16, 32, 64, 128),
+)
+
+CACHE_LOOKUPS = Counter(
+    "mulberry_prediction_cache_lookups",
+    "Prediction cache lookups by result.",
+    labelnames=("result",),
+)
+CACHE_HITS = CACHE_LOOKUPS.labels("hit")
+CACHE_MISSES = CACHE_LOOKUPS.labels("miss")
+
+
+def _cache_hit_ratio():
+    counts = {
+        sample.labels["result"]: sample.value
+        for metric in CACHE_LOOKUPS.collect()
+        for sample in metric.samples
+        if sample.name.endswith("_total")
+    }
+    hits, misses = counts.get("hit", 0.0), counts.get("miss", 0.0)
+    return hits / (hits + misses) if hits + misses else 0.0
+
+
+CACHE_HIT_RATIO = Gauge(
+    "mulberry_prediction_cache_hit_ratio",
+    "Share of prediction cache lookups answered from the cache since startup.",
+)
+CACHE_HIT_RATIO.set_function(_cache_hit_ratio)
+
+REQUEST_SECONDS = Histogram(
+    "mulberry_http_request_duration_seconds",
+    "HTTP request latency by route and status code.",
+    labelnames=("method", "route", "status"),
+    buckets=LATENCY_BUCKETS,
+)
+
+CASCADE_DECISIONS = Counter(
+    "mulberry_cascade_decisions",
+    "Leaf images answered by the early-exit cascade or passed on to the CNN.",
+    labelnames=("route",),
+)
+CASCADE_EXITS = CASCADE_DECISIONS.labels("early_exit")
+CASCADE_PASSES = CASCADE_DECISIONS.labels("cnn")
+
+MODEL_LOAD_SECONDS = CallbackGauge(
+    "mulberry_model_load_seconds",
+    "Seconds spent in each load phase of the serving model version.",
+    labelnames=("phase",),
+)
@@ -1,6 +1,12 @@
-from fastapi import FastAPI, Request
+from contextlib import asynccontextmanager
+from fastapi import FastAPI, Request, Response
 from fastapi.middleware.cors import CORSMiddleware
-from app.api.endpoints import prediction
+from app.api.endpoints import admin, prediction
+from app.core.config import settings
+from app.core.metrics import CONTENT_TYPE, MODEL_LOAD_SECONDS, REGISTRY, REQUEST_SECONDS, generate_latest
+from app.services.cache_service import cache_service
+from app.services.ml_service import ml_service
+import threading
 import time
 import logging
 
@@ -11,10 +17,26 @@ logging.basicConfig(
 )
 logger = logging.getLogger("mulberry-leaf-api")
 
+def _prewarm_cache():
+    loaded = cache_service.prewarm()
+    if loaded:
+        logger.info("Prewarmed prediction cache with %d entries from disk", loaded)
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Load models and prewarm in the background so the server binds right away;
+    # /health/ready reports when inference is available
+    ml_service.start_loading()
+    threading.Thread(target=_prewarm_cache, name="cache-prewarm", daemon=True).start()
+    yield
+    # Flush pending write-behind cache entries to disk
+    cache_service.close()
+
 app = FastAPI(
     title="MulberryLeaf AI Quality & Yield API",
     description="Backend API for predicting leaf quality and cocoon yield.",
-    version="1.0.0"
+    version="1.0.0",
+    lifespan=lifespan
 )
 
 # CORS Middleware
@@ -26,30 +48,38 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-# Logging Middleware
+# Request metrics middleware
 @app.middleware("http")
 async def log_requests(request: Request, call_next):
-    start_time = time.time()
+    start_time = time.perf_counter()
     response = await call_next(request)
-    process_time = time.time() - start_time
-    
-    logger.info(
-        f"Method: {request.method} Path: {request.url.path} "
-        f"Status: {response.status_code} Duration: {process_time:.4f}s"
-    )
+    process_time = time.perf_counter() - start_time
+
+    # Label by route template (not the raw path) to keep label values bounded
+    route = request.scope.get("route")
+    REQUEST_SECONDS.labels(
+        request.method, route.path if route is not None else "unmatched", response.status_code
+    ).observe(process_time)
+    logger.debug("%s %s %s %.4fs", request.method, request.url.path, response.status_code, process_time)
     
     response.headers["X-Process-Time"] = str(process_time)
     return response
 
+# Load phases of the serving model version (the startup phases until a reload)
+MODEL_LOAD_SECONDS.set_function(lambda: (
+    ((phase,), seconds) for phase, seconds in
+    (ml_service.bundle.load_timings if ml_service.bundle is not None else ml_service.startup_timings).items()
+))
+
 # Root/Health check
 @app.get("/health")
 @app.get("/")
 async def health_check():
     """
     Returns the health status of the API and models.
+    `live` is true whenever the process can serve requests; `ready` only once
+    the models are loaded and warmed up.
     """
-    from app.services.ml_service import ml_service
-    
     models_ready = (
         ml_service.vision_model is not None and 
         ml_service.yield_model is not None
@@ -58,12 +88,66 @@ async def health_check():
     return {
         "status": "healthy",
         "timestamp": time.time(),
+        "live": True,
+        "ready": ml_service.is_ready,
         "models_ready": models_ready,
+        "model_version": ml_service.model_version,
+        "model_state": ml_service.state,
+        "model_error": ml_service.load_error,
+        # Seconds spent in each startup phase
+        "startup_timings": ml_service.startup_timings,
         "api_v": "1.0.0"
     }
 
+@app.get("/health/live")
+async def liveness_check():
+    """Liveness probe: the process is up and the event loop is responsive."""
+    return {"live": True}
+
+@app.get("/health/ready")
+async def readiness_check(response: Response):
+    """Readiness probe: 503 until the models are loaded and warmed up."""
+    if not ml_service.is_ready:
+        response.status_code = 503
+    return {"ready": ml_service.is_ready, "model_state": ml_service.state}
+
+@app.get("/stats")
+async def runtime_stats():
+    """
+    Returns runtime statistics used to tune inference throughput and latency.
+    """
+    from app.services.executor_service import inference_executor
+    from app.services.singleflight import inference_flights
+    from app.services.near_duplicate_service import near_duplicate_index
+    from app.utils.yield_grid import YieldGrid
+
+    bundle = ml_service.bundle
+    yield_model = bundle.yield_model if bundle is not None else None
+
+    return {
+        "cache": cache_service.stats(),
+        # "coalesced" counts inferences saved by sharing an in-flight result
+        "singleflight": inference_flights.stats(),
+        "near_duplicates": near_duplicate_index.stats() if settings.PHASH_ENABLED else None,
+        "executor": inference_executor.stats(),
+        "batching": ml_service.batcher.stats() if ml_service.batcher else None,
+        # Shape and measured approximation error of the yield lookup grid, if serving one
+        "yield_grid": yield_model.stats() if isinstance(yield_model, YieldGrid) else None,
+        # Early-exit rate, shadow agreement with the CNN and calibrated accuracy delta
+        "cascade": bundle.cascade.stats() if bundle is not None and bundle.cascade is not None else None,
+    }
+
+@app.get("/metrics")
+async def metrics():
+    """
+    Prometheus metrics: per-stage latency histograms, batch sizes, cache hit
+    ratio, request latency and model load times.
+    """
+    return Response(generate_latest(REGISTRY), media_type=CONTENT_TYPE)
+
 # Include prediction endpoints
 app.include_router(prediction.router, tags=["Predictions"])
+app.include_router(admin.router, tags=["Admin"])
 
 if __name__ == "__main__":
     import uvicorn
@@ -0,0 +1,176 @@
+import logging
+import queue
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future
+
+import numpy as np
+from app.core.metrics import BATCH_SIZE, STAGES
+
+logger = logging.getLogger("mulberry-leaf-api.batching")
+
+# Number of recent batches kept for the wait/latency percentiles in stats().
+_STATS_WINDOW = 1024
+
+
+class BatcherClosedError(RuntimeError):
+    """The batcher was closed (e.g. its model was swapped out) before the call."""
+
+
+class _PendingItem:
+    __slots__ = ("array", "future", "enqueued_at")
+
+    def __init__(self, array, future, enqueued_at):
+        self.array = array
+        self.future = future
+        self.enqueued_at = enqueued_at
+
+
+class MicroBatcher:
+    """
+    Collects single-image inference calls from many threads into one queue and
+    runs them through the model as a single batched tensor.
+
+    A batch is flushed when it holds `max_batch_size` items or when the oldest
+    item has waited `max_wait_ms`, whichever comes first. Each caller receives
+    the output row that belongs to its own input. `assemble_fn` turns the list
+    of queued items into the model input (default: np.stack).
+    """
+
+    def __init__(self, predict_fn, max_batch_size=16, max_wait_ms=5.0, name="leaf-quality", assemble_fn=None):
+        self._predict_fn = predict_fn
+        self._assemble_fn = assemble_fn or np.stack
+        self.max_batch_size = max(1, int(max_batch_size))
+        self.max_wait = max(0.0, float(max_wait_ms)) / 1000.0
+        self.name = name
+
+        self._queue = queue.Queue()
+        self._closed = False
+        # Makes "check closed + enqueue" atomic with close(), so nothing is
+        # queued behind the shutdown sentinel
+        self._submit_lock = threading.Lock()
+
+        self._stats_lock = threading.Lock()
+        self._batch_count = 0
+        self._item_count = 0
+        self._batch_size_counts = {}
+        self._recent_waits = deque(maxlen=_STATS_WINDOW)
+        self._recent_inference = deque(maxlen=_STATS_WINDOW)
+
+        self._worker = threading.Thread(target=self._run, name=f"{name}-batcher", daemon=True)
+        self._worker.start()
+
+    def submit(self, array):
+        """Queue one preprocessed image. Returns a Future resolving to its output row."""
+        future = Future()
+        with self._submit_lock:
+            if self._closed:
+                raise BatcherClosedError(f"Batcher '{self.name}' is closed.")
+            self._queue.put(_PendingItem(array, future, time.perf_counter()))
+        return future
+
+    def predict(self, array, timeout=None):
+        """Blocking helper: submit one image and wait for its result."""
+        return self.submit(array).result(timeout=timeout)
+
+    def close(self):
+        """Stop accepting work, flush whatever is queued and stop the worker."""
+        with self._submit_lock:
+            if self._closed:
+                return
+            self._closed = True
+            self._queue.put(None)
+        self._worker.join()
+
+    def _collect(self):
+        first = self._queue.get()
+        if first is None:
+            return None
+
+        batch = [first]
+        deadline = first.enqueued_at + self.max_wait
+        while len(batch) < self.max_batch_size:
+            remaining = deadline - time.perf_counter()
+            try:
+                if remaining > 0:
+                    item = self._queue.get(timeout=remaining)
+                else:
+                    item = self._queue.get_nowait()
+            except queue.Empty:
+                break
+            if item is None:
+                # Re-queue the sentinel so the loop exits after this batch.
+                self._queue.put(None)
+                break
+            batch.append(item)
+        return batch
+
+    def _run(self):
+        while True:
+            batch = self._collect()
+            if batch is None:
+                return
+            batch = [item for item in batch if item.future.set_running_or_notify_cancel()]
+            if batch:
+                self._flush(batch)
+
+    def _flush(self, batch):
+        started = time.perf_counter()
+        try:
+            outputs = self._predict_fn(self._assemble_fn([item.array for item in batch]))
+        except Exception as exc:
+            for item in batch:
+                item.future.set_exception(exc)
+        else:
+            for item, output in zip(batch, outputs):
+                item.future.set_result(output)
+        finished = time.perf_counter()
+
+        max_wait = max(started - item.enqueued_at for item in batch)
+        self._record(batch, started, finished - started)
+        logger.debug(
+            "%s batch: size=%d max_queue_wait=%.2fms inference=%.2fms",
+            self.name, len(batch), max_wait * 1000, (finished - started) * 1000,
+        )
+
+    def _record(self, batch, started, inference_time):
+        size = len(batch)
+        queue_wait = STAGES["queue_wait"]
+        for item in batch:
+            queue_wait.observe(started - item.enqueued_at)
+        STAGES["inference"].observe(inference_time)
+        BATCH_SIZE.observe(size)
+        with self._stats_lock:
+            self._batch_count += 1
+            self._item_count += size
+            self._batch_size_counts[size] = self._batch_size_counts.get(size, 0) + 1
+            self._recent_waits.extend(started - item.enqueued_at for item in batch)
+            self._recent_inference.append(inference_time)
+
+    def stats(self):
+        """Batch-size distribution and recent queue-wait / inference latency in ms."""
+        with self._stats_lock:
+            waits = np.array(self._recent_waits) * 1000
+            inference = np.array(self._recent_inference) * 1000
+            batch_count = self._batch_count
+            item_count = self._item_count
+            histogram = dict(sorted(self._batch_size_counts.items()))
+
+        def summary(values):
+            if values.size == 0:
+                return {"p50": 0.0, "p99": 0.0, "max": 0.0}
+            p50, p99 = np.percentile(values, [50, 99])
+            return {"p50": round(float(p50), 3), "p99": round(float(p99), 3), "max": round(float(values.max()), 3)}
+
+        return {
+            "max_batch_size": self.max_batch_size,
+            "max_wait_ms": self.max_wait * 1000,
+            "queued": self._queue.qsize(),
+            "batches": batch_count,
+            "items": item_count,
+            "avg_batch_size": round(item_count / batch_count, 3) if batch_count else 0.0,
+            "batch_size_histogram": histogram,
+            "queue_wait_ms": summary(waits),
+            "inference_ms": summary(inference),
+        }
@@ -1,6 +1,141 @@
+import os
+import sys
 import threading
+import time
+from collections import OrderedDict
+from fastapi.concurrency import run_in_threadpool
+from app.core.config import settings
+from app.services.persistent_cache import PersistentCache
+
+
+def approximate_size(obj):
+    """Rough in-memory size in bytes of JSON-like values (dicts, lists, scalars)."""
+    size = sys.getsizeof(obj)
+    if isinstance(obj, dict):
+        size += sum(approximate_size(k) + approximate_size(v) for k, v in obj.items())
+    elif isinstance(obj, (list, tuple, set)):
+        size += sum(approximate_size(item) for item in obj)
+    return size
+
+
+class _Stripe:
+    __slots__ = ("lock", "entries", "bytes", "hits", "misses", "evictions", "expirations")
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        # key -> (value, expires_at, size); ordered from least to most recently used
+        self.entries = OrderedDict()
+        self.bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+
+class StripedLRUCache:
+    """
+    Thread-safe LRU cache with optional TTL, bounded by entry count and by
+    approximate bytes.
+
+    Keys are spread over `stripes` independent LRU segments, each with its own
+    lock, so concurrent workers rarely contend. Limits are split evenly across
+    stripes. Lookups, inserts and evictions are all O(1).
+    """
+
+    def __init__(self, max_entries=10000, max_bytes=None, ttl_seconds=None, stripes=16):
+        self.stripe_count = max(1, stripes)
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.ttl_seconds = ttl_seconds
+        self._stripe_max_entries = max(1, max_entries // self.stripe_count)
+        self._stripe_max_bytes = max_bytes // self.stripe_count if max_bytes else None
+        self._stripes = [_Stripe() for _ in range(self.stripe_count)]
+
+    def _stripe(self, key):
+        return self._stripes[hash(key) % self.stripe_count]
+
+    def get(self, key):
+        """Returns the cached value, or None on a miss or expired entry."""
+        stripe = self._stripe(key)
+        with stripe.lock:
+            entry = stripe.entries.get(key)
+            if entry is None:
+                stripe.misses += 1
+                return None
+            value, expires_at, size = entry
+            if expires_at is not None and expires_at <= time.monotonic():
+                del stripe.entries[key]
+                stripe.bytes -= size
+                stripe.expirations += 1
+                stripe.misses += 1
+                return None
+            stripe.entries.move_to_end(key)
+            stripe.hits += 1
+            return value
+
+    def set(self, key, value, ttl_seconds=None):
+        """Stores a value, evicting least recently used entries to stay within limits."""
+        ttl = ttl_seconds if ttl_seconds is not None else self.ttl_seconds
+        expires_at = time.monotonic() + ttl if ttl else None
+        size = approximate_size(key) + approximate_size(value)
+
+        stripe = self._stripe(key)
+        with stripe.lock:
+            previous = stripe.entries.pop(key, None)
+            if previous is not None:
+                stripe.bytes -= previous[2]
+            stripe.entries[key] = (value, expires_at, size)
+            stripe.bytes += size
+
+            while stripe.entries and (
+                len(stripe.entries) > self._stripe_max_entries
+                or (self._stripe_max_bytes is not None and stripe.bytes > self._stripe_max_bytes)
+            ):
+                _, (_, _, evicted_size) = stripe.entries.popitem(last=False)
+                stripe.bytes -= evicted_size
+                stripe.evictions += 1
+
+    def delete(self, key):
+        stripe = self._stripe(key)
+        with stripe.lock:
+            entry = stripe.entries.pop(key, None)
+            if entry is not None:
+                stripe.bytes -= entry[2]
+
+    def clear(self):
+        for stripe in self._stripes:
+            with stripe.lock:
+                stripe.entries.clear()
+                stripe.bytes = 0
+
+    def __len__(self):
+        return sum(len(stripe.entries) for stripe in self._stripes)
+
+    def stats(self):
+        totals = {"entries": 0, "bytes": 0, "hits": 0, "misses": 0, "evictions": 0, "expirations": 0}
+        for stripe in self._stripes:
+            with stripe.lock:
+                totals["entries"] += len(stripe.entries)
+                totals["bytes"] += stripe.bytes
+                totals["hits"] += stripe.hits
+                totals["misses"] += stripe.misses
+                totals["evictions"] += stripe.evictions
+                totals["expirations"] += stripe.expirations
+        lookups = totals["hits"] + totals["misses"]
+        totals["hit_rate"] = round(totals["hits"] / lookups, 4) if lookups else 0.0
+        totals["max_entries"] = self.max_entries
+        totals["max_bytes"] = self.max_bytes
+        totals["ttl_seconds"] = self.ttl_seconds
+        return totals
+
 
 class CacheService:
+    """
+    Two-tier prediction cache: an in-memory LRU in front of an optional
+    SQLite store on local disk (PERSISTENT_CACHE_ENABLED). Memory misses fall
+    through to disk and are promoted back into memory; writes go to memory
+    immediately and to disk in the background.
+    """
     _instance = None
     _lock = threading.Lock()
 
@@ -8,25 +143,91 @@ class CacheService:
         with cls._lock:
             if cls._instance is None:
                 cls._instance = super(CacheService, cls).__new__(cls)
-                cls._instance._cache = {}
+                cls._instance._cache = StripedLRUCache(
+                    max_entries=settings.CACHE_MAX_ENTRIES,
+                    max_bytes=settings.CACHE_MAX_BYTES,
+                    ttl_seconds=settings.CACHE_TTL_SECONDS,
+                    stripes=settings.CACHE_STRIPES,
+                )
+                cls._instance._store = None
+                if settings.PERSISTENT_CACHE_ENABLED:
+                    cls._instance._store = PersistentCache(
+                        cls._resolve_path(settings.PERSISTENT_CACHE_PATH),
+                        max_entries=settings.PERSISTENT_CACHE_MAX_ENTRIES,
+                    )
         return cls._instance
 
+    @staticmethod
+    def _resolve_path(path):
+        # Relative paths are resolved against the backend/ directory
+        base_path = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+        return path if os.path.isabs(path) else os.path.join(base_path, path)
+
     def get(self, key):
         """Retrieve a value from the cache."""
-        return self._cache.get(key)
+        value = self._cache.get(key)
+        if value is None and self._store is not None:
+            value = self._promote(key, self._store.lookup(key, settings.CACHE_TTL_SECONDS))
+        return value
+
+    async def aget(self, key):
+        """Like get, for async callers: a disk lookup on a memory miss runs in a worker thread."""
+        value = self._cache.get(key)
+        if value is None and self._store is not None:
+            entry = await run_in_threadpool(self._store.lookup, key, settings.CACHE_TTL_SECONDS)
+            value = self._promote(key, entry)
+        return value
+
+    def _promote(self, key, entry):
+        """Copies a disk entry into memory for the rest of its TTL. Returns its value."""
+        if entry is None:
+            return None
+        value, written_at = entry
+        ttl = settings.CACHE_TTL_SECONDS
+        remaining = ttl - (time.time() - written_at) if ttl else None
+        if remaining is None or remaining > 0:
+            self._cache.set(key, value, ttl_seconds=remaining)
+        return value
 
     def set(self, key, value):
         """Set a value in the cache."""
-        with self._lock:
-            # Basic cache eviction (simple limit)
-            if len(self._cache) > 1000:
-                self._cache.pop(next(iter(self._cache)))
-            self._cache[key] = value
+        self._cache.set(key, value)
+        if self._store is not None:
+            self._store.put(key, value)
+
+    def delete(self, key):
+        """Remove a value from both tiers."""
+        self._cache.delete(key)
+        if self._store is not None:
+            self._store.delete(key)
 
     def clear(self):
-        """Clear the cache."""
-        with self._lock:
-            self._cache.clear()
+        """Clear both tiers."""
+        self._cache.clear()
+        if self._store is not None:
+            self._store.clear()
+
+    def prewarm(self, limit=None):
+        """Loads the most recently written disk entries into memory. Returns the count."""
+        if self._store is None:
+            return 0
+        limit = settings.PERSISTENT_CACHE_PREWARM if limit is None else limit
+        entries = self._store.load_recent(limit, settings.CACHE_TTL_SECONDS)
+        # Oldest first, so the newest entries end up most recently used
+        for key, value, written_at in reversed(entries):
+            self._promote(key, (value, written_at))
+        return len(entries)
+
+    def close(self):
+        """Flushes pending disk writes."""
+        if self._store is not None:
+            self._store.close()
+
+    def stats(self):
+        """Hit/miss/eviction counters and current size."""
+        stats = self._cache.stats()
+        stats["persistent"] = self._store.stats() if self._store is not None else None
+        return stats
 
 # Global instance
 cache_service = CacheService()
@@ -0,0 +1,95 @@
+import asyncio
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from app.core.config import settings
+
+
+class ExecutorOverloadedError(Exception):
+    """Raised when the inference queue is full and the request should be shed."""
+
+    def __init__(self, retry_after):
+        super().__init__("Inference queue is full, retry later.")
+        self.retry_after = retry_after
+
+
+class InferenceExecutor:
+    """
+    Size-limited thread pool for blocking decode and model work.
+
+    Keeps the asyncio event loop free and rejects new work once
+    `max_queue_depth` jobs are waiting for a worker, so latency stays bounded
+    under overload instead of growing with the backlog.
+    """
+
+    def __init__(self, max_workers, max_queue_depth, retry_after_seconds=1):
+        self.max_workers = max_workers
+        self.max_queue_depth = max_queue_depth
+        self.retry_after_seconds = retry_after_seconds
+
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="inference")
+        self._lock = threading.Lock()
+        self._in_flight = 0
+        self._queued = 0
+        self._completed = 0
+        self._rejected = 0
+
+    async def run(self, fn, *args):
+        """Run `fn(*args)` on the pool, or raise ExecutorOverloadedError if the queue is full."""
+        return await asyncio.wrap_future(self.submit(fn, *args))
+
+    def submit(self, fn, *args):
+        """
+        Like run, for synchronous callers (e.g. a job already on the pool
+        starting background work). Returns a concurrent.futures.Future.
+        """
+        with self._lock:
+            if self._queued >= self.max_queue_depth:
+                self._rejected += 1
+                raise ExecutorOverloadedError(self.retry_after_seconds)
+            self._queued += 1
+
+        future = self._executor.submit(self._call, fn, args)
+        future.add_done_callback(self._on_done)
+        return future
+
+    def _call(self, fn, args):
+        with self._lock:
+            self._queued -= 1
+            self._in_flight += 1
+        try:
+            return fn(*args)
+        finally:
+            with self._lock:
+                self._in_flight -= 1
+                self._completed += 1
+
+    def _on_done(self, future):
+        # A job cancelled before it reached a worker never ran _call
+        if future.cancelled():
+            with self._lock:
+                self._queued -= 1
+
+    def stats(self):
+        with self._lock:
+            return {
+                "max_workers": self.max_workers,
+                "max_queue_depth": self.max_queue_depth,
+                "in_flight": self._in_flight,
+                "queued": self._queued,
+                "completed": self._completed,
+                "rejected": self._rejected,
+            }
+
+    def shutdown(self):
+        self._executor.shutdown(wait=True)
+
+# Global instance
+inference_executor = InferenceExecutor(
+    max_workers=settings.INFERENCE_WORKERS,
+    max_queue_depth=settings.INFERENCE_MAX_QUEUE_DEPTH,
+    retry_after_seconds=settings.INFERENCE_RETRY_AFTER_SECONDS,
+)
+
+# Background work nobody waits on (cascade shadow samples): one worker and a
+# short queue of its own, so it never takes a worker or queue slot from requests
+background_executor = InferenceExecutor(max_workers=1, max_queue_depth=8)
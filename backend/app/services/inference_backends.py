@@ -0,0 +1,118 @@
+import queue
+import numpy as np
+
+
+def _load_interpreter_class():
+    """
+    Returns the lightest available TFLite Interpreter implementation.
+    The standalone runtimes avoid importing full TensorFlow on serving nodes.
+    """
+    try:
+        from ai_edge_litert.interpreter import Interpreter
+        return Interpreter
+    except ImportError:
+        pass
+    try:
+        from tflite_runtime.interpreter import Interpreter
+        return Interpreter
+    except ImportError:
+        pass
+    import tensorflow as tf
+    return tf.lite.Interpreter
+
+
+class KerasBackend:
+    """Runs the full Keras `.h5` model."""
+
+    name = "keras"
+
+    def __init__(self, model_path):
+        import tensorflow as tf
+        self.model_path = model_path
+        self.model = tf.keras.models.load_model(model_path)
+
+    def predict(self, batch):
+        """Returns class probabilities for a (N, H, W, 3) float batch."""
+        return self.model.predict(batch, verbose=0)
+
+
+class _PooledInterpreter:
+    """One TFLite interpreter plus the batch size its tensors are allocated for."""
+
+    def __init__(self, interpreter):
+        self.interpreter = interpreter
+        self.interpreter.allocate_tensors()
+        self.input = interpreter.get_input_details()[0]
+        self.output = interpreter.get_output_details()[0]
+        self.batch_size = int(self.input["shape"][0])
+
+    def run(self, batch):
+        if batch.shape[0] != self.batch_size:
+            self.interpreter.resize_tensor_input(self.input["index"], list(batch.shape))
+            self.interpreter.allocate_tensors()
+            self.input = self.interpreter.get_input_details()[0]
+            self.output = self.interpreter.get_output_details()[0]
+            self.batch_size = batch.shape[0]
+
+        self.interpreter.set_tensor(self.input["index"], self._quantize(batch, self.input))
+        self.interpreter.invoke()
+        return self._dequantize(self.interpreter.get_tensor(self.output["index"]), self.output)
+
+    @staticmethod
+    def _quantize(batch, details):
+        dtype = details["dtype"]
+        if dtype == np.float32:
+            return batch.astype(np.float32, copy=False)
+        scale, zero_point = details["quantization"]
+        info = np.iinfo(dtype)
+        return np.clip(np.round(batch / scale + zero_point), info.min, info.max).astype(dtype)
+
+    @staticmethod
+    def _dequantize(output, details):
+        if output.dtype == np.float32:
+            return output.copy()
+        scale, zero_point = details["quantization"]
+        return (output.astype(np.float32) - zero_point) * scale
+
+
+class TFLiteBackend:
+    """
+    Runs a `.tflite` model through a pool of interpreters.
+
+    Interpreters are not thread-safe, so each call checks one out of the pool
+    for its exclusive use. `pool_size` bounds how many batches run at once and
+    `num_threads` sets the CPU threads each interpreter may use per batch.
+    """
+
+    name = "tflite"
+
+    def __init__(self, model_path, num_threads=1, pool_size=1):
+        Interpreter = _load_interpreter_class()
+        self.model_path = model_path
+        self.num_threads = num_threads
+        self.pool_size = max(1, pool_size)
+        self._pool = queue.Queue()
+        for _ in range(self.pool_size):
+            self._pool.put(_PooledInterpreter(Interpreter(model_path=model_path, num_threads=num_threads)))
+
+    def predict(self, batch):
+        """Returns class probabilities for a (N, H, W, 3) float batch."""
+        slot = self._pool.get()
+        try:
+            return slot.run(batch)
+        finally:
+            self._pool.put(slot)
+
+
+def compare_backends(reference, candidate, batch):
+    """
+    Parity check between two backends on the same input batch.
+    Returns top-1 agreement and the largest absolute probability difference.
+    """
+    expected = reference.predict(batch)
+    actual = candidate.predict(batch)
+    return {
+        "samples": int(batch.shape[0]),
+        "top1_agreement": float(np.mean(np.argmax(expected, axis=1) == np.argmax(actual, axis=1))),
+        "max_abs_diff": float(np.max(np.abs(expected - actual))),
+    }
@@ -1,9 +1,136 @@
 import os
-import tensorflow as tf
+import threading
+import time
+from contextlib import contextmanager
 import joblib
 import numpy as np
-from PIL import Image
-import io
+from app.core.config import settings
+from app.core.metrics import BATCH_SIZE, STAGES
+from app.utils.flat_forest import FlatForest
+from app.utils.leaf_cascade import LeafCascade
+from app.utils.preprocessing import DEFAULT_CONTRACT, BatchBuffer, decode_image, load_contract, scale_pixels
+from app.utils.yield_grid import load_or_build as load_yield_grid
+from app.services.batching_service import BatcherClosedError, MicroBatcher
+from app.services.executor_service import ExecutorOverloadedError, background_executor
+from app.services.inference_backends import KerasBackend, TFLiteBackend
+from app.services.model_registry import ModelRegistry
+
+# Startup phases during which predictions are refused with ModelNotReadyError
+_LOADING_STATES = ("pending", "loading", "warming")
+
+class ModelNotReadyError(Exception):
+    """Models are still loading or warming up; the client should retry."""
+
+    def __init__(self, retry_after):
+        super().__init__("Models are still loading, retry shortly.")
+        self.retry_after = retry_after
+
+class ReloadInProgressError(Exception):
+    """Startup or another reload is still loading models."""
+
+@contextmanager
+def _timed(timings, name):
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        timings[name] = round(time.perf_counter() - started, 3)
+
+class ModelBundle:
+    """
+    Everything that belongs to one model version: the vision backend, the
+    yield model, the preprocessing contract and the micro-batcher feeding the
+    vision backend. MLService swaps whole bundles, so a request that picked up
+    one version finishes on it.
+    """
+
+    def __init__(self, version, vision_model=None, yield_model=None, contract=DEFAULT_CONTRACT, cascade=None):
+        self.version = version
+        self.vision_model = vision_model
+        self.yield_model = yield_model
+        self.contract = contract
+        # Optional early-exit first stage in front of the vision model
+        self.cascade = cascade
+        # Seconds spent in each load phase
+        self.load_timings = {}
+        self.batcher = None
+
+        if vision_model is not None and settings.INFERENCE_BATCHING_ENABLED:
+            # Only the batcher thread fills this buffer
+            height, width = contract["input_size"]
+            batch_buffer = BatchBuffer(
+                settings.INFERENCE_MAX_BATCH_SIZE,
+                shape=(height, width, 3),
+                scaling=contract["scaling"],
+            )
+            self.batcher = MicroBatcher(
+                self.predict_batch,
+                max_batch_size=settings.INFERENCE_MAX_BATCH_SIZE,
+                max_wait_ms=settings.INFERENCE_MAX_WAIT_MS,
+                name=f"leaf-quality-{version}",
+                assemble_fn=batch_buffer.fill,
+            )
+
+    @property
+    def complete(self):
+        return self.vision_model is not None and self.yield_model is not None
+
+    def predict_batch(self, batch):
+        """Runs the vision backend on a stacked, scaled (N, H, W, 3) batch."""
+        return self.vision_model.predict(batch)
+
+    def classify_pixels(self, pixels):
+        """
+        Class probabilities for one uint8 (H, W, 3) image. With a cascade,
+        confident first-stage probabilities are returned without the CNN.
+        """
+        cascade = self.cascade
+        if cascade is not None:
+            started = time.perf_counter()
+            probabilities = cascade.classify(pixels)[0]
+            STAGES["cascade"].observe(time.perf_counter() - started)
+            if cascade.accepts(probabilities):
+                if cascade.sample_shadow():
+                    self._shadow(cascade, pixels, probabilities)
+                return probabilities
+        return self._predict_pixels(pixels)
+
+    def _shadow(self, cascade, pixels, probabilities):
+        """
+        Scores an early exit with the CNN in the background and records
+        whether it agrees, so the request does not wait for it. Runs on its
+        own single-worker pool and is skipped when that pool's queue is full,
+        so shadow samples never take capacity from requests.
+        """
+        def record(future):
+            if not future.cancelled() and future.exception() is None:
+                cascade.record_shadow(probabilities, future.result())
+
+        try:
+            background_executor.submit(self._predict_pixels, pixels).add_done_callback(record)
+        except ExecutorOverloadedError:
+            pass
+
+    def _predict_pixels(self, pixels):
+        # Queued into a shared batch when batching is enabled; pixels are
+        # scaled per the contract while the batch is assembled
+        if self.batcher is not None:
+            try:
+                return self.batcher.predict(pixels)
+            except BatcherClosedError:
+                # Bundle was retired after this request picked it up
+                pass
+        batch = scale_pixels(pixels[np.newaxis], self.contract["scaling"])
+        started = time.perf_counter()
+        predictions = self.predict_batch(batch)[0]
+        STAGES["inference"].observe(time.perf_counter() - started)
+        BATCH_SIZE.observe(1)
+        return predictions
+
+    def close(self):
+        """Flushes queued images and stops the batcher."""
+        if self.batcher is not None:
+            self.batcher.close()
 
 class MLService:
     _instance = None
@@ -19,68 +146,375 @@ class MLService:
             return
             
         self.base_path = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
-        self.models_path = os.path.join(self.base_path, "models")
+        self.models_path = settings.MODELS_DIR or os.path.join(self.base_path, "models")
+        self.registry = ModelRegistry(self.models_path)
         
-        self.vision_model_path = os.path.join(self.models_path, "leaf_quality_model.h5")
-        self.yield_model_path = os.path.join(self.models_path, "yield_model.pkl")
-        
-        self.vision_model = None
-        self.yield_model = None
-        self.load_models()
+        # Serving model version, and the one it replaced (kept loaded and warm
+        # so rollback is instant)
+        self.bundle = None
+        self.previous_bundle = None
+        self._swap_lock = threading.Lock()
+        self.reload_status = {"state": "idle", "version": None, "error": None}
+
+        # Models are loaded by start_loading(), not at import time
+        self.state = "pending"
+        self.load_error = None
+        self.startup_timings = {}
+        self._created_at = time.perf_counter()
+        self._loader = None
+        self._loader_lock = threading.Lock()
+        self._loaded = threading.Event()
         
         self._initialized = True
 
-    def load_models(self):
-        """Load models once at startup."""
-        print(f"Loading vision model from {self.vision_model_path}...")
-        if os.path.exists(self.vision_model_path):
-            self.vision_model = tf.keras.models.load_model(self.vision_model_path)
-            print("Vision model loaded successfully.")
-        else:
-            print(f"Error: Vision model not found at {self.vision_model_path}")
+    # Parts of the serving bundle, for callers that only read one of them
+    @property
+    def model_version(self):
+        bundle = self.bundle
+        return bundle.version if bundle is not None else None
+
+    @property
+    def vision_model(self):
+        bundle = self.bundle
+        return bundle.vision_model if bundle is not None else None
+
+    @property
+    def yield_model(self):
+        bundle = self.bundle
+        return bundle.yield_model if bundle is not None else None
+
+    @property
+    def contract(self):
+        bundle = self.bundle
+        return bundle.contract if bundle is not None else DEFAULT_CONTRACT
+
+    @property
+    def batcher(self):
+        bundle = self.bundle
+        return bundle.batcher if bundle is not None else None
+
+    @property
+    def is_ready(self):
+        """True once both models are loaded and warmed up."""
+        return self.state == "ready"
+
+    @property
+    def is_loading(self):
+        return self.state in _LOADING_STATES
+
+    def start_loading(self):
+        """
+        Loads and warms the models on a background thread (once), so the
+        server can bind and answer health checks while TensorFlow starts.
+        """
+        with self._loader_lock:
+            if self._loader is None:
+                self._loader = threading.Thread(target=self._load_and_warm, name="model-loader", daemon=True)
+                self._loader.start()
+        return self._loader
+
+    def wait_until_loaded(self, timeout=None):
+        """Starts loading if needed and blocks until it has finished or failed."""
+        self.start_loading()
+        return self._loaded.wait(timeout)
+
+    def _load_and_warm(self):
+        try:
+            self.state = "loading"
+            bundle = self.load_bundle(self.registry.active_version, self.startup_timings)
+            self.state = "warming"
+            with _timed(self.startup_timings, "warmup"):
+                self.warmup(bundle)
+            self.bundle = bundle
+            if bundle.complete:
+                self.state = "ready"
+            else:
+                self.state = "failed"
+                self.load_error = "One or more model files are missing."
+        except Exception as e:
+            self.state = "failed"
+            self.load_error = str(e)
+            print(f"Error: Model loading failed: {e}")
+        finally:
+            self.startup_timings["total"] = round(time.perf_counter() - self._created_at, 3)
+            print(f"Model startup {self.state}; phase timings (s): {self.startup_timings}")
+            self._loaded.set()
+
+    def load_bundle(self, version, timings=None):
+        """Loads a registry version into a new ModelBundle without serving it."""
+        timings = {} if timings is None else timings
+        paths = self.registry.artifact_paths(version)
+
+        with _timed(timings, "vision_model"):
+            vision_model, contract = self._load_vision_backend(settings.INFERENCE_BACKEND, paths, timings)
+
+        yield_model = None
+        yield_path = paths.get("yield")
+        flat_path = paths.get("yield_flat")
+        if settings.YIELD_FLAT_FOREST and flat_path and os.path.exists(flat_path):
+            # Same predictions as the sklearn Pipeline without its per-call overhead
+            yield_path = flat_path
+        print(f"Loading yield model ({version}) from {yield_path}...")
+        with _timed(timings, "yield_model"):
+            if yield_path and os.path.exists(yield_path):
+                if yield_path == flat_path:
+                    # Memory-mapped: all workers share one page-cached copy of the trees
+                    yield_model = FlatForest.load(yield_path, mmap_mode="r")
+                else:
+                    yield_model = joblib.load(yield_path)
+                print("Yield model loaded successfully.")
+            else:
+                print(f"Error: Yield model not found at {yield_path}")
+
+        if yield_model is not None and settings.YIELD_GRID_ENABLED:
+            with _timed(timings, "yield_grid"):
+                yield_model = self._load_yield_grid(yield_model, yield_path)
+
+        cascade = None
+        cascade_path = paths.get("cascade")
+        if vision_model is not None and settings.CASCADE_ENABLED:
+            with _timed(timings, "cascade"):
+                cascade = self._load_cascade(cascade_path, contract)
+
+        bundle = ModelBundle(version, vision_model, yield_model, contract, cascade)
+        bundle.load_timings = timings
+        return bundle
+
+    def _load_yield_grid(self, yield_model, yield_path):
+        """Wraps the yield model in its precomputed lookup grid (built on first use)."""
+        grid_dir = settings.YIELD_GRID_DIR
+        if not os.path.isabs(grid_dir):
+            grid_dir = os.path.join(self.base_path, grid_dir)
+        grid = load_yield_grid(
+            yield_model, yield_path,
+            settings.YIELD_GRID_MIN, settings.YIELD_GRID_MAX, settings.YIELD_GRID_POINTS,
+            grid_dir,
+        )
+        max_error = grid.errors["max_abs"]
+        print(f"Yield grid {grid.shape.tolist()} loaded; max error {max_error}, mean {grid.errors['mean_abs']}")
+        if settings.YIELD_GRID_MAX_ERROR is not None and max_error > settings.YIELD_GRID_MAX_ERROR:
+            print(f"Yield grid error exceeds YIELD_GRID_MAX_ERROR={settings.YIELD_GRID_MAX_ERROR}; serving the model")
+            return yield_model
+        return grid
+
+    def _load_cascade(self, path, contract):
+        """Loads the early-exit cascade, or None when it is missing or was trained for other classes."""
+        if not path or not os.path.exists(path):
+            print(f"Error: Cascade not found at {path}; serving the CNN alone")
+            return None
+        cascade = LeafCascade.load(
+            path, threshold=settings.CASCADE_THRESHOLD, shadow_rate=settings.CASCADE_SHADOW_RATE
+        )
+        if cascade.class_names != list(contract["class_names"]):
+            print(f"Error: Cascade classes {cascade.class_names} do not match the vision model's; serving the CNN alone")
+            return None
+        calibrated = cascade.calibration.get("chosen", {})
+        print(
+            f"Cascade loaded; threshold {cascade.threshold}, calibrated early-exit rate "
+            f"{calibrated.get('early_exit_rate')}, accuracy delta {calibrated.get('accuracy_delta')}"
+        )
+        return cascade
 
-        print(f"Loading yield model from {self.yield_model_path}...")
-        if os.path.exists(self.yield_model_path):
-            self.yield_model = joblib.load(self.yield_model_path)
-            print("Yield model loaded successfully.")
+    def _load_vision_backend(self, backend, paths, timings):
+        """
+        Creates the vision inference backend selected by INFERENCE_BACKEND.
+        Both backends expose predict(batch) -> class probabilities.
+        Returns: (backend or None, preprocessing contract)
+        """
+        if backend not in ("keras", "tflite"):
+            print(f"Error: Unknown inference backend '{backend}'")
+            return None, DEFAULT_CONTRACT
+
+        path = paths.get(backend)
+        print(f"Loading vision model ({backend}) from {path}...")
+        if not path or not os.path.exists(path):
+            print(f"Error: Vision model not found at {path}")
+            return None, DEFAULT_CONTRACT
+
+        contract = load_contract(path)
+        if backend == "tflite":
+            vision_model = TFLiteBackend(
+                path,
+                num_threads=settings.TFLITE_NUM_THREADS,
+                pool_size=settings.TFLITE_POOL_SIZE,
+            )
         else:
-            print(f"Error: Yield model not found at {self.yield_model_path}")
+            # Usually the largest part of startup, so it is timed on its own
+            with _timed(timings, "import_tensorflow"):
+                import tensorflow  # noqa: F401
+            vision_model = KerasBackend(path)
+        print("Vision model loaded successfully.")
+        return vision_model, contract
+
+    def warmup_batch_sizes(self, bundle):
+        if settings.WARMUP_BATCH_SIZES:
+            return sorted(set(settings.WARMUP_BATCH_SIZES))
+        if bundle.batcher is not None:
+            return sorted({1, bundle.batcher.max_batch_size})
+        return [1]
+
+    def warmup(self, bundle):
+        """
+        Runs dummy batches through a bundle's models so the first real
+        requests don't pay for graph tracing and tensor allocation.
+        """
+        if not settings.WARMUP_ENABLED:
+            return
+
+        if bundle.vision_model is not None:
+            height, width = bundle.contract["input_size"]
+            # TFLite interpreters are resized per batch size, so warm every pooled one
+            repeats = max(settings.WARMUP_ITERATIONS, getattr(bundle.vision_model, "pool_size", 1))
+            for batch_size in self.warmup_batch_sizes(bundle):
+                batch = np.zeros((batch_size, height, width, 3), dtype=np.float32)
+                for _ in range(repeats):
+                    bundle.predict_batch(batch)
+
+        if bundle.yield_model is not None:
+            bundle.yield_model.predict(np.zeros((1, 3)))
+
+    def reload(self, version=None):
+        """
+        Loads `version` (default: the manifest's active version) on a
+        background thread, warms it and swaps it in. The current version keeps
+        serving until the swap. Returns the loader thread.
+        Raises UnknownModelVersionError / ReloadInProgressError.
+        """
+        version = version or self.registry.active_version
+        self.registry.artifact_paths(version)
+        with self._swap_lock:
+            if self.is_loading or self.reload_status["state"] == "loading":
+                raise ReloadInProgressError("Models are already being loaded.")
+            self.reload_status = {"state": "loading", "version": version, "error": None}
+
+        thread = threading.Thread(target=self._reload, args=(version,), name="model-reload", daemon=True)
+        thread.start()
+        return thread
+
+    def _reload(self, version):
+        bundle = None
+        try:
+            bundle = self.load_bundle(version)
+            if not bundle.complete:
+                raise Exception(f"Model version '{version}' is missing model files.")
+            with _timed(bundle.load_timings, "warmup"):
+                self.warmup(bundle)
+            self._activate(bundle)
+            self.reload_status = {"state": "idle", "version": version, "error": None}
+            print(f"Model version '{version}' is now serving; load timings (s): {bundle.load_timings}")
+        except Exception as e:
+            if bundle is not None:
+                bundle.close()
+            self.reload_status = {"state": "failed", "version": version, "error": str(e)}
+            print(f"Error: Reloading model version '{version}' failed: {e}")
+
+    def _activate(self, bundle):
+        """
+        Atomically makes `bundle` the serving version; the old one becomes
+        previous. The manifest is written first: if that fails, nothing has
+        been swapped and the caller still owns `bundle`.
+        """
+        with self._swap_lock:
+            self.registry.set_active(bundle.version)
+            retired = self.previous_bundle
+            self.previous_bundle, self.bundle = self.bundle, bundle
+            self.state = "ready"
+            self.load_error = None
+        if retired is not None:
+            retired.close()
+
+    def rollback(self):
+        """
+        Swaps the previous version back in. It is still loaded and warm, so
+        this is instant. Returns the version now serving.
+        """
+        with self._swap_lock:
+            if self.reload_status["state"] == "loading":
+                raise ReloadInProgressError("A model reload is in progress.")
+            if self.previous_bundle is None or not self.previous_bundle.complete:
+                raise ValueError("No previous model version is loaded.")
+            # Manifest first, so a failed write leaves the serving version as it was
+            self.registry.set_active(self.previous_bundle.version)
+            self.bundle, self.previous_bundle = self.previous_bundle, self.bundle
+            return self.bundle.version
+
+    def _serving_bundle(self, model_kind, name):
+        """The serving bundle, checked to have `model_kind` loaded."""
+        bundle = self.bundle
+        if bundle is None and self.is_loading:
+            raise ModelNotReadyError(settings.INFERENCE_RETRY_AFTER_SECONDS)
+        if bundle is None or getattr(bundle, model_kind) is None:
+            raise Exception(f"{name} model not loaded.")
+        return bundle
+
+    @staticmethod
+    def _decode(contract, image_bytes):
+        height, width = contract["input_size"]
+        return decode_image(
+            image_bytes,
+            size=(width, height),
+            max_bytes=settings.MAX_IMAGE_BYTES,
+            max_pixels=settings.MAX_IMAGE_PIXELS,
+        )
+
+    @staticmethod
+    def _classify(bundle, img):
+        height, width = bundle.contract["input_size"]
+        if img.size != (width, height):
+            # A model with another input size was swapped in after decoding
+            img = img.resize((width, height))
+
+        predictions = bundle.classify_pixels(np.asarray(img))
+        class_idx = np.argmax(predictions)
+        confidence = float(predictions[class_idx])
+        
+        # Class names in the order the model was trained with
+        return bundle.contract["class_names"][class_idx], confidence
+
+    def decode_image(self, image_bytes):
+        """
+        Decodes image bytes into the RGB image size the vision model expects.
+        Raises InvalidImageError / ImageTooLargeError for bad or oversized uploads.
+        """
+        return self._decode(self.contract, image_bytes)
+
+    def classify_decoded(self, img):
+        """
+        Predicts leaf quality for an image returned by decode_image.
+        Blocks until the image's batch has been scored, so call it from a worker
+        thread rather than the event loop.
+        Returns: (class_name, confidence)
+        """
+        return self._classify(self._serving_bundle("vision_model", "Vision"), img)
 
     def predict_leaf_quality(self, image_bytes):
         """
         Predicts leaf quality from image bytes.
         Returns: (class_name, confidence)
         """
-        if self.vision_model is None:
-            raise Exception("Vision model not loaded.")
-            
-        # Preprocessing
-        img = Image.open(io.BytesIO(image_bytes)).convert("RGB")
-        img = img.resize((224, 224))
-        img_array = np.array(img) / 255.0  # Simple normalization, similar to MobileNetV2
-        img_array = np.expand_dims(img_array, axis=0)
-        
-        # Inference
-        predictions = self.vision_model.predict(img_array)
-        class_idx = np.argmax(predictions[0])
-        confidence = float(predictions[0][class_idx])
-        
-        # Map to class names (Assuming 3 classes based on original src/model_vision.py)
-        # Placeholder mapping - might need refinement based on training labels
-        classes = ["Healthy", "Infected", "Nutrient Deficient"] 
-        return classes[class_idx], confidence
+        bundle = self._serving_bundle("vision_model", "Vision")
+        return self._classify(bundle, self._decode(bundle.contract, image_bytes))
 
     def predict_yield(self, avg_quality, temperature, humidity):
         """
         Predicts cocoon yield based on parameters.
         Args: [Avg_Quality_Score, Temperature, Humidity]
         """
-        if self.yield_model is None:
-            raise Exception("Yield model not loaded.")
+        yield_model = self._serving_bundle("yield_model", "Yield").yield_model
             
         features = np.array([[avg_quality, temperature, humidity]])
-        prediction = self.yield_model.predict(features)
+        prediction = yield_model.predict(features)
         return float(prediction[0])
 
+    def predict_yield_batch(self, features):
+        """
+        Predicts cocoon yield for many rows in one vectorized call.
+        Args: (N, 3) array of [Avg_Quality_Score, Temperature, Humidity]
+        Returns: (N,) array of yields
+        """
+        yield_model = self._serving_bundle("yield_model", "Yield").yield_model
+
+        return yield_model.predict(np.asarray(features, dtype=np.float64))
+
 # Global instance
 ml_service = MLService()
@@ -0,0 +1,147 @@
+import json
+import os
+import shutil
+import threading
+from datetime import datetime, timezone
+
+# Artifact kinds a model version may provide, and their file names
+ARTIFACT_NAMES = {
+    "keras": "leaf_quality_model.h5",
+    "tflite": "leaf_quality_model.tflite",
+    "yield": "yield_model.pkl",
+    # Flat-array export of the yield model (app/utils/flat_forest.py)
+    "yield_flat": "yield_model.npz",
+    # First-stage leaf classifier of the early-exit cascade (app/utils/leaf_cascade.py)
+    "cascade": "leaf_cascade.npz",
+}
+
+# Version served when models/ has no manifest (the flat files shipped in models/)
+DEFAULT_VERSION = "v1"
+
+
+class UnknownModelVersionError(KeyError):
+    """The requested version is not in the manifest."""
+
+
+class ModelRegistry:
+    """
+    Versioned model artifacts described by `models/manifest.json`:
+
+        {
+          "active": "v2",
+          "previous": "v1",
+          "versions": {
+            "v1": {"keras": "leaf_quality_model.h5", "yield": "yield_model.pkl", ...},
+            "v2": {"keras": "versions/v2/leaf_quality_model.h5", ...}
+          }
+        }
+
+    Artifact paths are relative to the models directory. Each vision artifact
+    has its preprocessing contract sidecar (`<name>.json`) next to it.
+    """
+
+    def __init__(self, models_path):
+        self.models_path = models_path
+        self.manifest_path = os.path.join(models_path, "manifest.json")
+        self._lock = threading.Lock()
+
+    def _default_manifest(self):
+        return {
+            "active": DEFAULT_VERSION,
+            "previous": None,
+            "versions": {
+                DEFAULT_VERSION: {
+                    kind: name for kind, name in ARTIFACT_NAMES.items()
+                    if os.path.exists(os.path.join(self.models_path, name))
+                }
+            },
+        }
+
+    def manifest(self):
+        """Returns the parsed manifest (a default one for the flat models/ layout)."""
+        if not os.path.exists(self.manifest_path):
+            return self._default_manifest()
+        with open(self.manifest_path) as f:
+            return json.load(f)
+
+    def _write(self, manifest):
+        # Write-then-rename so readers never see a half-written manifest
+        tmp_path = self.manifest_path + ".tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(manifest, f, indent=2)
+        os.replace(tmp_path, self.manifest_path)
+
+    @property
+    def active_version(self):
+        return self.manifest()["active"]
+
+    @property
+    def previous_version(self):
+        return self.manifest().get("previous")
+
+    def artifact_paths(self, version):
+        """Absolute paths of a version's artifacts, keyed by kind (keras/tflite/yield)."""
+        versions = self.manifest()["versions"]
+        if version not in versions:
+            raise UnknownModelVersionError(version)
+        return {
+            kind: os.path.join(self.models_path, versions[version][kind])
+            for kind in ARTIFACT_NAMES if kind in versions[version]
+        }
+
+    def set_active(self, version):
+        """Marks `version` active and remembers the one it replaces for rollback."""
+        with self._lock:
+            manifest = self.manifest()
+            if version not in manifest["versions"]:
+                raise UnknownModelVersionError(version)
+            if manifest["active"] != version:
+                manifest["previous"] = manifest["active"]
+                manifest["active"] = version
+            self._write(manifest)
+
+    def register(self, version, artifacts, activate=False):
+        """
+        Copies artifacts ({kind: source path}) into `versions/<version>/` and
+        adds the version to the manifest. Kinds not given are shared with the
+        active version, so a new yield model can ship without a new vision
+        model. Returns the manifest entry.
+        """
+        unknown = set(artifacts) - set(ARTIFACT_NAMES)
+        if unknown:
+            raise ValueError(f"Unknown artifact kinds: {sorted(unknown)}")
+
+        with self._lock:
+            manifest = self.manifest()
+            if version in manifest["versions"]:
+                raise ValueError(f"Version '{version}' is already registered.")
+
+            entry = {
+                kind: path for kind, path in manifest["versions"].get(manifest["active"], {}).items()
+                if kind in ARTIFACT_NAMES
+            }
+            version_dir = os.path.join(self.models_path, "versions", version)
+            os.makedirs(version_dir, exist_ok=True)
+            if "yield" in artifacts and "yield_flat" not in artifacts:
+                # Never pair a new yield model with the old one's flat export
+                entry.pop("yield_flat", None)
+                flat_export = os.path.splitext(artifacts["yield"])[0] + ".npz"
+                if os.path.exists(flat_export):
+                    artifacts = {**artifacts, "yield_flat": flat_export}
+            for kind, source in artifacts.items():
+                target = os.path.join(version_dir, ARTIFACT_NAMES[kind])
+                shutil.copy2(source, target)
+                if kind in ("keras", "tflite"):
+                    # Keep the preprocessing contract next to the vision model
+                    contract = os.path.splitext(source)[0] + ".json"
+                    if os.path.exists(contract):
+                        shutil.copy2(contract, os.path.splitext(target)[0] + ".json")
+                entry[kind] = os.path.relpath(target, self.models_path)
+            entry["registered_at"] = datetime.now(timezone.utc).isoformat(timespec="seconds")
+
+            manifest["versions"][version] = entry
+            if activate and manifest["active"] != version:
+                manifest["previous"] = manifest["active"]
+                manifest["active"] = version
+            self._write(manifest)
+            return entry
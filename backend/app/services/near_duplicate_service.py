@@ -0,0 +1,118 @@
+import math
+import threading
+from collections import OrderedDict
+from itertools import combinations
+import numpy as np
+from PIL import Image
+from app.core.config import settings
+
+HASH_BITS = 64
+
+
+def dhash(img):
+    """
+    64-bit difference hash of a decoded PIL image.
+    Robust to re-encoding, recompression, rescaling and small crops.
+    """
+    gray = np.asarray(img.convert("L").resize((9, 8), Image.BILINEAR), dtype=np.int16)
+    bits = (gray[:, 1:] > gray[:, :-1]).ravel()
+    return int(np.packbits(bits).view(">u8")[0])
+
+
+def hamming_distance(a, b):
+    return bin(a ^ b).count("1")
+
+
+class MultiIndexHashIndex:
+    """
+    Hamming-distance index over 64-bit perceptual hashes (multi-index hashing).
+
+    Each hash is split into m disjoint bit chunks of roughly log2(max_entries)
+    bits, one hash table per chunk. Two hashes within `max_distance` bits
+    differ by at most max_distance // m bits on some chunk (pigeonhole), so a
+    lookup probes each table for the chunk values within that radius and only
+    verifies the handful of hashes found there instead of scanning the index.
+    Oldest hashes are dropped past `max_entries`.
+    """
+
+    def __init__(self, max_distance=4, max_entries=1_000_000):
+        self.max_distance = max_distance
+        self.max_entries = max_entries
+
+        # Chunks about as wide as log2(max_entries) keep buckets near one entry
+        chunk_count = max(1, min(HASH_BITS, round(HASH_BITS / math.log2(max(max_entries, 2)))))
+        widths = [HASH_BITS // chunk_count + (1 if i < HASH_BITS % chunk_count else 0) for i in range(chunk_count)]
+        offsets = np.cumsum([0] + widths[:-1]).tolist()
+        self._chunks = [(offset, (1 << width) - 1) for offset, width in zip(offsets, widths)]
+
+        # XOR masks for every chunk value within the per-chunk search radius
+        radius = max_distance // chunk_count
+        self._probes = [
+            [sum(1 << bit for bit in bits) for r in range(radius + 1) for bits in combinations(range(width), r)]
+            for width in widths
+        ]
+
+        self._lock = threading.Lock()
+        self._tables = [{} for _ in self._chunks]
+        # phash -> value, oldest first
+        self._values = OrderedDict()
+        self.lookups = 0
+        self.matches = 0
+
+    def _keys(self, phash):
+        return [(phash >> offset) & mask for offset, mask in self._chunks]
+
+    def add(self, phash, value):
+        with self._lock:
+            if phash in self._values:
+                self._values[phash] = value
+                self._values.move_to_end(phash)
+                return
+            self._values[phash] = value
+            for table, key in zip(self._tables, self._keys(phash)):
+                table.setdefault(key, []).append(phash)
+
+            while len(self._values) > self.max_entries:
+                oldest, _ = self._values.popitem(last=False)
+                for table, key in zip(self._tables, self._keys(oldest)):
+                    bucket = table[key]
+                    bucket.remove(oldest)
+                    if not bucket:
+                        del table[key]
+
+    def find(self, phash):
+        """Returns (value, distance) of the closest stored hash within max_distance, or None."""
+        best = None
+        with self._lock:
+            self.lookups += 1
+            seen = set()
+            for table, probes, key in zip(self._tables, self._probes, self._keys(phash)):
+                for probe in probes:
+                    for candidate in table.get(key ^ probe, ()):
+                        if candidate in seen:
+                            continue
+                        seen.add(candidate)
+                        distance = hamming_distance(phash, candidate)
+                        if distance <= self.max_distance and (best is None or distance < best[1]):
+                            best = (self._values[candidate], distance)
+            if best is not None:
+                self.matches += 1
+        return best
+
+    def __len__(self):
+        return len(self._values)
+
+    def stats(self):
+        with self._lock:
+            return {
+                "entries": len(self._values),
+                "max_distance": self.max_distance,
+                "lookups": self.lookups,
+                "matches": self.matches,
+            }
+
+# Global instance: perceptual hash -> exact image_hash of a cached prediction
+near_duplicate_index = MultiIndexHashIndex(
+    max_distance=settings.PHASH_MAX_DISTANCE,
+    max_entries=settings.PHASH_INDEX_MAX_ENTRIES,
+)
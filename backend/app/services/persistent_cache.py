@@ -0,0 +1,210 @@
+import json
+import logging
+import os
+import queue
+import sqlite3
+import threading
+import time
+
+logger = logging.getLogger("mulberry-leaf-api.persistent-cache")
+
+# Writes are committed in groups of up to this many rows
+_WRITE_BATCH = 512
+
+
+class PersistentCache:
+    """
+    SQLite-backed prediction store that survives restarts.
+
+    Writes, deletes and clears are queued and applied in order by a
+    background thread (write-behind), so callers never wait on disk. If the
+    queue is full a write is dropped and counted; the in-memory tier still
+    has the value. Deletes and clears wait for room instead, so a removed key
+    never comes back from disk. Reads given `max_age` skip rows written
+    longer ago than that. Once the table grows past
+    `max_entries`, the oldest-written rows are deleted down to 90% of the
+    limit and their pages released.
+    """
+
+    def __init__(self, path, max_entries=1_000_000, queue_size=10_000):
+        self.path = path
+        self.max_entries = max_entries
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        self._local = threading.local()
+        self._writes = queue.Queue(maxsize=queue_size)
+        self._stats_lock = threading.Lock()
+        self._written = 0
+        self._dropped = 0
+        self._compactions = 0
+
+        conn = self._connect()
+        # auto_vacuum must be set before the first table is created
+        conn.execute("PRAGMA auto_vacuum=INCREMENTAL")
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS predictions ("
+            " key TEXT PRIMARY KEY, value TEXT NOT NULL, updated_at REAL NOT NULL)"
+        )
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_predictions_updated_at ON predictions(updated_at)")
+        conn.commit()
+        # Upper bound on the row count; replaced rows make it overestimate,
+        # which only triggers an early recount.
+        self._approx_rows = conn.execute("SELECT COUNT(*) FROM predictions").fetchone()[0]
+        conn.close()
+
+        self._writer = threading.Thread(target=self._run, name="persistent-cache-writer", daemon=True)
+        self._writer.start()
+
+    def _connect(self):
+        conn = sqlite3.connect(self.path, check_same_thread=False)
+        # WAL lets request threads read while the writer thread commits
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        return conn
+
+    def _reader(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = self._local.conn = self._connect()
+        return conn
+
+    @staticmethod
+    def _oldest(max_age):
+        return time.time() - max_age if max_age else 0.0
+
+    def lookup(self, key, max_age=None):
+        """Point lookup by key. Returns (value, written at as time.time()) or None."""
+        row = self._reader().execute(
+            "SELECT value, updated_at FROM predictions WHERE key = ? AND updated_at >= ?",
+            (key, self._oldest(max_age)),
+        ).fetchone()
+        return (json.loads(row[0]), row[1]) if row else None
+
+    def get(self, key, max_age=None):
+        """Point lookup by key. Returns the stored value or None."""
+        entry = self.lookup(key, max_age)
+        return entry[0] if entry else None
+
+    def put(self, key, value):
+        """Queues a write without blocking; dropped (and counted) if the queue is full."""
+        try:
+            self._writes.put_nowait(("put", key, json.dumps(value), time.time()))
+        except queue.Full:
+            with self._stats_lock:
+                self._dropped += 1
+
+    def delete(self, key):
+        """Queues removal of a key, after any write of it queued before."""
+        self._writes.put(("delete", key))
+
+    def clear(self):
+        """Queues removal of every row."""
+        self._writes.put(("clear",))
+
+    def load_recent(self, limit, max_age=None):
+        """Returns up to `limit` most recently written (key, value, written at) rows, newest first."""
+        rows = self._reader().execute(
+            "SELECT key, value, updated_at FROM predictions WHERE updated_at >= ?"
+            " ORDER BY updated_at DESC LIMIT ?",
+            (self._oldest(max_age), limit),
+        ).fetchall()
+        return [(key, json.loads(value), updated_at) for key, value, updated_at in rows]
+
+    def flush(self):
+        """Blocks until every queued write has been committed."""
+        self._writes.join()
+
+    def close(self):
+        self._writes.put(None)
+        self._writer.join()
+
+    def _run(self):
+        conn = self._connect()
+        while True:
+            item = self._writes.get()
+            batch = [item]
+            while item is not None and len(batch) < _WRITE_BATCH:
+                try:
+                    item = self._writes.get_nowait()
+                except queue.Empty:
+                    break
+                batch.append(item)
+
+            operations = [entry for entry in batch if entry is not None]
+            try:
+                if operations:
+                    written = self._apply(conn, operations)
+                    conn.commit()
+                    with self._stats_lock:
+                        self._written += written
+                    if self._approx_rows > self.max_entries:
+                        self._compact(conn)
+            except sqlite3.Error:
+                logger.exception("Failed to persist %d cache operations", len(operations))
+            finally:
+                for _ in batch:
+                    self._writes.task_done()
+
+            if len(operations) < len(batch):
+                conn.close()
+                return
+
+    def _apply(self, conn, operations):
+        """Applies queued operations in order; runs of puts go in one statement. Returns rows written."""
+        written = 0
+        rows = []
+
+        def write_rows():
+            nonlocal written
+            if rows:
+                conn.executemany(
+                    "INSERT OR REPLACE INTO predictions (key, value, updated_at) VALUES (?, ?, ?)", rows
+                )
+                written += len(rows)
+                self._approx_rows += len(rows)
+                rows.clear()
+
+        for operation in operations:
+            if operation[0] == "put":
+                rows.append(operation[1:])
+                continue
+            write_rows()
+            if operation[0] == "delete":
+                conn.execute("DELETE FROM predictions WHERE key = ?", (operation[1],))
+            else:
+                conn.execute("DELETE FROM predictions")
+                self._approx_rows = 0
+        write_rows()
+        return written
+
+    def _compact(self, conn):
+        count = conn.execute("SELECT COUNT(*) FROM predictions").fetchone()[0]
+        self._approx_rows = count
+        if count <= self.max_entries:
+            return
+        excess = count - int(self.max_entries * 0.9)
+        conn.execute(
+            "DELETE FROM predictions WHERE key IN"
+            " (SELECT key FROM predictions ORDER BY updated_at LIMIT ?)", (excess,)
+        )
+        conn.commit()
+        conn.execute("PRAGMA incremental_vacuum")
+        self._approx_rows = count - excess
+        with self._stats_lock:
+            self._compactions += 1
+
+    def stats(self):
+        with self._stats_lock:
+            return {
+                "path": self.path,
+                # Tracked by the writer rather than counted; replaced keys are
+                # counted again until the next compaction, so an upper bound
+                "entries": self._approx_rows,
+                "max_entries": self.max_entries,
+                "pending_writes": self._writes.qsize(),
+                "written": self._written,
+                "dropped": self._dropped,
+                "compactions": self._compactions,
+            }
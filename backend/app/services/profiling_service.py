@@ -0,0 +1,189 @@
+import os
+import random
+import re
+import sys
+import threading
+import time
+import uuid
+from collections import Counter
+from fastapi.routing import APIRoute
+from starlette.responses import StreamingResponse
+from app.core.config import settings
+
+# Frames in these modules are threads waiting for work, not doing it
+_IDLE_MODULES = ("threading.py", "selectors.py", "queue.py")
+
+
+class SamplingProfiler:
+    """
+    Samples the Python stacks of every thread each `interval` seconds from a
+    background thread (sys._current_frames), and aggregates them in folded
+    flame-graph format. Unlike cProfile it also sees the inference pool and
+    batcher threads, which is where decode and predict run. Stacks of other
+    requests running at the same time are included too.
+    """
+
+    def __init__(self, interval=0.005, max_seconds=60.0, on_exit=None):
+        self.interval = interval
+        # Stops by itself after max_seconds, e.g. if a stream is never consumed
+        self.max_seconds = max_seconds
+        self.on_exit = on_exit
+        self.stacks = Counter()
+        self.samples = 0
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, name="profiler", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+
+    def _run(self):
+        try:
+            self._sample()
+        finally:
+            if self.on_exit is not None:
+                self.on_exit()
+
+    def _sample(self):
+        own_ident = threading.get_ident()
+        deadline = time.perf_counter() + self.max_seconds
+        while not self._stop.wait(self.interval) and time.perf_counter() < deadline:
+            thread_names = {thread.ident: thread.name for thread in threading.enumerate()}
+            for ident, frame in sys._current_frames().items():
+                if ident == own_ident or os.path.basename(frame.f_code.co_filename) in _IDLE_MODULES:
+                    continue
+                stack = []
+                while frame is not None:
+                    code = frame.f_code
+                    stack.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})")
+                    frame = frame.f_back
+                stack.append(thread_names.get(ident, str(ident)))
+                self.stacks[";".join(reversed(stack))] += 1
+            self.samples += 1
+
+    def folded(self):
+        """One `thread;outer;...;inner count` line per distinct stack (speedscope / flamegraph.pl input)."""
+        return "".join(f"{stack} {count}\n" for stack, count in self.stacks.most_common())
+
+
+class ProfileStore:
+    """Keeps the newest `max_files` profiles in a local directory, deleting the oldest."""
+
+    _name_pattern = re.compile(r"^[\w.-]+\.folded$")
+
+    def __init__(self, directory, max_files=50):
+        self.directory = directory
+        self.max_files = max(1, max_files)
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def new_name(label):
+        return "{}-{}-{}.folded".format(time.strftime("%Y%m%dT%H%M%S"), uuid.uuid4().hex[:8], re.sub(r"[^\w]", "_", label))
+
+    def save(self, name, content):
+        """Writes one profile, dropping the oldest beyond max_files."""
+        with self._lock:
+            os.makedirs(self.directory, exist_ok=True)
+            with open(os.path.join(self.directory, name), "w") as f:
+                f.write(content)
+            for old_name in self.list()[self.max_files:]:
+                os.remove(os.path.join(self.directory, old_name["name"]))
+
+    def list(self):
+        """Stored profiles, newest first."""
+        if not os.path.isdir(self.directory):
+            return []
+        entries = []
+        for name in os.listdir(self.directory):
+            if self._name_pattern.match(name):
+                stat = os.stat(os.path.join(self.directory, name))
+                entries.append({"name": name, "bytes": stat.st_size, "created_at": stat.st_mtime})
+        return sorted(entries, key=lambda entry: (entry["created_at"], entry["name"]), reverse=True)
+
+    def path(self, name):
+        """Path of a stored profile, or None. Only plain profile file names are accepted."""
+        if not self._name_pattern.match(name):
+            return None
+        path = os.path.join(self.directory, name)
+        return path if os.path.isfile(path) else None
+
+
+def _resolve_path(path):
+    # Relative paths are resolved against the backend/ directory
+    base_path = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+    return path if os.path.isabs(path) else os.path.join(base_path, path)
+
+
+profile_store = ProfileStore(_resolve_path(settings.PROFILING_DIR), settings.PROFILING_MAX_FILES)
+
+# One profiled request at a time bounds the overhead; others run unprofiled
+_profiling_slot = threading.Lock()
+
+
+def _wants_profile(request):
+    flag = request.headers.get("x-profile") or request.query_params.get("profile")
+    if flag is not None and flag.lower() in ("1", "true", "yes"):
+        return True
+    return settings.PROFILING_SAMPLE_RATE > 0 and random.random() < settings.PROFILING_SAMPLE_RATE
+
+
+class ProfilingRoute(APIRoute):
+    """
+    Route class that profiles a request end to end (multipart parsing,
+    decode, inference, serialization) when PROFILING_ENABLED is set and the
+    request carries `X-Profile: 1` or `?profile=1`, or is picked by
+    PROFILING_SAMPLE_RATE. The profile name is returned in `X-Profile-Id`
+    and the file can be downloaded from /admin/profiles/{name}.
+    When profiling is disabled a request costs one settings check.
+    """
+
+    def get_route_handler(self):
+        handler = super().get_route_handler()
+        label = self.name
+
+        async def profiled_handler(request):
+            if not settings.PROFILING_ENABLED or not _wants_profile(request):
+                return await handler(request)
+            if not _profiling_slot.acquire(blocking=False):
+                return await handler(request)
+
+            profiler = SamplingProfiler(
+                settings.PROFILING_INTERVAL_MS / 1000,
+                max_seconds=settings.PROFILING_MAX_SECONDS,
+                on_exit=_profiling_slot.release,
+            )
+            name = profile_store.new_name(label)
+            profiler.start()
+
+            def finish():
+                profiler.stop()
+                profile_store.save(name, profiler.folded())
+
+            try:
+                response = await handler(request)
+            except BaseException:
+                finish()
+                raise
+            response.headers["X-Profile-Id"] = name
+
+            if isinstance(response, StreamingResponse):
+                # Keep sampling until the streamed body has been produced
+                body = response.body_iterator
+
+                async def profiled_body():
+                    try:
+                        async for chunk in body:
+                            yield chunk
+                    finally:
+                        finish()
+
+                response.body_iterator = profiled_body()
+            else:
+                finish()
+            return response
+
+        return profiled_handler
@@ -0,0 +1,73 @@
+import json
+import os
+import numpy as np
+
+# -------------------------------------------------------------------------
+# Preprocessing contract shared by training, the Streamlit app and the API.
+#
+# The contract is saved next to the model as `<model name>.json` (e.g.
+# models/leaf_quality_model.h5 -> models/leaf_quality_model.json) so every
+# entry point scales pixels and names classes exactly as the model was
+# trained. This is the only copy: the backend image is built from backend/
+# alone, and src/preprocessing.py loads this file from here. Keep it free of
+# imports from the rest of the app.
+# -------------------------------------------------------------------------
+
+# scaling name -> (multiplier, offset) applied to uint8/float pixels in [0, 255]
+SCALINGS = {
+    "mobilenet_v2": (1.0 / 127.5, -1.0),  # [-1, 1], same as mobilenet_v2.preprocess_input
+    "unit": (1.0 / 255.0, 0.0),           # [0, 1]
+}
+
+DEFAULT_CONTRACT = {
+    "input_size": [224, 224],  # (height, width)
+    "scaling": "mobilenet_v2",
+    # flow_from_dataframe orders classes alphabetically
+    "class_names": ["Excellent", "Moderate", "Poor"],
+}
+
+
+def contract_path(model_path):
+    return os.path.splitext(model_path)[0] + ".json"
+
+
+def save_contract(model_path, class_names, input_size=(224, 224), scaling="mobilenet_v2"):
+    """Writes the preprocessing contract next to a saved model."""
+    if scaling not in SCALINGS:
+        raise ValueError(f"Unknown scaling '{scaling}'")
+    contract = {
+        "input_size": list(input_size),
+        "scaling": scaling,
+        "class_names": list(class_names),
+    }
+    with open(contract_path(model_path), "w") as f:
+        json.dump(contract, f, indent=2)
+    return contract
+
+
+def load_contract(model_path):
+    """Reads the contract saved next to a model, falling back to DEFAULT_CONTRACT."""
+    path = contract_path(model_path)
+    contract = dict(DEFAULT_CONTRACT)
+    if os.path.exists(path):
+        with open(path) as f:
+            contract.update(json.load(f))
+    if contract["scaling"] not in SCALINGS:
+        raise ValueError(f"Unknown scaling '{contract['scaling']}' in {path}")
+    return contract
+
+
+def scale_pixels(pixels, scaling="mobilenet_v2", out=None):
+    """
+    Scales pixel values in [0, 255] for the model, vectorized over any shape:
+    a single (H, W, 3) image or an (N, H, W, 3) batch. Writes float32 into
+    `out` when given (it may be `pixels` itself), without a float64
+    intermediate. Returns the scaled array.
+    """
+    multiplier, offset = SCALINGS[scaling]
+    if out is None:
+        out = np.empty(np.shape(pixels), dtype=np.float32)
+    np.multiply(pixels, np.float32(multiplier), out=out, casting="unsafe")
+    if offset:
+        out += np.float32(offset)
+    return out
@@ -0,0 +1,231 @@
+import io
+import os
+import struct
+import zipfile
+import numpy as np
+
+# -------------------------------------------------------------------------
+# Flat-array evaluator for the yield model (StandardScaler + RandomForest).
+#
+# A fitted Pipeline is exported once into a few NumPy arrays; prediction is
+# then a vectorized tree walk with no sklearn at serving time. Results match
+# Pipeline.predict bit for bit. This is the only copy: src/model_yield.py
+# loads it from here to export at training time (see src/backend_utils.py).
+# Keep it free of imports from the rest of the app.
+# -------------------------------------------------------------------------
+
+
+def _ordered_keys(x):
+    """Maps float64 values to int64 keys so that float order equals int order."""
+    bits = np.asarray(x, dtype=np.float64).view(np.int64)
+    return np.where(bits >= 0, bits, -(bits & 0x7FFFFFFFFFFFFFFF))
+
+
+def _from_ordered_keys(keys):
+    return np.where(keys >= 0, keys, (-keys) | np.int64(np.iinfo(np.int64).min)).view(np.float64)
+
+
+def fold_thresholds(thresholds, means, scales):
+    """
+    Returns, per split, the largest float64 T such that for every float64 x
+        x <= T  <=>  float32((x - mean) / scale) <= threshold
+    which is the test a tree fitted after StandardScaler applies (sklearn
+    trees compare float32 inputs against float64 thresholds). The left-hand
+    side is monotonic in x, so T is found by bisection over the ordered
+    float64 values, all splits at once; no tolerance is involved.
+    """
+    thresholds, means, scales = (np.asarray(a, dtype=np.float64) for a in (thresholds, means, scales))
+
+    def goes_left(keys):
+        x = _from_ordered_keys(keys)
+        # Values beyond float32 range cast to +-inf, which is what sklearn sees too
+        with np.errstate(over="ignore"):
+            return ((x - means) / scales).astype(np.float32) <= thresholds
+
+    largest = np.finfo(np.float64).max
+    lo = np.broadcast_to(_ordered_keys(-largest), thresholds.shape).copy()
+    hi = np.broadcast_to(_ordered_keys(largest), thresholds.shape).copy()
+    always_left, never_left = goes_left(hi), ~goes_left(lo)
+    # Invariant (for the other splits): goes_left(lo) and not goes_left(hi)
+    while True:
+        open_ = (lo < hi - 1) & ~always_left & ~never_left
+        if not open_.any():
+            break
+        # floor((lo + hi) / 2) without overflowing int64
+        mid = (lo >> 1) + (hi >> 1) + (lo & hi & 1)
+        left = goes_left(mid)
+        lo = np.where(open_ & left, mid, lo)
+        hi = np.where(open_ & ~left, mid, hi)
+    return np.where(always_left, np.inf, np.where(never_left, -np.inf, _from_ordered_keys(lo)))
+
+
+class FlatForest:
+    """
+    All trees of a forest concatenated into flat node arrays:
+    `feature`, `threshold` (in raw, unscaled input units), `left`, `right`
+    and `value`, with `roots` holding each tree's first node. Leaves point
+    to themselves, so every row walks exactly `max_depth` steps without
+    branching.
+    """
+
+    def __init__(self, feature, threshold, left, right, value, roots, max_depth, n_features):
+        self.feature = feature
+        self.threshold = threshold
+        self.left = left
+        self.right = right
+        self.value = value
+        self.roots = roots
+        self.max_depth = int(max_depth)
+        self.n_features = int(n_features)
+
+    @classmethod
+    def from_sklearn(cls, model):
+        """
+        Exports a fitted RandomForestRegressor, or a Pipeline of an optional
+        StandardScaler followed by one, with the scaler folded into the
+        thresholds.
+        """
+        steps = [step for _, step in model.steps] if hasattr(model, "steps") else [model]
+        forest = steps[-1]
+        n_features = forest.n_features_in_
+        mean, scale = np.zeros(n_features), np.ones(n_features)
+        if len(steps) == 2:
+            scaler = steps[0]
+            if scaler.mean_ is not None:
+                mean = scaler.mean_
+            if scaler.scale_ is not None:
+                scale = scaler.scale_
+        elif len(steps) != 1:
+            raise ValueError("Expected a forest or a (StandardScaler, forest) pipeline.")
+        if getattr(forest, "n_outputs_", 1) != 1:
+            raise ValueError("Only single-output forests are supported.")
+
+        features, thresholds, lefts, rights, values, roots = [], [], [], [], [], []
+        offset = 0
+        max_depth = 0
+        for estimator in forest.estimators_:
+            tree = estimator.tree_
+            is_leaf = tree.children_left < 0
+            node_ids = np.arange(tree.node_count)
+
+            feature = np.where(is_leaf, 0, tree.feature)
+            features.append(feature)
+            # Leaves compare against +inf, so every row stays on them
+            thresholds.append(np.where(is_leaf, np.inf, tree.threshold))
+            lefts.append(np.where(is_leaf, node_ids, tree.children_left) + offset)
+            rights.append(np.where(is_leaf, node_ids, tree.children_right) + offset)
+            values.append(tree.value[:, 0, 0])
+            roots.append(offset)
+            offset += tree.node_count
+            max_depth = max(max_depth, tree.max_depth)
+
+        feature = np.concatenate(features).astype(np.intp)
+        threshold = np.concatenate(thresholds).astype(np.float64)
+        split = np.isfinite(threshold)
+        threshold[split] = fold_thresholds(threshold[split], mean[feature[split]], scale[feature[split]])
+        return cls(
+            feature,
+            threshold,
+            np.concatenate(lefts).astype(np.intp),
+            np.concatenate(rights).astype(np.intp),
+            np.concatenate(values).astype(np.float64),
+            np.array(roots, dtype=np.intp),
+            max_depth,
+            n_features,
+        )
+
+    def predict(self, X):
+        """Predicts an (N, n_features) batch; returns an (N,) float64 array."""
+        X = np.asarray(X, dtype=np.float64)
+        if X.ndim != 2 or X.shape[1] != self.n_features:
+            raise ValueError(f"Expected input of shape (N, {self.n_features}), got {X.shape}")
+
+        rows = np.arange(X.shape[0])[:, np.newaxis]
+        nodes = np.broadcast_to(self.roots, (X.shape[0], self.roots.size))
+        for _ in range(self.max_depth):
+            go_left = X[rows, self.feature[nodes]] <= self.threshold[nodes]
+            nodes = np.where(go_left, self.left[nodes], self.right[nodes])
+
+        # sklearn adds tree predictions one at a time in tree order and then
+        # divides; cumsum keeps that order (np.sum would reorder the additions)
+        return np.cumsum(self.value[nodes], axis=1)[:, -1] / self.roots.size
+
+    def save(self, path):
+        """
+        Writes an .npz that np.load reads as usual. Members are stored
+        uncompressed with their array data 64-byte aligned in the file, so
+        load(mmap_mode="r") maps them as aligned arrays. The file is written
+        under a temporary name and renamed into place, so workers that have
+        the old file mapped keep reading it unchanged.
+        """
+        arrays = {
+            "feature": self.feature, "threshold": self.threshold, "left": self.left,
+            "right": self.right, "value": self.value, "roots": self.roots,
+            "max_depth": np.array(self.max_depth), "n_features": np.array(self.n_features),
+        }
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with zipfile.ZipFile(tmp_path, "w", zipfile.ZIP_STORED) as archive:
+            for name, array in arrays.items():
+                buffer = io.BytesIO()
+                # .npy headers are padded to a multiple of 64 bytes
+                np.lib.format.write_array(buffer, np.asarray(array))
+                # Fixed timestamp: the same forest always produces the same bytes
+                info = zipfile.ZipInfo(name + ".npy", date_time=(1980, 1, 1, 0, 0, 0))
+                # Pad the local header's extra field (zipalign's 0xD935 record)
+                # so the member's data starts on a 64-byte boundary
+                data_start = archive.fp.tell() + 30 + len(info.filename) + 4
+                padding = -data_start % 64
+                info.extra = struct.pack("<HH", 0xD935, padding) + b"\0" * padding
+                archive.writestr(info, buffer.getvalue())
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path, mmap_mode=None):
+        """
+        Loads a saved forest. With mmap_mode="r" the node arrays are mapped
+        straight from the file instead of read into memory, so processes that
+        load the same file share one page-cached copy and load time does not
+        grow with the forest.
+        """
+        data = _mmap_npz(path, mmap_mode) if mmap_mode else _read_npz(path)
+        return cls(
+            data["feature"].astype(np.intp, copy=False), data["threshold"],
+            data["left"].astype(np.intp, copy=False), data["right"].astype(np.intp, copy=False),
+            data["value"], data["roots"].astype(np.intp, copy=False),
+            data["max_depth"], data["n_features"],
+        )
+
+
+def _read_npz(path):
+    with np.load(path) as data:
+        return {name: data[name] for name in data.files}
+
+
+def _mmap_npz(path, mode):
+    """
+    Memory-maps every array of an uncompressed .npz. np.load ignores
+    mmap_mode for .npz files, but each member is a plain .npy file stored
+    as-is inside the zip, so it can be mapped at its offset in the archive.
+    """
+    arrays = {}
+    with zipfile.ZipFile(path) as archive, open(path, "rb") as f:
+        for member in archive.infolist():
+            if member.compress_type != zipfile.ZIP_STORED:
+                raise ValueError(f"{path} is compressed and cannot be memory-mapped.")
+            # Local file header: 30 fixed bytes, then the name and extra field
+            f.seek(member.header_offset)
+            header = f.read(30)
+            name_length, extra_length = struct.unpack("<HH", header[26:30])
+            f.seek(member.header_offset + 30 + name_length + extra_length)
+            if np.lib.format.read_magic(f) == (1, 0):
+                shape, fortran_order, dtype = np.lib.format.read_array_header_1_0(f)
+            else:
+                shape, fortran_order, dtype = np.lib.format.read_array_header_2_0(f)
+            mapped = np.memmap(
+                path, dtype=dtype, mode=mode, offset=f.tell(), shape=shape,
+                order="F" if fortran_order else "C",
+            )
+            # A plain ndarray view of the same pages; indexing np.memmap
+            # itself goes through slow subclass hooks
+            arrays[member.filename[:-len(".npy")]] = mapped.view(np.ndarray)
+    return arrays
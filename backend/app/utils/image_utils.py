@@ -1,4 +1,25 @@
 import hashlib
+import io
+import os
+import tarfile
+import zipfile
+
+IMAGE_EXTENSIONS = (".jpg", ".jpeg", ".png", ".bmp", ".webp")
+ARCHIVE_EXTENSIONS = (".zip", ".tar", ".tar.gz", ".tgz")
+ARCHIVE_CONTENT_TYPES = {
+    "application/zip",
+    "application/x-zip-compressed",
+    "application/x-tar",
+    "application/gzip",
+    "application/x-gzip",
+}
+
+# Archives may hold this many entries per allowed image (folders, sidecar
+# files, __MACOSX copies); skipped entries are still read past
+ARCHIVE_MEMBERS_PER_IMAGE = 4
+
+class ArchiveTooLargeError(ValueError):
+    """An archive exceeds the image-count, member-count or byte limits."""
 
 def get_image_hash(image_bytes: bytes) -> str:
     """
@@ -6,3 +27,68 @@ def get_image_hash(image_bytes: bytes) -> str:
     Used for caching prediction results.
     """
     return hashlib.sha256(image_bytes).hexdigest()
+
+def is_image_archive(filename: str, content_type: str) -> bool:
+    """
+    Returns True if an upload looks like a zip/tar archive of images.
+    """
+    name = (filename or "").lower()
+    return name.endswith(ARCHIVE_EXTENSIONS) or content_type in ARCHIVE_CONTENT_TYPES
+
+def extract_images_from_archive(archive_bytes: bytes, max_images: int, max_image_bytes: int,
+                                max_total_bytes: int) -> list:
+    """
+    Extracts image files from a zip or tar archive.
+    Returns a list of (filename, image_bytes); non-image members are skipped.
+    Member sizes are checked against the archive headers before anything is
+    decompressed, so a zip bomb is rejected without being expanded. Skipped
+    members count towards `max_total_bytes` too (a compressed tar is
+    decompressed to read past them), and at most ARCHIVE_MEMBERS_PER_IMAGE
+    members per allowed image are read.
+    Raises ValueError for unreadable archives, and ArchiveTooLargeError for
+    more than `max_images` images, an image larger than `max_image_bytes` or
+    more than `max_total_bytes` in all.
+    """
+    images = []
+    total_bytes = 0
+    members = 0
+
+    def add(name, size, read):
+        nonlocal total_bytes, members
+        members += 1
+        if members > ARCHIVE_MEMBERS_PER_IMAGE * max_images:
+            raise ArchiveTooLargeError(f"Archive has more than {ARCHIVE_MEMBERS_PER_IMAGE * max_images} entries.")
+        total_bytes += size
+        if total_bytes > max_total_bytes:
+            raise ArchiveTooLargeError(f"Uploads expand to more than {max_total_bytes} bytes.")
+        if read is None or not name.lower().endswith(IMAGE_EXTENSIONS) or os.path.basename(name).startswith("."):
+            return
+        if len(images) >= max_images:
+            raise ArchiveTooLargeError(f"Archive contains more than {max_images} images.")
+        if size > max_image_bytes:
+            raise ArchiveTooLargeError(f"Archive member '{name}' is larger than {max_image_bytes} bytes.")
+        images.append((name, read()))
+
+    buffer = io.BytesIO(archive_bytes)
+    if zipfile.is_zipfile(buffer):
+        try:
+            with zipfile.ZipFile(buffer) as archive:
+                for info in archive.infolist():
+                    # Reads stop at the declared file_size, so it bounds the real size
+                    add(info.filename, info.file_size, None if info.is_dir() else lambda: archive.read(info))
+        except zipfile.BadZipFile:
+            raise ValueError("Archive must be a valid zip or tar file.")
+        return images
+
+    buffer.seek(0)
+    try:
+        with tarfile.open(fileobj=buffer, mode="r:*") as archive:
+            for member in archive:
+                # Folders and links are counted as entries but have no data
+                if member.isfile():
+                    add(member.name, member.size, lambda: archive.extractfile(member).read())
+                else:
+                    add(member.name, 0, None)
+    except tarfile.TarError:
+        raise ValueError("Archive must be a valid zip or tar file.")
+    return images
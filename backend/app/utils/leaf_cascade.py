@@ -0,0 +1,205 @@
+import json
+import random
+import threading
+import numpy as np
+from app.core.metrics import CASCADE_EXITS, CASCADE_PASSES
+
+# Features are computed on a strided subsample about this many pixels across
+FEATURE_SIZE = 56
+# Pixels at least this bright in every channel are background (leaves are
+# photographed on white)
+BACKGROUND_LEVEL = 230
+HUE_BINS = 8
+
+FEATURE_NAMES = (
+    "leaf_fraction", "mean_red", "mean_green", "mean_blue", "greenness",
+    "saturation", "brightness", "gray_std", "gradient_mean",
+) + tuple(f"hue_{i}" for i in range(HUE_BINS))
+
+# BT.601 luma weights
+_GRAY = np.array([0.299, 0.587, 0.114], dtype=np.float32)
+
+
+def leaf_features(pixels, size=FEATURE_SIZE):
+    """
+    Color and texture statistics of the leaf (non-background) pixels, for one
+    uint8 (H, W, 3) image or an (N, H, W, 3) batch. The prototype dataset's
+    color_intensity, texture_smoothness and moisture_level correspond roughly
+    to greenness, gradient_mean/gray_std and saturation/brightness.
+    Returns: (N, len(FEATURE_NAMES)) float32
+    """
+    pixels = np.asarray(pixels)
+    if pixels.ndim == 3:
+        pixels = pixels[np.newaxis]
+    n, height, width = pixels.shape[:3]
+    x = pixels[:, ::max(1, height // size), ::max(1, width // size)].astype(np.float32) * np.float32(1 / 255)
+
+    brightest, darkest = x.max(axis=-1), x.min(axis=-1)
+    leaf = darkest < BACKGROUND_LEVEL / 255
+    counts = leaf.sum(axis=(1, 2))
+    weights = leaf / np.maximum(counts, 1)[:, np.newaxis, np.newaxis].astype(np.float32)
+
+    def leaf_mean(values):
+        return np.einsum("nhw,nhw->n", values, weights)
+
+    red, green, blue = x[..., 0], x[..., 1], x[..., 2]
+    chroma = brightest - darkest
+    saturation = chroma / np.maximum(brightest, 1e-6)
+    gray = x @ _GRAY
+    gray_mean = leaf_mean(gray)
+    gray_var = leaf_mean(gray * gray) - gray_mean * gray_mean
+    gradient = np.abs(np.diff(gray, axis=1))[:, :, :-1] + np.abs(np.diff(gray, axis=2))[:, :-1, :]
+    gradient_leaf = leaf[:, :-1, :-1]
+    gradient_mean = (gradient * gradient_leaf).sum(axis=(1, 2)) / np.maximum(gradient_leaf.sum(axis=(1, 2)), 1)
+
+    # Hue in [0, 1); gray pixels (no chroma) fall in bin 0
+    safe_chroma = np.maximum(chroma, 1e-6)
+    hue = np.where(
+        brightest == red, ((green - blue) / safe_chroma) % 6,
+        np.where(brightest == green, (blue - red) / safe_chroma + 2, (red - green) / safe_chroma + 4),
+    ) / 6
+    bins = np.minimum((hue * HUE_BINS).astype(np.intp), HUE_BINS - 1)
+    bins += HUE_BINS * np.arange(n)[:, np.newaxis, np.newaxis]
+    hue_histogram = np.bincount(bins[leaf], minlength=n * HUE_BINS).reshape(n, HUE_BINS)
+    hue_histogram = hue_histogram / np.maximum(counts, 1)[:, np.newaxis]
+
+    features = np.column_stack([
+        counts / leaf[0].size,
+        leaf_mean(red),
+        leaf_mean(green),
+        leaf_mean(blue),
+        leaf_mean(green - (red + blue) / 2),
+        leaf_mean(saturation),
+        leaf_mean(brightest),
+        np.sqrt(np.maximum(gray_var, 0)),
+        gradient_mean,
+        hue_histogram,
+    ])
+    return features.astype(np.float32)
+
+
+def sweep_thresholds(confidences, stage_predictions, cnn_predictions, labels, thresholds):
+    """
+    Early-exit rate and accuracy of the cascade at each threshold: images
+    whose first-stage confidence exceeds it keep the first-stage prediction,
+    the rest get the CNN's. `accuracy_delta` is relative to the CNN alone.
+    """
+    cnn_accuracy = float(np.mean(cnn_predictions == labels))
+    rows = []
+    for threshold in thresholds:
+        exits = confidences > threshold
+        final = np.where(exits, stage_predictions, cnn_predictions)
+        accuracy = float(np.mean(final == labels))
+        rows.append({
+            "threshold": round(float(threshold), 4),
+            "early_exit_rate": round(float(np.mean(exits)), 4),
+            "accuracy": round(accuracy, 4),
+            "accuracy_delta": round(accuracy - cnn_accuracy, 4),
+        })
+    return rows
+
+
+def calibrate_threshold(rows, max_accuracy_drop):
+    """
+    The sweep row with the most early exits whose accuracy is at most
+    `max_accuracy_drop` below the CNN's. A threshold of 1.0 never exits, so
+    a sweep that includes it always has an answer.
+    """
+    allowed = [row for row in rows if row["accuracy_delta"] >= -max_accuracy_drop]
+    return max(allowed, key=lambda row: (row["early_exit_rate"], -row["threshold"]))
+
+
+class LeafCascade:
+    """
+    First stage of a two-stage leaf classifier: multinomial logistic
+    regression on leaf_features. When its top probability exceeds
+    `threshold` it answers for the CNN. A `shadow_rate` share of those early
+    exits is also scored by the CNN to measure live agreement.
+    """
+
+    def __init__(self, mean, scale, weights, bias, class_names, threshold, calibration=None, shadow_rate=0.0):
+        self.mean = np.asarray(mean, dtype=np.float32)
+        self.scale = np.asarray(scale, dtype=np.float32)
+        self.weights = np.asarray(weights, dtype=np.float32)
+        self.bias = np.asarray(bias, dtype=np.float32)
+        self.class_names = list(class_names)
+        self.threshold = float(threshold)
+        # Sweep and chosen threshold from scripts/train_cascade.py
+        self.calibration = calibration or {}
+        self.shadow_rate = shadow_rate
+        self._lock = threading.Lock()
+        self._counts = {"images": 0, "early_exits": 0, "shadow_samples": 0, "shadow_agreements": 0}
+
+    def predict_proba(self, features):
+        logits = ((features - self.mean) / self.scale) @ self.weights + self.bias
+        logits -= logits.max(axis=1, keepdims=True)
+        probabilities = np.exp(logits)
+        return probabilities / probabilities.sum(axis=1, keepdims=True)
+
+    def classify(self, pixels):
+        """Class probabilities for one uint8 image or a batch: (N, num_classes)."""
+        return self.predict_proba(leaf_features(pixels))
+
+    def accepts(self, probabilities):
+        """Whether first-stage probabilities for one image are confident enough to answer; counted."""
+        exit_early = float(np.max(probabilities)) > self.threshold
+        (CASCADE_EXITS if exit_early else CASCADE_PASSES).inc()
+        with self._lock:
+            self._counts["images"] += 1
+            self._counts["early_exits"] += exit_early
+        return exit_early
+
+    def sample_shadow(self):
+        return self.shadow_rate > 0 and random.random() < self.shadow_rate
+
+    def record_shadow(self, probabilities, cnn_probabilities):
+        with self._lock:
+            self._counts["shadow_samples"] += 1
+            self._counts["shadow_agreements"] += int(np.argmax(probabilities) == np.argmax(cnn_probabilities))
+
+    def stats(self):
+        with self._lock:
+            counts = dict(self._counts)
+        calibrated = self.calibration.get("chosen", {})
+        return {
+            "threshold": self.threshold,
+            "images": counts["images"],
+            "early_exits": counts["early_exits"],
+            "early_exit_rate": round(counts["early_exits"] / counts["images"], 4) if counts["images"] else None,
+            # Top-1 agreement with the CNN on sampled early exits
+            "shadow_samples": counts["shadow_samples"],
+            "shadow_agreement": (
+                round(counts["shadow_agreements"] / counts["shadow_samples"], 4) if counts["shadow_samples"] else None
+            ),
+            # Measured on held-out images when the cascade was trained
+            "calibrated_threshold": calibrated.get("threshold"),
+            "calibrated_early_exit_rate": calibrated.get("early_exit_rate"),
+            "calibrated_accuracy_delta": calibrated.get("accuracy_delta"),
+        }
+
+    def save(self, path):
+        np.savez(
+            path,
+            mean=self.mean,
+            scale=self.scale,
+            weights=self.weights,
+            bias=self.bias,
+            class_names=np.array(self.class_names),
+            threshold=np.float64(self.threshold),
+            calibration=np.array(json.dumps(self.calibration)),
+        )
+
+    @classmethod
+    def load(cls, path, threshold=None, shadow_rate=0.0):
+        """Loads a saved cascade; `threshold` overrides the calibrated one."""
+        with np.load(path) as data:
+            return cls(
+                data["mean"],
+                data["scale"],
+                data["weights"],
+                data["bias"],
+                data["class_names"].tolist(),
+                float(data["threshold"]) if threshold is None else threshold,
+                calibration=json.loads(str(data["calibration"])),
+                shadow_rate=shadow_rate,
+            )
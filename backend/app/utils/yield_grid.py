@@ -0,0 +1,175 @@
+import hashlib
+import json
+import os
+import numpy as np
+from app.utils.flat_forest import FlatForest
+
+# Bump when the cached file layout or the build changes
+GRID_FORMAT = 1
+
+
+def grid_axes(lower, upper, points):
+    """Evenly spaced coordinates of each grid axis."""
+    return [np.linspace(lo, hi, int(n)) for lo, hi, n in zip(lower, upper, points)]
+
+
+def evaluate_on_grid(forest, axes):
+    """
+    Exact forest predictions at every point of a grid. Rather than walking each
+    tree once per point, every leaf adds its value to the block of grid points
+    that reaches it, so the cost is one pass over the grid per tree. Trees are
+    added in order, which keeps sklearn's summation order.
+    """
+    shape = tuple(len(axis) for axis in axes)
+    total = np.zeros(shape)
+    for root in forest.roots:
+        stack = [(root, [(0, n) for n in shape])]
+        while stack:
+            node, box = stack.pop()
+            if forest.left[node] == node:
+                total[tuple(slice(lo, hi) for lo, hi in box)] += forest.value[node]
+                continue
+            feature = forest.feature[node]
+            # Grid points with x <= threshold go left
+            split = int(np.searchsorted(axes[feature], forest.threshold[node], side="right"))
+            lo, hi = box[feature]
+            if split > lo:
+                stack.append((forest.left[node], box[:feature] + [(lo, min(hi, split))] + box[feature + 1:]))
+            if split < hi:
+                stack.append((forest.right[node], box[:feature] + [(max(lo, split), hi)] + box[feature + 1:]))
+    return total / forest.roots.size
+
+
+class YieldGrid:
+    """
+    Yield predictions precomputed on a regular (quality, temperature,
+    humidity) grid and answered by trilinear interpolation. Rows outside the
+    grid are passed to `model`. `values` is usually a read-only memmap shared
+    by all workers through the page cache.
+    """
+
+    def __init__(self, values, lower, upper, model, errors=None):
+        self.values = values
+        self.lower = np.asarray(lower, dtype=np.float64)
+        self.upper = np.asarray(upper, dtype=np.float64)
+        self.shape = np.array(values.shape)
+        self.step = (self.upper - self.lower) / (self.shape - 1)
+        # Flat-index offsets of a cell's 8 corners
+        strides = np.array([self.shape[1] * self.shape[2], self.shape[2], 1])
+        self._corners = np.array([[a, b, c] for a in (0, 1) for b in (0, 1) for c in (0, 1)])
+        self._corner_offsets = self._corners @ strides
+        self._strides = strides
+        self.model = model
+        # Measured approximation error against the model (see measure_error)
+        self.errors = errors or {}
+
+    def contains(self, X):
+        return np.all((X >= self.lower) & (X <= self.upper), axis=1)
+
+    def interpolate(self, X):
+        """Trilinear interpolation for (N, 3) rows inside the grid."""
+        position = (X - self.lower) / self.step
+        cell = np.clip(np.floor(position).astype(np.intp), 0, self.shape - 2)
+        fraction = position - cell
+        corner_values = self.values.reshape(-1)[(cell @ self._strides)[:, np.newaxis] + self._corner_offsets]
+        weights = np.prod(
+            np.where(self._corners[np.newaxis], fraction[:, np.newaxis], 1 - fraction[:, np.newaxis]),
+            axis=2,
+        )
+        return np.sum(weights * corner_values, axis=1)
+
+    def _interpolate_row(self, row):
+        # Plain-float version of interpolate() for the single-row endpoint,
+        # where NumPy's per-call overhead dominates
+        cell, fraction = [], []
+        for x, lower, step, n in zip(row, self.lower.tolist(), self.step.tolist(), self.shape.tolist()):
+            position = (x - lower) / step
+            i = min(max(int(position), 0), n - 2)
+            cell.append(i)
+            fraction.append(position - i)
+        (i, j, k), (fi, fj, fk) = cell, fraction
+        block = self.values[i:i + 2, j:j + 2, k:k + 2].tolist()
+        total = 0.0
+        for a, wa in ((0, 1 - fi), (1, fi)):
+            for b, wb in ((0, 1 - fj), (1, fj)):
+                plane = block[a][b]
+                total += wa * wb * ((1 - fk) * plane[0] + fk * plane[1])
+        return total
+
+    def predict(self, X):
+        """Predicts an (N, 3) batch; rows outside the grid use the model."""
+        X = np.asarray(X, dtype=np.float64)
+        if X.shape == (1, 3):
+            row = X[0].tolist()
+            if all(lo <= x <= hi for x, lo, hi in zip(row, self.lower.tolist(), self.upper.tolist())):
+                return np.array([self._interpolate_row(row)])
+        inside = self.contains(X)
+        if inside.all():
+            return self.interpolate(X)
+        predictions = np.empty(X.shape[0])
+        predictions[inside] = self.interpolate(X[inside])
+        predictions[~inside] = self.model.predict(X[~inside])
+        return predictions
+
+    def measure_error(self, samples=20000, seed=0):
+        """Compares the grid with the model on random rows inside the grid."""
+        rng = np.random.default_rng(seed)
+        X = rng.uniform(self.lower, self.upper, size=(samples, 3))
+        error = np.abs(self.interpolate(X) - self.model.predict(X))
+        worst = int(np.argmax(error))
+        return {
+            "samples": samples,
+            "max_abs": round(float(error[worst]), 6),
+            "p99_abs": round(float(np.percentile(error, 99)), 6),
+            "mean_abs": round(float(error.mean()), 6),
+            "worst_row": [round(float(v), 4) for v in X[worst]],
+        }
+
+    def stats(self):
+        return {
+            "lower": self.lower.tolist(),
+            "upper": self.upper.tolist(),
+            "points": self.shape.tolist(),
+            "bytes": int(self.values.nbytes),
+            "errors": self.errors,
+        }
+
+
+def _grid_key(model_path, lower, upper, points):
+    digest = hashlib.sha256()
+    with open(model_path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            digest.update(chunk)
+    digest.update(json.dumps([GRID_FORMAT, list(lower), list(upper), list(points)]).encode())
+    return digest.hexdigest()[:16]
+
+
+def load_or_build(model, model_path, lower, upper, points, cache_dir, error_samples=20000):
+    """
+    Returns a YieldGrid for `model` (a FlatForest or the sklearn pipeline
+    loaded from `model_path`). The grid is cached in `cache_dir` under a key
+    of the model file's hash and the grid spec; the first worker builds it and
+    the others memory-map the same file.
+    """
+    name = f"yield_grid-{_grid_key(model_path, lower, upper, points)}"
+    values_path = os.path.join(cache_dir, name + ".npy")
+    meta_path = os.path.join(cache_dir, name + ".json")
+
+    if not (os.path.exists(values_path) and os.path.exists(meta_path)):
+        forest = model if isinstance(model, FlatForest) else FlatForest.from_sklearn(model)
+        values = evaluate_on_grid(forest, grid_axes(lower, upper, points)).astype(np.float32)
+        errors = YieldGrid(values, lower, upper, model).measure_error(error_samples)
+
+        # Write-then-rename, so workers building at the same time never read a partial file
+        os.makedirs(cache_dir, exist_ok=True)
+        suffix = f".{os.getpid()}.tmp"
+        with open(values_path + suffix, "wb") as f:
+            np.save(f, values)
+        with open(meta_path + suffix, "w") as f:
+            json.dump({"errors": errors}, f)
+        os.replace(values_path + suffix, values_path)
+        os.replace(meta_path + suffix, meta_path)
+
+    with open(meta_path) as f:
+        errors = json.load(f)["errors"]
+    return YieldGrid(np.load(values_path, mmap_mode="r"), lower, upper, model, errors)
@@ -0,0 +1,71 @@
+import csv
+import io
+import json
+import numpy as np
+
+# Same feature order as src/train_yield.py
+YIELD_FEATURE_COLUMNS = ["avg_quality_score", "temperature", "humidity"]
+
+# JSON requests use the field names of the single-row /predict/yield body
+YIELD_REQUEST_FIELDS = ["avg_quality", "temperature", "humidity"]
+
+def parse_yield_csv(text: str, max_rows: int, chunk_size: int = 10_000) -> np.ndarray:
+    """
+    Parses CSV text with avg_quality_score, temperature and humidity columns
+    (any order, extra columns ignored) into an (N, 3) float64 feature matrix.
+    Rows are converted `chunk_size` at a time, so at most one chunk is held
+    as Python floats.
+    Raises ValueError on missing columns, bad values or more than `max_rows` rows.
+    """
+    reader = csv.reader(io.StringIO(text))
+    header = [name.strip() for name in next(reader, [])]
+    missing = [name for name in YIELD_FEATURE_COLUMNS if name not in header]
+    if missing:
+        raise ValueError(f"CSV is missing required columns: {', '.join(missing)}")
+    indices = [header.index(name) for name in YIELD_FEATURE_COLUMNS]
+
+    chunks, rows, row_count = [], [], 0
+    for line_number, row in enumerate(reader, start=2):
+        if not row:
+            continue
+        if row_count >= max_rows:
+            raise ValueError(f"At most {max_rows} rows per batch.")
+        try:
+            rows.append([float(row[i]) for i in indices])
+        except (IndexError, ValueError):
+            raise ValueError(f"Invalid value on CSV line {line_number}.")
+        row_count += 1
+        if len(rows) == chunk_size:
+            chunks.append(np.array(rows, dtype=np.float64))
+            rows = []
+    chunks.append(np.array(rows, dtype=np.float64).reshape(-1, 3))
+    return np.concatenate(chunks)
+
+def parse_yield_records(records, max_rows: int, chunk_size: int = 10_000) -> np.ndarray:
+    """
+    Converts a JSON array of {avg_quality, temperature, humidity} objects into
+    an (N, 3) float64 feature matrix, filled `chunk_size` rows at a time.
+    Raises ValueError on malformed items or more than `max_rows` items.
+    """
+    if not isinstance(records, list):
+        raise ValueError("Body must be a JSON array of yield requests.")
+    if len(records) > max_rows:
+        raise ValueError(f"At most {max_rows} rows per batch.")
+    features = np.empty((len(records), 3), dtype=np.float64)
+    try:
+        for start in range(0, len(records), chunk_size):
+            chunk = records[start:start + chunk_size]
+            features[start:start + len(chunk)] = [
+                [float(record[name]) for name in YIELD_REQUEST_FIELDS] for record in chunk
+            ]
+    except (KeyError, TypeError, ValueError):
+        raise ValueError(f"Each item needs numeric {', '.join(YIELD_REQUEST_FIELDS)}.")
+    return features
+
+def parse_yield_json(body: bytes, max_rows: int, chunk_size: int = 10_000) -> np.ndarray:
+    """Decodes a JSON request body and converts it with parse_yield_records; CPU-bound, run it off the event loop."""
+    try:
+        records = json.loads(body)
+    except (UnicodeDecodeError, json.JSONDecodeError):
+        raise ValueError("Body must be valid JSON.")
+    return parse_yield_records(records, max_rows, chunk_size)
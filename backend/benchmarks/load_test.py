@@ -0,0 +1,398 @@
+"""
+Load-test harness for the backend.
+
+`run` starts the API under uvicorn with small stand-in models (or your own
+models directory), sends synthetic leaf images from
+src/data_generator.generate_synthetic_images and yield rows at a fixed
+concurrency, and writes RPS and latency percentiles per endpoint and per
+cache hit/miss to JSON. `compare` diffs two result files and exits non-zero
+on a regression.
+
+    python benchmarks/load_test.py run --concurrency 16 --requests 2000 --output results.json
+    python benchmarks/load_test.py compare baseline.json results.json --max-regression 0.10
+"""
+import argparse
+import asyncio
+import json
+import os
+import platform
+import random
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+
+import httpx
+import numpy as np
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+REPO_ROOT = os.path.dirname(BACKEND_DIR)
+# src.data_generator and src.model_yield live at the repository root
+sys.path.insert(0, REPO_ROOT)
+
+LEAF_ENDPOINT = "/predict/leaf-quality"
+YIELD_ENDPOINT = "/predict/yield"
+
+
+# -------------------------------------------------------------------------
+# Fixtures: stand-in models, images and yield rows
+# -------------------------------------------------------------------------
+
+def build_stand_in_models(models_dir, seed):
+    """
+    Writes a tiny leaf-quality CNN (.h5 and .tflite, same input contract as
+    the real model) and a yield model trained on synthetic data, plus a
+    manifest. The CNN is cheap on purpose: the benchmark measures the
+    serving path (HTTP, decode, batching, caching), not model FLOPs.
+    """
+    import tensorflow as tf
+    from src.data_generator import generate_yield_data
+    from src.model_yield import YieldModel
+    from src.preprocessing import save_contract
+    import pandas as pd
+
+    os.makedirs(models_dir, exist_ok=True)
+    tf.keras.utils.set_random_seed(seed)
+    model = tf.keras.Sequential([
+        tf.keras.Input(shape=(224, 224, 3)),
+        tf.keras.layers.Conv2D(8, 3, strides=4, activation="relu"),
+        tf.keras.layers.GlobalAveragePooling2D(),
+        tf.keras.layers.Dense(3, activation="softmax"),
+    ])
+    h5_path = os.path.join(models_dir, "leaf_quality_model.h5")
+    model.save(h5_path)
+    save_contract(h5_path, ["Excellent", "Moderate", "Poor"])
+    with open(os.path.join(models_dir, "leaf_quality_model.tflite"), "wb") as f:
+        f.write(tf.lite.TFLiteConverter.from_keras_model(model).convert())
+
+    np.random.seed(seed)
+    csv_path = os.path.join(models_dir, "cocoon_yield.csv")
+    generate_yield_data(csv_path, num_batches=500)
+    df = pd.read_csv(csv_path)
+    yield_model = YieldModel()
+    yield_model.train(df[["avg_quality_score", "temperature", "humidity"]].values, df["cocoon_yield"])
+    yield_model.save(os.path.join(models_dir, "yield_model.pkl"))
+
+    with open(os.path.join(models_dir, "manifest.json"), "w") as f:
+        json.dump({
+            "active": "stand-in",
+            "previous": None,
+            "versions": {"stand-in": {
+                "keras": "leaf_quality_model.h5",
+                "tflite": "leaf_quality_model.tflite",
+                "yield": "yield_model.pkl",
+            }},
+        }, f, indent=2)
+
+
+def load_images(work_dir, num_images, seed):
+    """Synthetic leaf JPEGs from the training data generator, as bytes."""
+    from src.data_generator import generate_synthetic_images
+
+    images_dir = os.path.join(work_dir, "images")
+    np.random.seed(seed)
+    generate_synthetic_images(output_dir=images_dir, num_samples=num_images)
+    images = []
+    for name in sorted(os.listdir(images_dir)):
+        if name.endswith(".jpg"):
+            with open(os.path.join(images_dir, name), "rb") as f:
+                images.append(f.read())
+    return images
+
+
+def load_yield_rows(work_dir, num_rows, seed):
+    from src.data_generator import generate_yield_data
+    import pandas as pd
+
+    csv_path = os.path.join(work_dir, "yield_rows.csv")
+    np.random.seed(seed)
+    generate_yield_data(csv_path, num_batches=num_rows)
+    df = pd.read_csv(csv_path)
+    return [
+        {"avg_quality": row.avg_quality_score, "temperature": row.temperature, "humidity": row.humidity}
+        for row in df.itertuples()
+    ]
+
+
+# -------------------------------------------------------------------------
+# Server
+# -------------------------------------------------------------------------
+
+def _free_port():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+class LocalServer:
+    """Runs `uvicorn app.main:app` from backend/ in a subprocess until ready."""
+
+    def __init__(self, env, workers=1):
+        self.port = _free_port()
+        self.url = f"http://127.0.0.1:{self.port}"
+        self.env = {**os.environ, **env}
+        self.workers = workers
+        self.process = None
+
+    def __enter__(self):
+        self.process = subprocess.Popen(
+            [sys.executable, "-m", "uvicorn", "app.main:app", "--host", "127.0.0.1",
+             "--port", str(self.port), "--workers", str(self.workers), "--log-level", "warning"],
+            cwd=BACKEND_DIR,
+            env=self.env,
+        )
+        return self
+
+    def wait_ready(self, timeout):
+        deadline = time.time() + timeout
+        while time.time() < deadline:
+            if self.process.poll() is not None:
+                raise RuntimeError(f"Server exited with code {self.process.returncode}")
+            try:
+                if httpx.get(f"{self.url}/health/ready", timeout=1).status_code == 200:
+                    return
+            except httpx.HTTPError:
+                pass
+            time.sleep(0.2)
+        raise TimeoutError(f"Server not ready after {timeout}s")
+
+    def __exit__(self, *exc):
+        self.process.terminate()
+        try:
+            self.process.wait(timeout=30)
+        except subprocess.TimeoutExpired:
+            self.process.kill()
+
+
+# -------------------------------------------------------------------------
+# Load generation
+# -------------------------------------------------------------------------
+
+async def drive(client, send, total, concurrency):
+    """
+    Runs `send(i)` for i in range(total) with `concurrency` requests in flight.
+    Returns (records, elapsed seconds); each record is (label, latency seconds).
+    """
+    records = []
+    counter = iter(range(total))
+
+    async def worker():
+        for i in counter:
+            started = time.perf_counter()
+            try:
+                label = await send(client, i)
+            except httpx.HTTPError:
+                label = "error"
+            records.append((label, time.perf_counter() - started))
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    return records, time.perf_counter() - started
+
+
+def leaf_sender(images, hit_ratio, seed):
+    """
+    Re-sends an already sent image with probability `hit_ratio`; otherwise a
+    new variant of a synthetic image (unique trailing bytes after the JPEG
+    end marker give it a new hash but the same decode cost). Requests are
+    labelled hit/miss from the response's `cached` flag.
+    """
+    rng = random.Random(seed)
+    sent = []
+
+    async def send(client, i):
+        if sent and rng.random() < hit_ratio:
+            body = rng.choice(sent)
+        else:
+            body = images[i % len(images)] + f"bench-{seed}-{i}".encode()
+            sent.append(body)
+        response = await client.post(LEAF_ENDPOINT, files={"file": ("leaf.jpg", body, "image/jpeg")})
+        if response.status_code != 200:
+            return "error"
+        return "hit" if response.json()["cached"] else "miss"
+
+    return send
+
+
+def yield_sender(rows):
+    async def send(client, i):
+        response = await client.post(YIELD_ENDPOINT, json=rows[i % len(rows)])
+        return "ok" if response.status_code == 200 else "error"
+
+    return send
+
+
+def summarize(latencies, elapsed):
+    latencies = np.asarray(latencies) * 1000
+    if latencies.size == 0:
+        return {"requests": 0, "rps": 0.0, "latency_ms": None}
+    p50, p95, p99 = np.percentile(latencies, [50, 95, 99])
+    return {
+        "requests": int(latencies.size),
+        "rps": round(latencies.size / elapsed, 2),
+        "latency_ms": {
+            "mean": round(float(latencies.mean()), 3),
+            "p50": round(float(p50), 3),
+            "p95": round(float(p95), 3),
+            "p99": round(float(p99), 3),
+            "max": round(float(latencies.max()), 3),
+        },
+    }
+
+
+def report_endpoint(records, elapsed):
+    """Overall numbers plus one entry per cache label (hit/miss) and for errors."""
+    report = {"overall": summarize([latency for label, latency in records if label != "error"], elapsed)}
+    report["overall"]["errors"] = sum(1 for label, _ in records if label == "error")
+    for label in sorted({label for label, _ in records} - {"ok"}):
+        report[label] = summarize([latency for l, latency in records if l == label], elapsed)
+    return report
+
+
+async def run_load(url, args, images, rows):
+    results = {}
+    limits = httpx.Limits(max_connections=args.concurrency, max_keepalive_connections=args.concurrency)
+    async with httpx.AsyncClient(base_url=url, limits=limits, timeout=120) as client:
+        scenarios = []
+        if "leaf-quality" in args.endpoints:
+            scenarios.append((LEAF_ENDPOINT, leaf_sender(images, args.hit_ratio, args.seed)))
+        if "yield" in args.endpoints:
+            scenarios.append((YIELD_ENDPOINT, yield_sender(rows)))
+
+        for endpoint, send in scenarios:
+            if args.warmup:
+                await drive(client, send, args.warmup, args.concurrency)
+            records, elapsed = await drive(client, send, args.requests, args.concurrency)
+            results[endpoint] = {"elapsed_s": round(elapsed, 3), **report_endpoint(records, elapsed)}
+
+        server_stats = (await client.get("/stats")).json()
+    return results, server_stats
+
+
+def _git_commit():
+    try:
+        return subprocess.check_output(["git", "rev-parse", "HEAD"], cwd=REPO_ROOT, text=True).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run(args):
+    with tempfile.TemporaryDirectory(prefix="mulberry-bench-") as work_dir:
+        images = load_images(work_dir, args.images, args.seed)
+        rows = load_yield_rows(work_dir, 1000, args.seed)
+
+        if args.url:
+            results, server_stats = asyncio.run(run_load(args.url, args, images, rows))
+        else:
+            models_dir = args.models_dir
+            if models_dir is None:
+                models_dir = os.path.join(work_dir, "models")
+                build_stand_in_models(models_dir, args.seed)
+            env = {
+                "MODELS_DIR": os.path.abspath(models_dir),
+                "INFERENCE_BACKEND": args.backend,
+                "PERSISTENT_CACHE_ENABLED": "false",
+            }
+            env.update(dict(item.split("=", 1) for item in args.env))
+            with LocalServer(env, workers=args.workers) as server:
+                server.wait_ready(args.startup_timeout)
+                results, server_stats = asyncio.run(run_load(server.url, args, images, rows))
+
+    report = {
+        "meta": {
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+            "git_commit": _git_commit(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpu_count": os.cpu_count(),
+            "args": {k: v for k, v in vars(args).items() if k != "func"},
+        },
+        "endpoints": results,
+        "server_stats": server_stats,
+    }
+    print(json.dumps(report["endpoints"], indent=2))
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+        print(f"Saved results to {args.output}")
+
+
+# -------------------------------------------------------------------------
+# Comparison
+# -------------------------------------------------------------------------
+
+def compare_reports(baseline, candidate, max_regression):
+    """
+    Compares matching endpoint/label entries. Latency percentiles may grow
+    and RPS may drop by at most `max_regression` (a fraction).
+    Returns (rows, regressions).
+    """
+    rows, regressions = [], []
+    for endpoint, labels in candidate["endpoints"].items():
+        for label, stats in labels.items():
+            base = baseline["endpoints"].get(endpoint, {}).get(label)
+            if not isinstance(stats, dict) or not base or not base.get("latency_ms") or not stats.get("latency_ms"):
+                continue
+            checks = [("rps", base["rps"], stats["rps"], False)] + [
+                (p, base["latency_ms"][p], stats["latency_ms"][p], True) for p in ("p50", "p95", "p99")
+            ]
+            for metric, old, new, higher_is_worse in checks:
+                change = (new - old) / old if old else 0.0
+                regressed = change > max_regression if higher_is_worse else change < -max_regression
+                row = (f"{endpoint} [{label}]", metric, old, new, change, regressed)
+                rows.append(row)
+                if regressed:
+                    regressions.append(row)
+    return rows, regressions
+
+
+def compare(args):
+    with open(args.baseline) as f:
+        baseline = json.load(f)
+    with open(args.candidate) as f:
+        candidate = json.load(f)
+
+    rows, regressions = compare_reports(baseline, candidate, args.max_regression)
+    print(f"{'endpoint':42} {'metric':6} {'baseline':>10} {'candidate':>10} {'change':>8}")
+    for name, metric, old, new, change, regressed in rows:
+        flag = "  REGRESSION" if regressed else ""
+        print(f"{name:42} {metric:6} {old:>10.2f} {new:>10.2f} {change:>+8.1%}{flag}")
+    if regressions:
+        print(f"{len(regressions)} metric(s) regressed by more than {args.max_regression:.0%}.")
+        sys.exit(1)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Backend load test and regression check.")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    run_parser = subparsers.add_parser("run", help="Start the API and measure it")
+    run_parser.add_argument("--endpoints", nargs="+", choices=["leaf-quality", "yield"], default=["leaf-quality", "yield"])
+    run_parser.add_argument("--concurrency", type=int, default=16)
+    run_parser.add_argument("--requests", type=int, default=1000, help="Measured requests per endpoint")
+    run_parser.add_argument("--warmup", type=int, default=50, help="Unmeasured requests per endpoint first")
+    run_parser.add_argument("--hit-ratio", type=float, default=0.5, help="Share of leaf requests re-sending a seen image")
+    run_parser.add_argument("--images", type=int, default=50, help="Synthetic base images")
+    run_parser.add_argument("--seed", type=int, default=42)
+    run_parser.add_argument("--backend", choices=["keras", "tflite"], default="keras")
+    run_parser.add_argument("--models-dir", default=None, help="Serve these models instead of the stand-ins")
+    run_parser.add_argument("--workers", type=int, default=1, help="uvicorn worker processes")
+    run_parser.add_argument("--env", nargs="*", default=[], metavar="KEY=VALUE", help="Extra settings for the server")
+    run_parser.add_argument("--url", default=None, help="Benchmark an already running server instead")
+    run_parser.add_argument("--startup-timeout", type=float, default=300)
+    run_parser.add_argument("--output", default=None, help="Write the JSON results here")
+    run_parser.set_defaults(func=run)
+
+    compare_parser = subparsers.add_parser("compare", help="Diff two result files")
+    compare_parser.add_argument("baseline")
+    compare_parser.add_argument("candidate")
+    compare_parser.add_argument("--max-regression", type=float, default=0.10)
+    compare_parser.set_defaults(func=compare)
+
+    args = parser.parse_args()
+    args.func(args)
+
+
+if __name__ == "__main__":
+    main()
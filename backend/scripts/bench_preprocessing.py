@@ -0,0 +1,124 @@
+import argparse
+import io
+import json
+import os
+import sys
+import time
+import tracemalloc
+
+import numpy as np
+from PIL import Image, ImageDraw
+
+# Allow `python scripts/bench_preprocessing.py` from the backend/ directory
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.utils.preprocessing import BatchBuffer, decode_image
+
+
+def make_phone_jpeg(width=4000, height=3000):
+    """Synthetic 12 MP leaf photo with sensor-like noise, saved as a phone would."""
+    rng = np.random.default_rng(0)
+    pixels = rng.normal(235, 12, size=(height, width, 3)).clip(0, 255).astype(np.uint8)
+    img = Image.fromarray(pixels)
+    ImageDraw.Draw(img).ellipse(
+        [width * 0.2, height * 0.1, width * 0.8, height * 0.9], fill=(40, 130, 40)
+    )
+    exif = Image.Exif()
+    exif[0x0112] = 6
+    buffer = io.BytesIO()
+    img.save(buffer, format="JPEG", quality=90, exif=exif)
+    return buffer.getvalue()
+
+
+def legacy_path(image_bytes, timings):
+    """The original MLService preprocessing."""
+    t0 = time.perf_counter()
+    img = Image.open(io.BytesIO(image_bytes)).convert("RGB")
+    t1 = time.perf_counter()
+    img = img.resize((224, 224))
+    t2 = time.perf_counter()
+    img_array = np.array(img) / 255.0
+    img_array = np.expand_dims(img_array, axis=0)
+    t3 = time.perf_counter()
+    timings["decode"].append(t1 - t0)
+    timings["resize"].append(t2 - t1)
+    timings["normalize"].append(t3 - t2)
+    return img_array
+
+
+def fast_path(image_bytes, timings, buffer):
+    """app.utils.preprocessing: draft decode + EXIF + single resize + float32 buffer."""
+    t0 = time.perf_counter()
+    img = decode_image(image_bytes, size=(224, 224))  # decode and resize together
+    t1 = time.perf_counter()
+    batch = buffer.fill([np.asarray(img)])
+    t2 = time.perf_counter()
+    timings["decode+resize"].append(t1 - t0)
+    timings["normalize"].append(t2 - t1)
+    return batch
+
+
+def summarize(timings):
+    stages = {name: round(float(np.median(values)) * 1000, 3) for name, values in timings.items()}
+    stages["total"] = round(sum(stages.values()), 3)
+    return stages
+
+
+def peak_python_memory(fn):
+    """Peak traced allocation (numpy arrays and Python objects) of one call, in KB."""
+    tracemalloc.start()
+    fn()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return round(peak / 1024, 1)
+
+
+def run_benchmark():
+    parser = argparse.ArgumentParser(description="Per-stage preprocessing microbenchmark.")
+    parser.add_argument("--image", default=None, help="JPEG to benchmark (default: synthetic 12 MP photo)")
+    parser.add_argument("--repeat", type=int, default=20)
+    parser.add_argument("--output", default=None, help="Write the JSON report to this path")
+    args = parser.parse_args()
+
+    if args.image:
+        with open(args.image, "rb") as f:
+            image_bytes = f.read()
+    else:
+        image_bytes = make_phone_jpeg()
+
+    width, height = Image.open(io.BytesIO(image_bytes)).size
+    buffer = BatchBuffer(1)
+
+    legacy = {"decode": [], "resize": [], "normalize": []}
+    fast = {"decode+resize": [], "normalize": []}
+    for _ in range(args.repeat):
+        legacy_path(image_bytes, legacy)
+        fast_path(image_bytes, fast, buffer)
+
+    draft = Image.open(io.BytesIO(image_bytes))
+    draft.draft("RGB", (224, 224))
+
+    report = {
+        "image": {"width": width, "height": height, "bytes": len(image_bytes)},
+        "repeat": args.repeat,
+        "legacy_ms": summarize(legacy),
+        "fast_ms": summarize(fast),
+        # Pillow's decoded frame is not visible to tracemalloc, so report its size directly
+        "decoded_frame_kb": {
+            "legacy": round(width * height * 3 / 1024, 1),
+            "fast": round(draft.size[0] * draft.size[1] * 3 / 1024, 1),
+        },
+        "peak_python_kb": {
+            "legacy": peak_python_memory(lambda: legacy_path(image_bytes, {"decode": [], "resize": [], "normalize": []})),
+            "fast": peak_python_memory(lambda: fast_path(image_bytes, {"decode+resize": [], "normalize": []}, buffer)),
+        },
+    }
+    report["speedup"] = round(report["legacy_ms"]["total"] / report["fast_ms"]["total"], 2)
+
+    print(json.dumps(report, indent=2))
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+
+if __name__ == "__main__":
+    run_benchmark()
@@ -0,0 +1,147 @@
+import argparse
+import json
+import multiprocessing
+import os
+import sys
+import tempfile
+import time
+import warnings
+
+import numpy as np
+
+# Allow `python scripts/bench_yield_load.py` from the backend/ directory
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+MODELS_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "models")
+
+# How each format is loaded; "pickle-mmap" shows that joblib's mmap_mode does
+# not help a forest (sklearn copies the node arrays out while unpickling)
+FORMATS = ("pickle", "pickle-mmap", "flat", "flat-mmap")
+
+
+def memory_kb():
+    """Resident memory of this process from /proc/self/smaps_rollup (Linux), in KB."""
+    fields = {}
+    with open("/proc/self/smaps_rollup") as f:
+        for line in f:
+            parts = line.split()
+            if len(parts) == 3 and parts[2] == "kB":
+                fields[parts[0].rstrip(":")] = int(parts[1])
+    return {
+        "rss": fields["Rss"],
+        # Proportional share: pages mapped by several workers are split between them
+        "pss": fields["Pss"],
+        "private": fields["Private_Clean"] + fields["Private_Dirty"],
+    }
+
+
+def load_model(fmt, pkl_path, npz_path):
+    if fmt == "pickle":
+        import joblib
+        return joblib.load(pkl_path)
+    if fmt == "pickle-mmap":
+        import joblib
+        return joblib.load(pkl_path, mmap_mode="r")
+    from app.utils.flat_forest import FlatForest
+    return FlatForest.load(npz_path, mmap_mode="r" if fmt == "flat-mmap" else None)
+
+
+def worker(fmt, pkl_path, npz_path, barrier, results):
+    """One simulated uvicorn worker: import, load, predict once, then measure while all workers are alive."""
+    warnings.filterwarnings("ignore")
+    import joblib  # noqa: F401  (import cost is not load cost)
+    import sklearn.ensemble  # noqa: F401
+    from app.utils import flat_forest  # noqa: F401
+
+    before = memory_kb()
+    t0 = time.perf_counter()
+    model = load_model(fmt, pkl_path, npz_path)
+    model.predict(np.array([[1.0, 25.0, 70.0]]))
+    load_ms = (time.perf_counter() - t0) * 1000
+
+    barrier.wait()
+    after = memory_kb()
+    results.put({
+        "load_ms": load_ms,
+        "rss_kb": after["rss"] - before["rss"],
+        "pss_kb": after["pss"] - before["pss"],
+        "private_kb": after["private"] - before["private"],
+    })
+    barrier.wait()
+
+
+def measure(fmt, pkl_path, npz_path, workers):
+    context = multiprocessing.get_context("spawn")
+    barrier = context.Barrier(workers)
+    results = context.Queue()
+    processes = [
+        context.Process(target=worker, args=(fmt, pkl_path, npz_path, barrier, results))
+        for _ in range(workers)
+    ]
+    for process in processes:
+        process.start()
+    rows = [results.get() for _ in range(workers)]
+    for process in processes:
+        process.join()
+    return {
+        key: round(float(np.median([row[key] for row in rows])), 1)
+        for key in ("load_ms", "rss_kb", "pss_kb", "private_kb")
+    }
+
+
+def build_synthetic(trees, directory):
+    """A larger stand-in forest (deep trees on 20k rows) to show how load cost scales."""
+    import joblib
+    from sklearn.ensemble import RandomForestRegressor
+    from sklearn.pipeline import Pipeline
+    from sklearn.preprocessing import StandardScaler
+    from app.utils.flat_forest import FlatForest
+
+    rng = np.random.default_rng(0)
+    X = rng.uniform([0, 15, 30], [2, 40, 100], size=(20000, 3))
+    y = 50 + 25 * X[:, 0] - 1.5 * np.abs(X[:, 1] - 25) - 0.5 * np.abs(X[:, 2] - 70) + rng.normal(0, 2, len(X))
+    model = Pipeline([
+        ("scaler", StandardScaler()),
+        ("regressor", RandomForestRegressor(n_estimators=trees, random_state=42, n_jobs=-1)),
+    ]).fit(X, y)
+    pkl_path, npz_path = os.path.join(directory, "yield_model.pkl"), os.path.join(directory, "yield_model.npz")
+    joblib.dump(model, pkl_path)
+    FlatForest.from_sklearn(model).save(npz_path)
+    return pkl_path, npz_path
+
+
+def run_benchmark():
+    parser = argparse.ArgumentParser(description="Yield model load time and memory per worker, by artifact format.")
+    parser.add_argument("--pkl", default=os.path.join(MODELS_DIR, "yield_model.pkl"))
+    parser.add_argument("--npz", default=os.path.join(MODELS_DIR, "yield_model.npz"))
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 4])
+    parser.add_argument("--synthetic-trees", type=int, default=None,
+                        help="Benchmark a freshly trained forest of this many deep trees instead")
+    parser.add_argument("--output", default=None, help="Write the JSON report to this path")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        if args.synthetic_trees:
+            pkl_path, npz_path = build_synthetic(args.synthetic_trees, directory)
+        else:
+            pkl_path, npz_path = args.pkl, args.npz
+
+        report = {
+            "artifacts_kb": {
+                "pickle": round(os.path.getsize(pkl_path) / 1024, 1),
+                "flat": round(os.path.getsize(npz_path) / 1024, 1),
+            },
+            # Medians over the workers of each run; memory is the growth from loading
+            "runs": {
+                str(workers): {fmt: measure(fmt, pkl_path, npz_path, workers) for fmt in FORMATS}
+                for workers in args.workers
+            },
+        }
+
+    print(json.dumps(report, indent=2))
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+
+if __name__ == "__main__":
+    run_benchmark()
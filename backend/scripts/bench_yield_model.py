@@ -0,0 +1,105 @@
+import argparse
+import json
+import os
+import sys
+import tempfile
+import time
+import warnings
+
+import joblib
+import numpy as np
+
+# Allow `python scripts/bench_yield_model.py` from the backend/ directory
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.core.config import settings
+from app.utils.flat_forest import FlatForest
+from app.utils.yield_grid import load_or_build
+
+MODELS_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "models")
+
+
+def sample_features(n, seed=0):
+    """Rows in the ranges the app sends: quality score 0-10, 15-40 C, 30-100 % humidity."""
+    rng = np.random.default_rng(seed)
+    return np.column_stack([
+        rng.uniform(0, 10, n), rng.uniform(15, 40, n), rng.uniform(30, 100, n),
+    ])
+
+
+def median_ms(fn, repeat):
+    timings = []
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        fn()
+        timings.append(time.perf_counter() - t0)
+    return round(float(np.median(timings)) * 1000, 4)
+
+
+def run_benchmark():
+    parser = argparse.ArgumentParser(description="sklearn vs flat-array yield model latency.")
+    parser.add_argument("--pkl", default=os.path.join(MODELS_DIR, "yield_model.pkl"))
+    parser.add_argument("--npz", default=os.path.join(MODELS_DIR, "yield_model.npz"))
+    parser.add_argument("--repeat", type=int, default=200)
+    parser.add_argument("--batch-size", type=int, default=256)
+    parser.add_argument("--check-rows", type=int, default=100000, help="Rows compared for exact equality")
+    parser.add_argument("--grid", action="store_true", help="Also measure the YIELD_GRID_* lookup grid")
+    parser.add_argument("--output", default=None, help="Write the JSON report to this path")
+    args = parser.parse_args()
+
+    # The pipeline was fitted on a DataFrame; the service passes plain arrays too
+    warnings.filterwarnings("ignore", message="X does not have valid feature names")
+    sklearn_model = joblib.load(args.pkl)
+    t0 = time.perf_counter()
+    flat_model = FlatForest.load(args.npz)
+    load_ms = round((time.perf_counter() - t0) * 1000, 3)
+
+    row = sample_features(1)
+    batch = sample_features(args.batch_size, seed=1)
+    check = sample_features(args.check_rows, seed=2)
+    mismatches = int(np.count_nonzero(sklearn_model.predict(check) != flat_model.predict(check)))
+
+    report = {
+        "trees": int(flat_model.roots.size),
+        "nodes": int(flat_model.feature.size),
+        "max_depth": flat_model.max_depth,
+        "flat_load_ms": load_ms,
+        "single_row_ms": {
+            "sklearn": median_ms(lambda: sklearn_model.predict(row), args.repeat),
+            "flat": median_ms(lambda: flat_model.predict(row), args.repeat),
+        },
+        "batch_ms": {
+            "batch_size": args.batch_size,
+            "sklearn": median_ms(lambda: sklearn_model.predict(batch), max(1, args.repeat // 10)),
+            "flat": median_ms(lambda: flat_model.predict(batch), max(1, args.repeat // 10)),
+        },
+        "exact_match": {"rows": args.check_rows, "mismatches": mismatches},
+    }
+    if args.grid:
+        with tempfile.TemporaryDirectory() as grid_dir:
+            t0 = time.perf_counter()
+            grid = load_or_build(
+                flat_model, args.npz,
+                settings.YIELD_GRID_MIN, settings.YIELD_GRID_MAX, settings.YIELD_GRID_POINTS, grid_dir,
+            )
+            build_ms = round((time.perf_counter() - t0) * 1000, 3)
+            report["grid"] = {
+                **grid.stats(),
+                "build_ms": build_ms,
+                "single_row_ms": median_ms(lambda: grid.predict(row), args.repeat),
+                "batch_ms": median_ms(lambda: grid.predict(batch), max(1, args.repeat // 10)),
+            }
+            del grid
+
+    report["speedup"] = {
+        "single_row": round(report["single_row_ms"]["sklearn"] / report["single_row_ms"]["flat"], 1),
+        "batch": round(report["batch_ms"]["sklearn"] / report["batch_ms"]["flat"], 1),
+    }
+
+    print(json.dumps(report, indent=2))
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+
+if __name__ == "__main__":
+    run_benchmark()
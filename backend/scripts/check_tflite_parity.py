@@ -0,0 +1,74 @@
+import argparse
+import os
+import sys
+
+import numpy as np
+
+# Allow `python scripts/check_tflite_parity.py` from the backend/ directory
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.services.inference_backends import KerasBackend, TFLiteBackend, compare_backends
+from app.utils.preprocessing import decode_image, load_contract, scale_pixels
+
+
+def image_names(images_dir, samples):
+    """The first `samples` image files of a directory, in name order."""
+    return sorted(
+        f for f in os.listdir(images_dir)
+        if f.lower().endswith((".jpg", ".jpeg", ".png"))
+    )[:samples]
+
+
+def load_images(images_dir, names, contract):
+    """Decodes image files and scales them the way the model was trained and is served."""
+    height, width = contract["input_size"]
+    arrays = []
+    for name in names:
+        with open(os.path.join(images_dir, name), "rb") as f:
+            arrays.append(np.asarray(decode_image(f.read(), size=(width, height))))
+    pixels = np.stack(arrays)
+    return scale_pixels(pixels, contract["scaling"])
+
+
+def load_batch(images_dir, samples, contract):
+    """Loads up to `samples` images from a directory, or random images if none is given."""
+    if images_dir:
+        return load_images(images_dir, image_names(images_dir, samples), contract)
+    height, width = contract["input_size"]
+    pixels = np.random.default_rng(42).integers(0, 256, size=(samples, height, width, 3), dtype=np.uint8)
+    return scale_pixels(pixels, contract["scaling"])
+
+
+def check_parity():
+    base_path = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))  # backend/
+    models_dir = os.path.join(base_path, "models")
+
+    parser = argparse.ArgumentParser(description="Compare TFLite and Keras leaf-quality outputs.")
+    parser.add_argument("--h5", default=os.path.join(models_dir, "leaf_quality_model.h5"))
+    parser.add_argument("--tflite", default=os.path.join(models_dir, "leaf_quality_model.tflite"))
+    parser.add_argument("--images-dir", default=None, help="Directory of leaf images (default: random inputs)")
+    parser.add_argument("--samples", type=int, default=32)
+    parser.add_argument("--min-agreement", type=float, default=0.99)
+    parser.add_argument("--max-abs-diff", type=float, default=0.05)
+    args = parser.parse_args()
+
+    for path in (args.h5, args.tflite):
+        if not os.path.exists(path):
+            print(f"Error: Model not found at {path}")
+            return 1
+
+    batch = load_batch(args.images_dir, args.samples, load_contract(args.h5))
+    report = compare_backends(KerasBackend(args.h5), TFLiteBackend(args.tflite), batch)
+
+    print(f"Samples:        {report['samples']}")
+    print(f"Top-1 agreement: {report['top1_agreement']:.4f}")
+    print(f"Max |diff|:      {report['max_abs_diff']:.6f}")
+
+    if report["top1_agreement"] < args.min_agreement or report["max_abs_diff"] > args.max_abs_diff:
+        print("FAILED: TFLite output diverges from the Keras model.")
+        return 1
+    print("OK: TFLite output matches the Keras model.")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(check_parity())
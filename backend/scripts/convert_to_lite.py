@@ -1,44 +1,228 @@
-import tensorflow as tf
+import argparse
+import csv
+import json
 import os
+import shutil
 import sys
+import tempfile
+import time
 
-def convert_model():
-    # Define paths
-    base_path = os.path.dirname(os.path.dirname(os.path.abspath(__file__))) # backend/
-    models_dir = os.path.join(base_path, "models")
-    h5_path = os.path.join(models_dir, "leaf_quality_model.h5")
-    tflite_path = os.path.join(models_dir, "leaf_quality_model.tflite")
+import numpy as np
+import tensorflow as tf
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+REPO_ROOT = os.path.dirname(BACKEND_DIR)
+MODELS_DIR = os.path.join(BACKEND_DIR, "models")
+
+# Allow `python scripts/convert_to_lite.py` from the backend/ directory;
+# src.data_generator lives at the repository root
+sys.path.insert(0, BACKEND_DIR)
+sys.path.insert(1, REPO_ROOT)
 
+from app.services.inference_backends import KerasBackend, TFLiteBackend, compare_backends
+from app.utils.preprocessing import load_contract
+from check_tflite_parity import image_names, load_images
+
+# Quantization modes:
+#   dynamic - int8 weights, float activations (Optimize.DEFAULT alone)
+#   float16 - float16 weights, float activations
+#   int8    - int8 weights and activations, calibrated on a representative
+#             dataset; int8 input/output tensors (TFLiteBackend quantizes
+#             inputs and dequantizes outputs)
+MODES = ("dynamic", "float16", "int8")
+
+
+def load_keras_model(h5_path):
     print(f"Checking for model at: {h5_path}")
-    if not os.path.exists(h5_path):
-        print(f"Error: Model not found at {h5_path}")
-        # Create a dummy model for testing if real one doesn't exist (FOR DEBUGGING/PROTOTYPING ONLY)
-        print("Creating dummy model for testing purposes...")
-        model = tf.keras.Sequential([
-            tf.keras.layers.InputLayer(input_shape=(224, 224, 3)),
-            tf.keras.layers.Conv2D(16, 3, activation='relu'),
-            tf.keras.layers.GlobalAveragePooling2D(),
-            tf.keras.layers.Dense(3, activation='softmax')
-        ])
-        model.save(h5_path)
-    else:
+    if os.path.exists(h5_path):
         print("Loading existing model...")
-        model = tf.keras.models.load_model(h5_path)
+        return tf.keras.models.load_model(h5_path)
+
+    print(f"Error: Model not found at {h5_path}")
+    # Create a dummy model for testing if real one doesn't exist (FOR DEBUGGING/PROTOTYPING ONLY)
+    print("Creating dummy model for testing purposes...")
+    model = tf.keras.Sequential([
+        tf.keras.layers.Input(shape=(224, 224, 3)),
+        tf.keras.layers.Conv2D(16, 3, activation='relu'),
+        tf.keras.layers.GlobalAveragePooling2D(),
+        tf.keras.layers.Dense(3, activation='softmax')
+    ])
+    model.save(h5_path)
+    return model
 
-    print("Converting to TFLite...")
+
+def convert(model, mode, representative=None):
+    """Converts a Keras model to TFLite bytes with the given quantization mode."""
     converter = tf.lite.TFLiteConverter.from_keras_model(model)
-    
-    # Optimization (Quantization)
     converter.optimizations = [tf.lite.Optimize.DEFAULT]
-    
-    tflite_model = converter.convert()
-
-    # Save the model
-    with open(tflite_path, "wb") as f:
-        f.write(tflite_model)
-    
-    print(f"Success! Model saved to {tflite_path}")
-    print(f"Model size: {os.path.getsize(tflite_path) / 1024:.2f} KB")
+    if mode == "float16":
+        converter.target_spec.supported_types = [tf.float16]
+    elif mode == "int8":
+        def representative_dataset():
+            for image in representative:
+                yield [image[np.newaxis]]
+
+        converter.representative_dataset = representative_dataset
+        converter.target_spec.supported_ops = [tf.lite.OpsSet.TFLITE_BUILTINS_INT8]
+        converter.inference_input_type = tf.int8
+        converter.inference_output_type = tf.int8
+    return converter.convert()
+
+
+def leaf_images(images_dir, eval_samples, calibration_samples, contract):
+    """
+    Scaled images for evaluation and for int8 calibration, plus the
+    evaluation labels when the directory has a labels.csv. The first
+    `eval_samples` files are evaluated and the next ones calibrate, so the
+    agreement is not measured on calibration images. Small directories
+    calibrate on every image.
+    """
+    names = image_names(images_dir, eval_samples + calibration_samples)
+    eval_names = names[:eval_samples]
+    calibration_names = names[eval_samples:] or names
+
+    labels = None
+    labels_path = os.path.join(images_dir, "labels.csv")
+    if os.path.exists(labels_path):
+        with open(labels_path) as f:
+            quality = {row["filename"]: row["quality"] for row in csv.DictReader(f)}
+        if all(name in quality for name in eval_names):
+            labels = np.array([contract["class_names"].index(quality[name]) for name in eval_names])
+
+    return (
+        load_images(images_dir, eval_names, contract),
+        load_images(images_dir, calibration_names, contract),
+        labels,
+    )
+
+
+def generate_leaf_images(directory, samples):
+    """Synthetic labelled leaf images from the training data generator."""
+    from src.data_generator import generate_synthetic_images
+
+    np.random.seed(42)
+    generate_synthetic_images(output_dir=directory, num_samples=samples)
+    return directory
+
+
+def measure_latency(backend, batch, repeats):
+    """Median and p95 milliseconds of backend.predict(batch), after one warm-up call."""
+    backend.predict(batch)
+    times = []
+    for _ in range(repeats):
+        started = time.perf_counter()
+        backend.predict(batch)
+        times.append((time.perf_counter() - started) * 1000)
+    return {
+        "median_ms": round(float(np.median(times)), 3),
+        "p95_ms": round(float(np.percentile(times, 95)), 3),
+    }
+
+
+def benchmark(backend, reference, images, labels, batch_size, repeats):
+    """Latency at batch size 1 and `batch_size`, and agreement with the reference model."""
+    batch = images[:batch_size]
+    if len(batch) < batch_size:
+        batch = np.resize(images, (batch_size,) + images.shape[1:])
+    batched = measure_latency(backend, batch, repeats)
+    result = {
+        "single": measure_latency(backend, images[:1], repeats),
+        "batch": dict(batched, per_image_ms=round(batched["median_ms"] / batch_size, 3)),
+    }
+    if reference is not None:
+        result.update(compare_backends(reference, backend, images))
+    if labels is not None:
+        predicted = np.argmax(backend.predict(images), axis=1)
+        result["accuracy"] = round(float(np.mean(predicted == labels)), 4)
+    return result
+
+
+def convert_model():
+    parser = argparse.ArgumentParser(
+        description="Convert the leaf quality model to TFLite in each quantization mode and "
+                    "benchmark every variant against the Keras model."
+    )
+    parser.add_argument("--h5", default=os.path.join(MODELS_DIR, "leaf_quality_model.h5"))
+    parser.add_argument("--modes", nargs="+", choices=MODES, default=list(MODES))
+    parser.add_argument("--serve", choices=MODES, default="dynamic",
+                        help="Variant written to leaf_quality_model.tflite for INFERENCE_BACKEND=tflite")
+    parser.add_argument("--output-dir", default=MODELS_DIR)
+    parser.add_argument("--images-dir", default=None,
+                        help="Labelled leaf images (default: data/synthetic_leaves, else freshly generated)")
+    parser.add_argument("--samples", type=int, default=64, help="Images used to measure agreement")
+    parser.add_argument("--calibration-samples", type=int, default=100,
+                        help="Representative images used to calibrate int8 activations")
+    parser.add_argument("--batch-size", type=int, default=16)
+    parser.add_argument("--threads", type=int, default=2, help="CPU threads per interpreter")
+    parser.add_argument("--repeats", type=int, default=20)
+    parser.add_argument("--output", default=None, help="Write the JSON report to this path")
+    args = parser.parse_args()
+    if args.serve not in args.modes:
+        parser.error(f"--serve {args.serve} is not one of the converted --modes")
+
+    model = load_keras_model(args.h5)
+    contract = load_contract(args.h5)
+    os.makedirs(args.output_dir, exist_ok=True)
+
+    with tempfile.TemporaryDirectory() as work_dir:
+        images_dir = args.images_dir or os.path.join(REPO_ROOT, "data", "synthetic_leaves")
+        source = images_dir
+        if not os.path.isdir(images_dir):
+            source = "generated"
+            print(f"No images at {images_dir}; generating synthetic leaves...")
+            images_dir = generate_leaf_images(
+                os.path.join(work_dir, "synthetic_leaves"), args.samples + args.calibration_samples
+            )
+        images, representative, labels = leaf_images(
+            images_dir, args.samples, args.calibration_samples, contract
+        )
+
+        reference = KerasBackend(args.h5)
+        report = {
+            "model": args.h5,
+            "images": source,
+            "samples": int(len(images)),
+            "calibration_samples": int(len(representative)),
+            "batch_size": args.batch_size,
+            "threads": args.threads,
+            "keras": dict(
+                benchmark(reference, None, images, labels, args.batch_size, args.repeats),
+                bytes=os.path.getsize(args.h5),
+            ),
+            "variants": {},
+        }
+
+        stem = os.path.splitext(os.path.basename(args.h5))[0]
+        contract_path = os.path.splitext(args.h5)[0] + ".json"
+        for mode in args.modes:
+            print(f"Converting to TFLite ({mode})...")
+            tflite_path = os.path.join(args.output_dir, f"{stem}.{mode}.tflite")
+            with open(tflite_path, "wb") as f:
+                f.write(convert(model, mode, representative))
+            # Each variant carries the contract, so it can be registered or served on its own
+            if os.path.exists(contract_path):
+                shutil.copyfile(contract_path, os.path.splitext(tflite_path)[0] + ".json")
+
+            backend = TFLiteBackend(tflite_path, num_threads=args.threads)
+            report["variants"][mode] = dict(
+                path=tflite_path,
+                bytes=os.path.getsize(tflite_path),
+                **benchmark(backend, reference, images, labels, args.batch_size, args.repeats),
+            )
+
+    served_path = os.path.join(args.output_dir, f"{stem}.tflite")
+    shutil.copyfile(report["variants"][args.serve]["path"], served_path)
+    served_contract = os.path.splitext(served_path)[0] + ".json"
+    if os.path.exists(contract_path) and os.path.abspath(served_contract) != os.path.abspath(contract_path):
+        shutil.copyfile(contract_path, served_contract)
+    report["served"] = {"mode": args.serve, "path": served_path}
+
+    print(json.dumps(report, indent=2))
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+    print(f"Success! {args.serve} model saved to {served_path}")
+
 
 if __name__ == "__main__":
     convert_model()
@@ -0,0 +1,41 @@
+import argparse
+import json
+import os
+import sys
+
+# Allow `python scripts/register_model.py` from the backend/ directory
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.services.model_registry import ModelRegistry
+
+
+def register_model():
+    base_path = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))  # backend/
+
+    parser = argparse.ArgumentParser(
+        description="Add a model version to models/manifest.json. Artifacts not given are "
+                    "shared with the active version. Serve it with POST /admin/models/reload."
+    )
+    parser.add_argument("version", help="Version name, e.g. v2")
+    parser.add_argument("--keras", help="Leaf quality .h5 (its .json contract sidecar is copied too)")
+    parser.add_argument("--tflite", help="Leaf quality .tflite")
+    parser.add_argument("--yield-model", dest="yield_model", help="Yield model .pkl")
+    parser.add_argument("--cascade", help="Early-exit cascade .npz (from scripts/train_cascade.py)")
+    parser.add_argument("--activate", action="store_true", help="Make it the active version in the manifest")
+    parser.add_argument("--models-dir", default=os.path.join(base_path, "models"))
+    args = parser.parse_args()
+
+    artifacts = {
+        kind: path for kind, path in
+        (("keras", args.keras), ("tflite", args.tflite), ("yield", args.yield_model), ("cascade", args.cascade))
+        if path
+    }
+    if not artifacts:
+        parser.error("Give at least one of --keras, --tflite, --yield-model, --cascade.")
+
+    entry = ModelRegistry(args.models_dir).register(args.version, artifacts, activate=args.activate)
+    print(json.dumps({args.version: entry}, indent=2))
+
+
+if __name__ == "__main__":
+    register_model()
@@ -0,0 +1,166 @@
+import argparse
+import csv
+import json
+import os
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+REPO_ROOT = os.path.dirname(BACKEND_DIR)
+MODELS_DIR = os.path.join(BACKEND_DIR, "models")
+
+# Allow `python scripts/train_cascade.py` from the backend/ directory;
+# src.data_generator lives at the repository root
+sys.path.insert(0, BACKEND_DIR)
+sys.path.insert(1, REPO_ROOT)
+
+from app.utils.leaf_cascade import LeafCascade, calibrate_threshold, leaf_features, sweep_thresholds
+from app.utils.preprocessing import decode_image, load_contract, scale_pixels
+
+# Thresholds tried during calibration; 1.0 never exits early
+THRESHOLDS = np.round(np.linspace(0.30, 1.0, 71), 2)
+
+
+def load_labelled_images(images_dir, contract):
+    """Decodes every image in labels.csv to the model's input size, as the API does."""
+    height, width = contract["input_size"]
+    class_index = {name: i for i, name in enumerate(contract["class_names"])}
+    pixels, labels = [], []
+    with open(os.path.join(images_dir, "labels.csv")) as f:
+        for row in csv.DictReader(f):
+            with open(os.path.join(images_dir, row["filename"]), "rb") as image:
+                pixels.append(np.asarray(decode_image(image.read(), size=(width, height))))
+            labels.append(class_index[row["quality"]])
+    return np.stack(pixels), np.array(labels)
+
+
+def load_backend(model_path):
+    from app.services.inference_backends import KerasBackend, TFLiteBackend
+    if model_path.endswith(".tflite"):
+        return TFLiteBackend(model_path)
+    return KerasBackend(model_path)
+
+
+def cnn_probabilities(backend, pixels, scaling, batch_size=32):
+    outputs = []
+    for start in range(0, len(pixels), batch_size):
+        chunk = pixels[start:start + batch_size]
+        outputs.append(backend.predict(scale_pixels(chunk, scaling)))
+    return np.concatenate(outputs)
+
+
+def median_ms(fn, repeats):
+    fn()
+    times = []
+    for _ in range(repeats):
+        started = time.perf_counter()
+        fn()
+        times.append((time.perf_counter() - started) * 1000)
+    return float(np.median(times))
+
+
+def train_cascade():
+    parser = argparse.ArgumentParser(
+        description="Train the color/texture first stage of the leaf classifier and calibrate its "
+                    "early-exit threshold against the CNN."
+    )
+    parser.add_argument("--model", default=os.path.join(MODELS_DIR, "leaf_quality_model.h5"),
+                        help="CNN the cascade answers for (.h5 or .tflite)")
+    parser.add_argument("--images-dir", default=None,
+                        help="Labelled leaf images (default: data/synthetic_leaves, else freshly generated)")
+    parser.add_argument("--output", default=os.path.join(MODELS_DIR, "leaf_cascade.npz"))
+    parser.add_argument("--max-accuracy-drop", type=float, default=0.01,
+                        help="Largest accuracy loss against the CNN alone the threshold may cost")
+    parser.add_argument("--calibration-fraction", type=float, default=0.5,
+                        help="Share of images held out to calibrate the threshold")
+    parser.add_argument("--repeats", type=int, default=20, help="Timed calls per latency measurement")
+    parser.add_argument("--report", default=None, help="Write the JSON report to this path")
+    args = parser.parse_args()
+
+    from sklearn.linear_model import LogisticRegression
+    from sklearn.model_selection import train_test_split
+
+    if not os.path.exists(args.model):
+        print(f"Error: Model not found at {args.model}")
+        return 1
+    contract = load_contract(args.model)
+
+    with tempfile.TemporaryDirectory() as work_dir:
+        images_dir = args.images_dir or os.path.join(REPO_ROOT, "data", "synthetic_leaves")
+        if not os.path.isdir(images_dir):
+            from src.data_generator import generate_synthetic_images
+            print(f"No images at {images_dir}; generating synthetic leaves...")
+            images_dir = os.path.join(work_dir, "synthetic_leaves")
+            np.random.seed(42)
+            generate_synthetic_images(output_dir=images_dir, num_samples=400)
+        pixels, labels = load_labelled_images(images_dir, contract)
+
+    train_pixels, calibration_pixels, train_labels, calibration_labels = train_test_split(
+        pixels, labels, test_size=args.calibration_fraction, stratify=labels, random_state=42
+    )
+
+    train_features = leaf_features(train_pixels)
+    mean, scale = train_features.mean(axis=0), train_features.std(axis=0)
+    scale[scale == 0] = 1.0
+    classifier = LogisticRegression(max_iter=1000).fit((train_features - mean) / scale, train_labels)
+    if len(classifier.classes_) != len(contract["class_names"]):
+        print(f"Error: Training images cover {len(classifier.classes_)} of {len(contract['class_names'])} classes")
+        return 1
+    cascade = LeafCascade(
+        mean, scale, classifier.coef_.T, classifier.intercept_, contract["class_names"], threshold=1.0
+    )
+
+    print(f"Scoring {len(calibration_pixels)} held-out images with the CNN...")
+    backend = load_backend(args.model)
+    cnn = cnn_probabilities(backend, calibration_pixels, contract["scaling"])
+    stage = cascade.classify(calibration_pixels)
+    rows = sweep_thresholds(
+        stage.max(axis=1), stage.argmax(axis=1), cnn.argmax(axis=1), calibration_labels, THRESHOLDS
+    )
+    chosen = calibrate_threshold(rows, args.max_accuracy_drop)
+    cascade.threshold = chosen["threshold"]
+
+    # Per-image cost of each stage, and the expected cost of the cascade at the chosen threshold
+    one_image = calibration_pixels[:1]
+    batch = np.empty(one_image.shape, dtype=np.float32)
+    stage_ms = median_ms(lambda: cascade.classify(one_image[0]), args.repeats)
+    cnn_ms = median_ms(
+        lambda: backend.predict(scale_pixels(one_image, contract["scaling"], out=batch)), args.repeats
+    )
+    cascade_ms = stage_ms + (1 - chosen["early_exit_rate"]) * cnn_ms
+
+    cascade.calibration = {
+        "samples": int(len(calibration_labels)),
+        "max_accuracy_drop": args.max_accuracy_drop,
+        "stage_accuracy": round(float(np.mean(stage.argmax(axis=1) == calibration_labels)), 4),
+        "cnn_accuracy": round(float(np.mean(cnn.argmax(axis=1) == calibration_labels)), 4),
+        "chosen": chosen,
+        "sweep": rows,
+    }
+    cascade.save(args.output)
+
+    report = dict(
+        cascade.calibration,
+        model=args.model,
+        output=args.output,
+        train_samples=int(len(train_labels)),
+        latency_ms={
+            "first_stage": round(stage_ms, 3),
+            "cnn": round(cnn_ms, 3),
+            "cascade_expected": round(cascade_ms, 3),
+        },
+        expected_speedup=round(cnn_ms / cascade_ms, 2),
+    )
+    print(json.dumps({key: value for key, value in report.items() if key != "sweep"}, indent=2))
+    if args.report:
+        with open(args.report, "w") as f:
+            json.dump(report, f, indent=2)
+    print(f"Cascade saved to {args.output} (threshold {cascade.threshold})")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(train_cascade())
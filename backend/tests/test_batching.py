@@ -0,0 +1,42 @@
+import threading
+import numpy as np
+import pytest
+from app.services.batching_service import MicroBatcher
+
+def test_concurrent_requests_share_a_batch():
+    """Concurrent submits are grouped and each caller gets its own row back."""
+    seen_sizes = []
+
+    def predict(batch):
+        seen_sizes.append(len(batch))
+        return batch.reshape(len(batch), -1).sum(axis=1, keepdims=True)
+
+    batcher = MicroBatcher(predict, max_batch_size=8, max_wait_ms=50)
+    results = {}
+
+    def worker(i):
+        results[i] = batcher.predict(np.full((2, 2), i, dtype=np.float32))
+
+    threads = [threading.Thread(target=worker, args=(i,)) for i in range(8)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    batcher.close()
+
+    assert {i: float(r[0]) for i, r in results.items()} == {i: 4.0 * i for i in range(8)}
+    assert max(seen_sizes) > 1
+    assert all(size <= 8 for size in seen_sizes)
+
+    stats = batcher.stats()
+    assert stats["items"] == 8
+    assert sum(stats["batch_size_histogram"].values()) == stats["batches"]
+
+def test_batch_errors_reach_every_caller():
+    def predict(batch):
+        raise ValueError("boom")
+
+    batcher = MicroBatcher(predict, max_batch_size=4, max_wait_ms=1)
+    with pytest.raises(ValueError):
+        batcher.predict(np.zeros((2, 2)))
+    batcher.close()
@@ -0,0 +1,30 @@
+import time
+from app.services.cache_service import StripedLRUCache
+
+def test_lru_evicts_least_recently_used():
+    cache = StripedLRUCache(max_entries=2, stripes=1)
+    cache.set("a", 1)
+    cache.set("b", 2)
+    assert cache.get("a") == 1  # "b" is now least recently used
+    cache.set("c", 3)
+
+    assert cache.get("b") is None
+    assert cache.get("a") == 1
+    assert cache.get("c") == 3
+    stats = cache.stats()
+    assert stats["evictions"] == 1
+    assert stats["hits"] == 3
+    assert stats["misses"] == 1
+
+def test_byte_limit_and_ttl():
+    cache = StripedLRUCache(max_entries=100, max_bytes=2000, stripes=1)
+    for i in range(50):
+        cache.set(f"key-{i}", {"class_name": "Excellent", "confidence": 0.9})
+    assert cache.stats()["bytes"] <= 2000
+    assert 0 < len(cache) < 50
+
+    cache = StripedLRUCache(max_entries=10, ttl_seconds=0.01)
+    cache.set("a", 1)
+    time.sleep(0.02)
+    assert cache.get("a") is None
+    assert cache.stats()["expirations"] == 1
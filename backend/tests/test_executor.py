@@ -0,0 +1,33 @@
+import asyncio
+import threading
+import pytest
+from app.services.executor_service import InferenceExecutor, ExecutorOverloadedError
+
+def test_executor_sheds_load_when_queue_is_full():
+    """Work beyond the queue depth is rejected immediately instead of queueing."""
+    executor = InferenceExecutor(max_workers=1, max_queue_depth=1, retry_after_seconds=2)
+    release = threading.Event()
+
+    async def scenario():
+        running = asyncio.ensure_future(executor.run(release.wait))
+        while executor.stats()["in_flight"] == 0:
+            await asyncio.sleep(0.001)
+        queued = asyncio.ensure_future(executor.run(lambda: "queued"))
+        await asyncio.sleep(0)
+
+        with pytest.raises(ExecutorOverloadedError) as exc_info:
+            await executor.run(lambda: "rejected")
+        assert exc_info.value.retry_after == 2
+
+        stats = executor.stats()
+        assert stats["in_flight"] == 1
+        assert stats["queued"] == 1
+        assert stats["rejected"] == 1
+
+        release.set()
+        assert await queued == "queued"
+        await running
+
+    asyncio.run(scenario())
+    assert executor.stats()["queued"] == 0
+    executor.shutdown()
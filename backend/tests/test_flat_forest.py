@@ -0,0 +1,100 @@
+import os
+import joblib
+import numpy as np
+import pytest
+from sklearn.ensemble import RandomForestRegressor
+from sklearn.pipeline import Pipeline
+from sklearn.preprocessing import StandardScaler
+from app.services.model_registry import ModelRegistry
+from app.utils.flat_forest import FlatForest
+
+MODELS_DIR = os.path.join(os.path.dirname(os.path.dirname(__file__)), "models")
+
+@pytest.fixture(scope="module")
+def pipeline():
+    rng = np.random.default_rng(0)
+    X = np.column_stack([rng.uniform(0, 100, 500), rng.uniform(15, 40, 500), rng.uniform(30, 100, 500)])
+    y = 0.5 * X[:, 0] - 0.2 * (X[:, 1] - 27) ** 2 + 0.1 * X[:, 2] + rng.normal(0, 1, 500)
+    model = Pipeline([("scaler", StandardScaler()), ("regressor", RandomForestRegressor(n_estimators=20, random_state=0))])
+    return model.fit(X, y), X
+
+def threshold_neighbours(flat):
+    """Rows sitting exactly on, and one float step either side of, every split."""
+    split = np.isfinite(flat.threshold)
+    rows = []
+    for feature, threshold in zip(flat.feature[split][:200], flat.threshold[split][:200]):
+        for value in (np.nextafter(threshold, -np.inf), threshold, np.nextafter(threshold, np.inf)):
+            row = np.array([50.0, 27.0, 65.0])
+            row[feature] = value
+            rows.append(row)
+    return np.array(rows)
+
+def test_matches_sklearn_exactly(pipeline):
+    model, X = pipeline
+    flat = FlatForest.from_sklearn(model)
+    rng = np.random.default_rng(1)
+    rows = np.vstack([X, rng.uniform([-10, 0, 0], [110, 50, 110], size=(5000, 3)), threshold_neighbours(flat)])
+
+    assert np.array_equal(flat.predict(rows), model.predict(rows))
+    assert np.array_equal(flat.predict(rows[:1]), model.predict(rows[:1]))
+
+def test_save_load_round_trip(pipeline, tmp_path):
+    model, X = pipeline
+    flat = FlatForest.from_sklearn(model)
+    flat.save(tmp_path / "yield_model.npz")
+    loaded = FlatForest.load(tmp_path / "yield_model.npz")
+
+    assert np.array_equal(loaded.predict(X), model.predict(X))
+    with pytest.raises(ValueError):
+        loaded.predict(np.zeros((1, 2)))
+
+def test_memory_mapped_load(pipeline, tmp_path):
+    model, X = pipeline
+    path = tmp_path / "yield_model.npz"
+    FlatForest.from_sklearn(model).save(path)
+    mapped = FlatForest.load(str(path), mmap_mode="r")
+
+    assert np.array_equal(mapped.predict(X), model.predict(X))
+    for array in (mapped.feature, mapped.threshold, mapped.left, mapped.right, mapped.value):
+        assert isinstance(array.base, np.memmap)
+        assert array.flags.aligned and not array.flags.writeable
+    # Saving is deterministic, so unchanged models keep their cache keys
+    FlatForest.load(str(path)).save(tmp_path / "again.npz")
+    assert (tmp_path / "again.npz").read_bytes() == path.read_bytes()
+
+def test_saving_over_a_mapped_export_leaves_it_intact(pipeline, tmp_path):
+    model, X = pipeline
+    path = tmp_path / "yield_model.npz"
+    FlatForest.from_sklearn(model).save(path)
+    mapped = FlatForest.load(str(path), mmap_mode="r")
+
+    other = Pipeline([("scaler", StandardScaler()), ("regressor", RandomForestRegressor(n_estimators=5, random_state=1))])
+    FlatForest.from_sklearn(other.fit(X[:50], X[:50, 0])).save(path)
+
+    assert np.array_equal(mapped.predict(X), model.predict(X))
+    assert sorted(p.name for p in tmp_path.iterdir()) == ["yield_model.npz"]
+
+def test_compressed_export_cannot_be_memory_mapped(pipeline, tmp_path):
+    flat = FlatForest.from_sklearn(pipeline[0])
+    path = tmp_path / "compressed.npz"
+    np.savez_compressed(path, feature=flat.feature, threshold=flat.threshold)
+
+    with pytest.raises(ValueError):
+        FlatForest.load(str(path), mmap_mode="r")
+
+@pytest.mark.filterwarnings("ignore")
+def test_shipped_export_matches_shipped_model():
+    pkl, npz = os.path.join(MODELS_DIR, "yield_model.pkl"), os.path.join(MODELS_DIR, "yield_model.npz")
+    if not (os.path.exists(pkl) and os.path.exists(npz)):
+        pytest.skip("Yield model artifacts not present")
+    rows = np.random.default_rng(2).uniform([0, 15, 30], [100, 40, 100], size=(2000, 3))
+
+    assert np.array_equal(FlatForest.load(npz).predict(rows), joblib.load(pkl).predict(rows))
+
+def test_new_yield_model_never_reuses_old_export(tmp_path):
+    for name in ("yield_model.pkl", "yield_model.npz", "candidate.pkl", "exported.pkl", "exported.npz"):
+        (tmp_path / name).write_bytes(b"")
+    registry = ModelRegistry(str(tmp_path))
+
+    assert "yield_flat" not in registry.register("v2", {"yield": str(tmp_path / "candidate.pkl")})
+    assert registry.register("v3", {"yield": str(tmp_path / "exported.pkl")})["yield_flat"] == "versions/v3/yield_model.npz"
@@ -0,0 +1,39 @@
+import os
+import numpy as np
+import pytest
+from app.services.inference_backends import KerasBackend, TFLiteBackend, compare_backends
+
+MODELS_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "models")
+TFLITE_PATH = os.path.join(MODELS_DIR, "leaf_quality_model.tflite")
+
+def test_tflite_backend_batches_match_single_images():
+    """Resizing the interpreter for a batch must not change per-image outputs."""
+    backend = TFLiteBackend(TFLITE_PATH, num_threads=1, pool_size=2)
+    batch = np.random.default_rng(0).random((3, 224, 224, 3), dtype=np.float32)
+
+    batched = backend.predict(batch)
+    singles = np.concatenate([backend.predict(batch[i:i + 1]) for i in range(3)])
+
+    assert batched.shape == (3, 3)
+    np.testing.assert_allclose(batched, singles, atol=1e-5)
+
+def test_tflite_matches_keras(tmp_path):
+    """Parity check between a Keras model and its TFLite conversion."""
+    tf = pytest.importorskip("tensorflow")
+    model = tf.keras.Sequential([
+        tf.keras.layers.Input(shape=(224, 224, 3)),
+        tf.keras.layers.Conv2D(4, 3, strides=4, activation="relu"),
+        tf.keras.layers.GlobalAveragePooling2D(),
+        tf.keras.layers.Dense(3, activation="softmax"),
+    ])
+    h5_path = str(tmp_path / "model.h5")
+    tflite_path = str(tmp_path / "model.tflite")
+    model.save(h5_path)
+    with open(tflite_path, "wb") as f:
+        f.write(tf.lite.TFLiteConverter.from_keras_model(model).convert())
+
+    batch = np.random.default_rng(1).random((4, 224, 224, 3), dtype=np.float32)
+    report = compare_backends(KerasBackend(h5_path), TFLiteBackend(tflite_path), batch)
+
+    assert report["top1_agreement"] == 1.0
+    assert report["max_abs_diff"] < 1e-4
@@ -0,0 +1,142 @@
+import numpy as np
+import pytest
+from fastapi.testclient import TestClient
+from app.main import app
+from app.services.executor_service import InferenceExecutor, inference_executor
+from app.services.ml_service import ModelBundle, ml_service
+from app.utils.leaf_cascade import (
+    FEATURE_NAMES, LeafCascade, calibrate_threshold, leaf_features, sweep_thresholds,
+)
+
+client = TestClient(app)
+CLASSES = ["Excellent", "Moderate", "Poor"]
+COLORS = {"Excellent": (34, 139, 34), "Moderate": (154, 205, 50), "Poor": (139, 69, 19)}
+
+def leaf_image(color, size=224, radius=60):
+    """A solid ellipse-ish leaf on a white background, like src/data_generator.py."""
+    pixels = np.full((size, size, 3), 255, dtype=np.uint8)
+    y, x = np.ogrid[:size, :size]
+    pixels[(y - size / 2) ** 2 + (x - size / 2) ** 2 < radius ** 2] = color
+    return pixels
+
+def color_cascade(threshold=0.9, shadow_rate=0.0):
+    """Nearest leaf color by mean red and green, as a softmax over squared distances."""
+    centroids = leaf_features(np.stack([leaf_image(COLORS[name]) for name in CLASSES]))
+    columns = [FEATURE_NAMES.index("mean_red"), FEATURE_NAMES.index("mean_green")]
+    weights = np.zeros((len(FEATURE_NAMES), 3), dtype=np.float32)
+    weights[columns] = 40 * centroids[:, columns].T
+    bias = -20 * np.sum(centroids[:, columns] ** 2, axis=1)
+    mean, scale = np.zeros(len(FEATURE_NAMES)), np.ones(len(FEATURE_NAMES))
+    return LeafCascade(mean, scale, weights, bias, CLASSES, threshold, shadow_rate=shadow_rate)
+
+class FakeCNN:
+    def __init__(self, class_index=0):
+        self.calls = 0
+        self.class_index = class_index
+
+    def predict(self, batch):
+        self.calls += len(batch)
+        probabilities = np.zeros((len(batch), 3), dtype=np.float32)
+        probabilities[:, self.class_index] = 1.0
+        return probabilities
+
+def test_features_describe_the_leaf_not_the_background():
+    small, large = leaf_image(COLORS["Poor"], radius=40), leaf_image(COLORS["Poor"], radius=80)
+    features = leaf_features(np.stack([small, large]))
+    names = list(FEATURE_NAMES)
+
+    assert features.shape == (2, len(FEATURE_NAMES))
+    assert features[1, names.index("leaf_fraction")] > features[0, names.index("leaf_fraction")]
+    # Mean color of leaf pixels does not depend on how much background there is
+    assert np.allclose(features[0, names.index("mean_red")], 139 / 255, atol=0.01)
+    assert np.allclose(features[1, names.index("mean_red")], 139 / 255, atol=0.01)
+    assert np.allclose(leaf_features(small), features[:1])
+
+def test_sweep_and_calibration():
+    labels = np.array([0, 1, 2, 0])
+    cnn = np.array([0, 1, 2, 1])
+    stage = np.array([0, 2, 2, 0])
+    confidences = np.array([0.95, 0.6, 0.9, 0.8])
+    rows = sweep_thresholds(confidences, stage, cnn, labels, [0.5, 0.7, 0.85, 1.0])
+
+    assert [row["early_exit_rate"] for row in rows] == [1.0, 0.75, 0.5, 0.0]
+    assert [row["accuracy_delta"] for row in rows] == [0.0, 0.25, 0.0, 0.0]
+    assert calibrate_threshold(rows, max_accuracy_drop=0.0)["threshold"] == 0.5
+    # When every early exit costs more accuracy than allowed, the cascade never exits
+    rows = sweep_thresholds(confidences, 1 - stage, cnn, labels, [0.5, 1.0])
+    assert calibrate_threshold(rows, max_accuracy_drop=0.1)["threshold"] == 1.0
+
+def test_save_and_load_round_trip(tmp_path):
+    cascade = color_cascade(threshold=0.8)
+    cascade.calibration = {"chosen": {"threshold": 0.8, "early_exit_rate": 0.5, "accuracy_delta": -0.01}}
+    path = str(tmp_path / "leaf_cascade.npz")
+    cascade.save(path)
+
+    loaded = LeafCascade.load(path)
+    overridden = LeafCascade.load(path, threshold=0.99)
+    image = leaf_image(COLORS["Moderate"])
+
+    assert loaded.class_names == CLASSES and loaded.threshold == 0.8
+    assert overridden.threshold == 0.99
+    assert np.allclose(loaded.classify(image), cascade.classify(image))
+    assert loaded.stats()["calibrated_accuracy_delta"] == -0.01
+
+def test_confident_images_skip_the_cnn(monkeypatch):
+    monkeypatch.setattr("app.services.ml_service.settings.INFERENCE_BATCHING_ENABLED", False)
+    cnn = FakeCNN()
+    bundle = ModelBundle("test", vision_model=cnn, cascade=color_cascade(threshold=0.9))
+
+    probabilities = bundle.classify_pixels(leaf_image(COLORS["Poor"]))
+    assert np.argmax(probabilities) == 2 and cnn.calls == 0
+
+    # An ambiguous leaf, half "Excellent" and half "Poor" colored, goes to the CNN
+    mixed = leaf_image(COLORS["Excellent"])
+    mixed[:, 112:] = leaf_image(COLORS["Poor"])[:, 112:]
+    probabilities = bundle.classify_pixels(mixed)
+    assert np.argmax(probabilities) == 0 and cnn.calls == 1
+
+    stats = bundle.cascade.stats()
+    assert stats["images"] == 2 and stats["early_exits"] == 1 and stats["early_exit_rate"] == 0.5
+
+def test_threshold_trades_exits_for_cnn_calls(monkeypatch):
+    monkeypatch.setattr("app.services.ml_service.settings.INFERENCE_BATCHING_ENABLED", False)
+    cnn = FakeCNN()
+    bundle = ModelBundle("test", vision_model=cnn, cascade=color_cascade(threshold=1.0))
+
+    for name in CLASSES:
+        bundle.classify_pixels(leaf_image(COLORS[name]))
+    assert cnn.calls == 3 and bundle.cascade.stats()["early_exit_rate"] == 0.0
+
+def test_shadow_samples_measure_agreement(monkeypatch):
+    monkeypatch.setattr("app.services.ml_service.settings.INFERENCE_BATCHING_ENABLED", False)
+    executor = InferenceExecutor(max_workers=1, max_queue_depth=8)
+    monkeypatch.setattr("app.services.ml_service.background_executor", executor)
+    completed = inference_executor.stats()["completed"]
+    cnn = FakeCNN(class_index=2)
+    bundle = ModelBundle("test", vision_model=cnn, cascade=color_cascade(threshold=0.9, shadow_rate=1.0))
+
+    assert np.argmax(bundle.classify_pixels(leaf_image(COLORS["Poor"]))) == 2
+    assert np.argmax(bundle.classify_pixels(leaf_image(COLORS["Excellent"]))) == 0
+    # Shadow CNN calls run in the background, off the request pool; wait for them
+    executor.shutdown()
+    assert executor.stats()["completed"] == 2 and inference_executor.stats()["completed"] == completed
+    stats = bundle.cascade.stats()
+    assert cnn.calls == 2
+    assert stats["shadow_samples"] == 2 and stats["shadow_agreement"] == 0.5
+
+def test_stats_report_the_serving_cascade(monkeypatch):
+    ml_service.wait_until_loaded(timeout=300)
+    bundle = ModelBundle("test", vision_model=FakeCNN(), cascade=color_cascade())
+    monkeypatch.setattr(ml_service, "bundle", bundle)
+
+    assert client.get("/stats").json()["cascade"]["threshold"] == 0.9
+    bundle.close()
+
+@pytest.mark.parametrize("class_names, expected", [(CLASSES, True), (["a", "b", "c"], False)])
+def test_cascade_must_match_the_model_classes(tmp_path, class_names, expected):
+    path = str(tmp_path / "leaf_cascade.npz")
+    color_cascade().save(path)
+
+    loaded = ml_service._load_cascade(path, {"class_names": class_names})
+    assert (loaded is not None) is expected
+    assert ml_service._load_cascade(str(tmp_path / "missing.npz"), {"class_names": CLASSES}) is None
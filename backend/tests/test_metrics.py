@@ -0,0 +1,42 @@
+import io
+from fastapi.testclient import TestClient
+from PIL import Image
+from prometheus_client import CollectorRegistry, generate_latest
+from app.core.metrics import CACHE_HITS, CACHE_MISSES, REGISTRY, CallbackGauge, _cache_hit_ratio
+from app.main import app
+
+client = TestClient(app)
+
+def test_callback_gauge_reads_labelled_values_at_scrape_time():
+    registry = CollectorRegistry()
+    timings = {"vision": 1.5}
+    gauge = CallbackGauge("test_load_seconds", "Test load phases.", labelnames=("phase",), registry=registry)
+    gauge.set_function(lambda: (((phase,), seconds) for phase, seconds in timings.items()))
+
+    timings["yield"] = 0.25
+    text = generate_latest(registry).decode()
+    assert "# TYPE test_load_seconds gauge" in text
+    assert 'test_load_seconds{phase="vision"} 1.5' in text
+    assert 'test_load_seconds{phase="yield"} 0.25' in text
+
+def test_cache_hit_ratio_follows_lookups():
+    def lookups(result):
+        return REGISTRY.get_sample_value("mulberry_prediction_cache_lookups_total", {"result": result})
+
+    hits, misses = lookups("hit"), lookups("miss")
+    CACHE_HITS.inc(3)
+    CACHE_MISSES.inc()
+    assert _cache_hit_ratio() == (hits + 3) / (hits + misses + 4)
+
+def test_metrics_endpoint_reports_stages():
+    buffer = io.BytesIO()
+    Image.new("RGB", (64, 48), (30, 140, 30)).save(buffer, format="JPEG")
+    client.post("/predict/leaf-quality", files={"file": ("leaf.jpg", buffer.getvalue(), "image/jpeg")})
+
+    response = client.get("/metrics")
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/plain")
+    for stage in ("upload_read", "hashing", "cache_lookup"):
+        assert f'mulberry_stage_duration_seconds_count{{stage="{stage}"}}' in response.text
+    assert "mulberry_prediction_cache_hit_ratio" in response.text
+    assert 'route="/predict/leaf-quality"' in response.text
@@ -0,0 +1,50 @@
+import numpy as np
+from fastapi.testclient import TestClient
+from app.main import app
+from app.services.ml_service import ModelBundle, ml_service
+
+client = TestClient(app)
+
+def test_startup_phases_are_timed():
+    assert ml_service.wait_until_loaded(timeout=300)
+    assert ml_service.state in ("ready", "failed")
+    for phase in ("vision_model", "yield_model", "warmup", "total"):
+        assert phase in ml_service.startup_timings
+
+    data = client.get("/health").json()
+    assert data["live"] is True
+    assert data["ready"] is ml_service.is_ready
+    assert data["startup_timings"] == ml_service.startup_timings
+
+def test_requests_get_503_while_loading(monkeypatch):
+    ml_service.wait_until_loaded(timeout=300)
+    monkeypatch.setattr(ml_service, "state", "warming")
+    monkeypatch.setattr(ml_service, "bundle", None)
+
+    assert client.get("/health/live").status_code == 200
+    assert client.get("/health/ready").status_code == 503
+    response = client.post("/predict/yield", json={"avg_quality": 1.0, "temperature": 25.0, "humidity": 70.0})
+    assert response.status_code == 503
+    assert "Retry-After" in response.headers
+
+    monkeypatch.setattr(ml_service, "state", "ready")
+    assert client.get("/health/ready").json() == {"ready": True, "model_state": "ready"}
+
+def test_warmup_runs_each_batch_size(monkeypatch):
+    shapes = []
+
+    class FakeModel:
+        pool_size = 3
+
+        def predict(self, batch):
+            shapes.append(batch.shape)
+            return np.zeros((len(batch), 3))
+
+    monkeypatch.setattr("app.services.ml_service.settings.WARMUP_BATCH_SIZES", [8, 1])
+    monkeypatch.setattr("app.services.ml_service.settings.WARMUP_ITERATIONS", 2)
+    bundle = ModelBundle("test", vision_model=FakeModel())
+    ml_service.warmup(bundle)
+    bundle.close()
+
+    # Every pooled interpreter sees every batch size
+    assert shapes == [(1, 224, 224, 3)] * 3 + [(8, 224, 224, 3)] * 3
@@ -0,0 +1,130 @@
+import io
+import shutil
+import time
+import numpy as np
+import pytest
+from fastapi.testclient import TestClient
+from PIL import Image
+from app.main import app
+from app.services.cache_service import cache_service
+from app.services.ml_service import DEFAULT_CONTRACT, ml_service
+from app.services.model_registry import ModelRegistry
+
+client = TestClient(app)
+HEADERS = {"X-Admin-Token": "secret"}
+
+class FakeVisionModel:
+    """Predicts a fixed class, so tests can tell model versions apart."""
+
+    def __init__(self, class_idx):
+        self.class_idx = class_idx
+
+    def predict(self, batch):
+        probs = np.zeros((len(batch), 3), dtype=np.float32)
+        probs[:, self.class_idx] = 1.0
+        return probs
+
+@pytest.fixture
+def registry(tmp_path, monkeypatch):
+    """A throwaway registry serving v1 with fake vision models (v1 -> class 0, v2 -> class 2)."""
+    shutil.copy(ml_service.registry.artifact_paths("v1")["yield"], tmp_path / "yield_model.pkl")
+    (tmp_path / "leaf_quality_model.h5").write_bytes(b"v1")
+    (tmp_path / "candidate.h5").write_bytes(b"v2")
+    registry = ModelRegistry(str(tmp_path))
+
+    def load_vision(backend, paths, timings):
+        with open(paths["keras"], "rb") as f:
+            return FakeVisionModel(0 if f.read() == b"v1" else 2), DEFAULT_CONTRACT
+
+    ml_service.wait_until_loaded(timeout=300)
+    monkeypatch.setattr("app.core.config.settings.ADMIN_TOKEN", "secret")
+    monkeypatch.setattr("app.core.config.settings.INFERENCE_BACKEND", "keras")
+    monkeypatch.setattr(ml_service, "registry", registry)
+    monkeypatch.setattr(ml_service, "_load_vision_backend", load_vision)
+    monkeypatch.setattr(ml_service, "bundle", ml_service.load_bundle("v1"))
+    monkeypatch.setattr(ml_service, "previous_bundle", None)
+    monkeypatch.setattr(ml_service, "state", "ready")
+    cache_service.clear()
+    yield registry
+    for bundle in (ml_service.bundle, ml_service.previous_bundle):
+        if bundle is not None:
+            bundle.close()
+    cache_service.clear()
+
+def predict(color):
+    buffer = io.BytesIO()
+    Image.new("RGB", (32, 32), color).save(buffer, format="PNG")
+    response = client.post("/predict/leaf-quality", files={"file": ("leaf.png", buffer.getvalue(), "image/png")})
+    assert response.status_code == 200
+    return response.json()
+
+def wait_for_reload():
+    deadline = time.time() + 30
+    while ml_service.reload_status["state"] == "loading" and time.time() < deadline:
+        time.sleep(0.01)
+    return ml_service.reload_status
+
+def test_register_shares_unchanged_artifacts(registry, tmp_path):
+    entry = registry.register("v2", {"keras": str(tmp_path / "candidate.h5")})
+
+    assert entry["keras"] == "versions/v2/leaf_quality_model.h5"
+    assert entry["yield"] == "yield_model.pkl"
+    assert registry.active_version == "v1"
+    with pytest.raises(ValueError):
+        registry.register("v2", {"keras": str(tmp_path / "candidate.h5")})
+
+def test_reload_swaps_version_and_rollback_restores_it(registry, tmp_path):
+    registry.register("v2", {"keras": str(tmp_path / "candidate.h5")})
+    first = predict((30, 140, 30))
+    assert (first["class_name"], first["model_version"]) == ("Excellent", "v1")
+
+    response = client.post("/admin/models/reload?version=v2", headers=HEADERS)
+    assert response.status_code == 202
+    assert wait_for_reload()["state"] == "idle"
+    assert ml_service.model_version == "v2"
+    assert registry.manifest()["active"] == "v2"
+
+    # Same image, new version: not answered from the v1 cache entry
+    second = predict((30, 140, 30))
+    assert (second["class_name"], second["model_version"], second["cached"]) == ("Poor", "v2", False)
+
+    response = client.post("/admin/models/rollback", headers=HEADERS)
+    assert response.json()["serving"] == "v1"
+    assert registry.manifest()["active"] == "v1"
+    third = predict((30, 140, 30))
+    assert (third["class_name"], third["cached"]) == ("Excellent", True)
+
+def test_failed_manifest_write_keeps_serving_version(registry, tmp_path, monkeypatch):
+    registry.register("v2", {"keras": str(tmp_path / "candidate.h5")})
+    serving = ml_service.bundle
+    set_active = registry.set_active
+    read_only = [True]
+
+    def failing_set_active(version):
+        if read_only[0]:
+            raise OSError("Read-only file system")
+        set_active(version)
+
+    monkeypatch.setattr(registry, "set_active", failing_set_active)
+    client.post("/admin/models/reload?version=v2", headers=HEADERS)
+    status = wait_for_reload()
+
+    assert status["state"] == "failed" and "Read-only" in status["error"]
+    assert ml_service.bundle is serving and ml_service.previous_bundle is None
+    # The serving bundle's batcher is still running
+    assert predict((30, 140, 30))["model_version"] == "v1"
+
+    read_only[0] = False
+    client.post("/admin/models/reload?version=v2", headers=HEADERS)
+    assert wait_for_reload()["state"] == "idle"
+    read_only[0] = True
+    with pytest.raises(OSError):
+        ml_service.rollback()
+    assert ml_service.model_version == "v2" and ml_service.previous_bundle.version == "v1"
+    assert registry.manifest()["active"] == "v2"
+
+def test_admin_requires_token(registry):
+    assert client.get("/admin/models").status_code == 403
+    assert client.get("/admin/models", headers={"X-Admin-Token": "wrong"}).status_code == 403
+    assert client.post("/admin/models/reload?version=v9", headers=HEADERS).status_code == 404
+    assert client.post("/admin/models/rollback", headers=HEADERS).status_code == 409
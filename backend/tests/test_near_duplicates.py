@@ -0,0 +1,53 @@
+import io
+import numpy as np
+from fastapi.testclient import TestClient
+from PIL import Image, ImageDraw
+from app.main import app
+from app.core.config import settings
+from app.services.ml_service import ml_service
+from app.services.cache_service import cache_service
+from app.services.near_duplicate_service import MultiIndexHashIndex, dhash
+
+client = TestClient(app)
+
+def leaf_image():
+    img = Image.new("RGB", (400, 300), (245, 245, 240))
+    ImageDraw.Draw(img).ellipse([80, 40, 320, 260], fill=(40, 130, 40))
+    ImageDraw.Draw(img).line([200, 40, 200, 260], fill=(90, 170, 60), width=6)
+    return img
+
+def encode(img, quality):
+    buffer = io.BytesIO()
+    img.save(buffer, format="JPEG", quality=quality)
+    return buffer.getvalue()
+
+def test_index_finds_hashes_within_distance():
+    index = MultiIndexHashIndex(max_distance=4, max_entries=1000)
+    rng = np.random.default_rng(3)
+    stored = [int(h) for h in rng.integers(0, 2**63, size=500, dtype=np.int64)]
+    for i, h in enumerate(stored):
+        index.add(h, i)
+
+    assert index.find(stored[7] ^ 0b1011) == (7, 3)
+    assert index.find(stored[7] ^ 0b11111) is None
+
+def test_recompressed_copy_reuses_cached_prediction(monkeypatch):
+    calls = []
+
+    def classify(img):
+        calls.append(dhash(img))
+        return "Excellent", 0.9
+
+    monkeypatch.setattr(settings, "PHASH_ENABLED", True)
+    monkeypatch.setattr(ml_service, "classify_decoded", classify)
+    cache_service.clear()
+
+    original = client.post("/predict/leaf-quality", files={"file": ("a.jpg", encode(leaf_image(), 95), "image/jpeg")}).json()
+    resized = leaf_image().resize((300, 225))
+    copy = client.post("/predict/leaf-quality", files={"file": ("b.jpg", encode(resized, 40), "image/jpeg")}).json()
+
+    assert len(calls) == 1
+    assert copy["near_duplicate_of"] == original["image_hash"]
+    assert copy["image_hash"] != original["image_hash"]
+    assert copy["class_name"] == "Excellent"
+    cache_service.clear()
@@ -0,0 +1,66 @@
+from app.services.persistent_cache import PersistentCache
+
+def test_entries_survive_reopen_and_are_compacted(tmp_path):
+    path = str(tmp_path / "predictions.sqlite3")
+    store = PersistentCache(path, max_entries=10)
+    for i in range(25):
+        store.put(f"hash-{i}", {"class_name": "Excellent", "confidence": i / 100})
+    store.flush()
+    store.close()
+
+    reopened = PersistentCache(path, max_entries=10)
+    stats = reopened.stats()
+    assert stats["entries"] <= 10
+    assert reopened.get("hash-24") == {"class_name": "Excellent", "confidence": 0.24}
+    assert reopened.get("hash-0") is None
+
+    recent = reopened.load_recent(3)
+    assert [key for key, _, _ in recent] == ["hash-24", "hash-23", "hash-22"]
+    reopened.close()
+
+def test_async_lookup_reads_the_disk_tier(tmp_path, monkeypatch):
+    import asyncio
+    from app.services.cache_service import cache_service
+
+    store = PersistentCache(str(tmp_path / "predictions.sqlite3"))
+    store.put("v1:abc", {"class_name": "Poor", "confidence": 0.7})
+    store.flush()
+    cache_service.clear()
+    monkeypatch.setattr(cache_service, "_store", store)
+
+    assert asyncio.run(cache_service.aget("v1:abc")) == {"class_name": "Poor", "confidence": 0.7}
+    # Promoted into memory
+    assert cache_service._cache.get("v1:abc") is not None
+    assert store.stats()["entries"] == 1
+    cache_service.clear()
+    store.close()
+
+def test_ttl_and_deletes_apply_to_the_disk_tier(tmp_path, monkeypatch):
+    import time
+    from app.services.cache_service import cache_service
+
+    store = PersistentCache(str(tmp_path / "predictions.sqlite3"))
+    monkeypatch.setattr(cache_service, "_store", store)
+    monkeypatch.setattr("app.services.cache_service.settings.CACHE_TTL_SECONDS", 0.2)
+    cache_service.clear()
+
+    cache_service.set("v1:old", {"class_name": "Poor"})
+    cache_service.set("v1:gone", {"class_name": "Moderate"})
+    store.flush()
+    cache_service.delete("v1:gone")
+    time.sleep(0.3)
+    cache_service.set("v1:new", {"class_name": "Excellent"})
+    store.flush()
+    cache_service._cache.clear()
+
+    # Expired on disk too, and not promoted back into memory with a fresh TTL
+    assert cache_service.get("v1:old") is None
+    assert store.get("v1:old") is not None and store.get("v1:old", max_age=0.2) is None
+    assert cache_service.get("v1:gone") is None and store.get("v1:gone") is None
+    assert cache_service.get("v1:new") == {"class_name": "Excellent"}
+    assert cache_service.prewarm() == 1
+
+    cache_service.clear()
+    store.flush()
+    assert store.get("v1:new") is None and store.stats()["entries"] == 0
+    store.close()
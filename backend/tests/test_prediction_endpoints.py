@@ -0,0 +1,136 @@
+import io
+import json
+import tarfile
+import zipfile
+import pytest
+from fastapi.testclient import TestClient
+from PIL import Image
+from app.main import app
+from app.services.ml_service import ml_service
+from app.services.cache_service import cache_service
+from app.utils.image_utils import get_image_hash
+
+client = TestClient(app)
+
+def make_jpeg(color):
+    buffer = io.BytesIO()
+    Image.new("RGB", (32, 32), color).save(buffer, format="JPEG")
+    return buffer.getvalue()
+
+@pytest.fixture
+def fake_model(monkeypatch):
+    """Replaces inference with a counter so tests do not need the CNN."""
+    calls = []
+
+    def predict(image_bytes):
+        calls.append(image_bytes)
+        return "Excellent", 0.9
+
+    monkeypatch.setattr(ml_service, "predict_leaf_quality", predict)
+    cache_service.clear()
+    yield calls
+    cache_service.clear()
+
+def test_batch_streams_one_line_per_image(fake_model):
+    """Files and archive members are each scored once and streamed as NDJSON."""
+    archive = io.BytesIO()
+    with zipfile.ZipFile(archive, "w") as zf:
+        zf.writestr("plot/leaf_a.jpg", make_jpeg((10, 120, 10)))
+        zf.writestr("plot/notes.txt", "not an image")
+
+    client.post("/predict/leaf-quality", files={"file": ("b.jpg", make_jpeg((200, 200, 20)), "image/jpeg")})
+    assert len(fake_model) == 1
+
+    response = client.post("/predict/leaf-quality/batch", files=[
+        ("files", ("b.jpg", make_jpeg((200, 200, 20)), "image/jpeg")),
+        ("files", ("c.jpg", make_jpeg((120, 60, 20)), "image/jpeg")),
+        ("files", ("plot.zip", archive.getvalue(), "application/zip")),
+    ])
+
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("application/x-ndjson")
+    lines = [json.loads(line) for line in response.text.splitlines()]
+    by_name = {line["filename"]: line for line in lines}
+
+    assert sorted(by_name) == ["b.jpg", "c.jpg", "plot/leaf_a.jpg"]
+    assert by_name["b.jpg"]["cached"] is True
+    assert by_name["c.jpg"]["cached"] is False
+    assert all(line["class_name"] == "Excellent" for line in lines)
+    # b.jpg was already scored by the single-image endpoint
+    assert len(fake_model) == 3
+
+def test_batch_rejects_non_images(fake_model):
+    response = client.post("/predict/leaf-quality/batch", files=[
+        ("files", ("notes.txt", b"hello", "text/plain")),
+    ])
+    assert response.status_code == 400
+
+def test_batch_rejects_oversized_archive_members(fake_model, monkeypatch):
+    """Sizes come from the archive headers, so a zip bomb is refused before it is expanded."""
+    archive = io.BytesIO()
+    with zipfile.ZipFile(archive, "w", compression=zipfile.ZIP_DEFLATED) as zf:
+        zf.writestr("bomb.jpg", b"\0" * 2_000_000)
+        zf.writestr("leaf.jpg", make_jpeg((10, 120, 10)))
+    upload = [("files", ("plot.zip", archive.getvalue(), "application/zip"))]
+
+    monkeypatch.setattr("app.api.endpoints.prediction.settings.MAX_IMAGE_BYTES", 1_000_000)
+    response = client.post("/predict/leaf-quality/batch", files=upload)
+    assert response.status_code == 413 and "bomb.jpg" in response.json()["detail"]
+
+    monkeypatch.setattr("app.api.endpoints.prediction.settings.MAX_IMAGE_BYTES", 4_000_000)
+    monkeypatch.setattr("app.api.endpoints.prediction.settings.BATCH_MAX_EXTRACTED_BYTES", 1_500_000)
+    response = client.post("/predict/leaf-quality/batch", files=upload)
+    assert response.status_code == 413
+    assert fake_model == []
+
+def test_batch_limits_plain_images_and_archive_junk(fake_model, monkeypatch):
+    leaf = make_jpeg((10, 120, 10))
+    monkeypatch.setattr("app.api.endpoints.prediction.settings.MAX_IMAGE_BYTES", len(leaf) - 1)
+    response = client.post("/predict/leaf-quality/batch", files=[("files", ("a.jpg", leaf, "image/jpeg"))])
+    assert response.status_code == 413
+
+    # Plain image parts count towards the per-request total
+    monkeypatch.setattr("app.api.endpoints.prediction.settings.MAX_IMAGE_BYTES", len(leaf))
+    monkeypatch.setattr("app.api.endpoints.prediction.settings.BATCH_MAX_EXTRACTED_BYTES", 2 * len(leaf))
+    response = client.post("/predict/leaf-quality/batch", files=[
+        ("files", (f"{i}.jpg", leaf, "image/jpeg")) for i in range(3)
+    ])
+    assert response.status_code == 413
+
+    # Skipped tar members are bounded by count and by their declared sizes
+    monkeypatch.setattr("app.api.endpoints.prediction.settings.BATCH_MAX_IMAGES", 2)
+    archive = io.BytesIO()
+    with tarfile.open(fileobj=archive, mode="w:gz") as tf:
+        for i in range(9):
+            info = tarfile.TarInfo(f"junk/{i}.txt")
+            tf.addfile(info, io.BytesIO(b""))
+    response = client.post(
+        "/predict/leaf-quality/batch", files=[("files", ("plot.tar.gz", archive.getvalue(), "application/gzip"))]
+    )
+    assert response.status_code == 413 and "entries" in response.json()["detail"]
+    assert fake_model == []
+
+def test_duplicate_images_in_flight_share_one_inference(fake_model):
+    """Identical images scored concurrently run the model only once."""
+    leaf = make_jpeg((30, 150, 30))
+    response = client.post("/predict/leaf-quality/batch", files=[
+        ("files", (f"copy_{i}.jpg", leaf, "image/jpeg")) for i in range(5)
+    ])
+
+    lines = [json.loads(line) for line in response.text.splitlines()]
+    assert len(lines) == 5
+    assert len({line["image_hash"] for line in lines}) == 1
+    assert len(fake_model) == 1
+
+def test_lookup_by_hash_skips_upload(fake_model):
+    leaf = make_jpeg((60, 140, 40))
+    image_hash = get_image_hash(leaf)
+
+    assert client.get(f"/predict/leaf-quality/by-hash/{image_hash}").status_code == 404
+    client.post("/predict/leaf-quality", files={"file": ("leaf.jpg", leaf, "image/jpeg")})
+
+    response = client.get(f"/predict/leaf-quality/by-hash/{image_hash.upper()}")
+    assert response.status_code == 200
+    assert response.json()["cached"] is True
+    assert response.json()["class_name"] == "Excellent"
+    assert client.get("/predict/leaf-quality/by-hash/not-a-hash").status_code == 400
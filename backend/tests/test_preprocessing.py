@@ -0,0 +1,71 @@
+import io
+import json
+import os
+import numpy as np
+import pytest
+from PIL import Image
+from app.utils.preprocessing import (
+    DEFAULT_CONTRACT, BatchBuffer, ImageTooLargeError, InvalidImageError,
+    decode_image, load_contract, scale_pixels
+)
+
+def jpeg_bytes(img, **kwargs):
+    buffer = io.BytesIO()
+    img.save(buffer, format="JPEG", **kwargs)
+    return buffer.getvalue()
+
+def test_decode_applies_exif_orientation():
+    """A portrait photo stored landscape with Orientation=6 is rotated upright."""
+    img = Image.new("RGB", (400, 200), (0, 0, 255))
+    img.paste((255, 0, 0), (0, 0, 200, 200))  # left half red
+    exif = Image.Exif()
+    exif[0x0112] = 6  # rotate 90 degrees clockwise when displayed
+
+    decoded = decode_image(jpeg_bytes(img, exif=exif), size=(224, 224))
+    pixels = np.asarray(decoded)
+
+    assert decoded.size == (224, 224)
+    assert pixels[10, 112, 0] > 200  # red ends up on top
+    assert pixels[210, 112, 2] > 200  # blue at the bottom
+
+def test_decode_enforces_limits():
+    data = jpeg_bytes(Image.new("RGB", (300, 300)))
+    with pytest.raises(ImageTooLargeError):
+        decode_image(data, max_bytes=100)
+    with pytest.raises(ImageTooLargeError):
+        decode_image(data, max_pixels=300 * 299)
+    with pytest.raises(InvalidImageError):
+        decode_image(b"not an image")
+
+def test_batch_buffer_matches_float_division():
+    images = [np.random.default_rng(i).integers(0, 256, (224, 224, 3), dtype=np.uint8) for i in range(3)]
+    batch = BatchBuffer(4).fill(images)
+
+    assert batch.shape == (3, 224, 224, 3)
+    assert batch.dtype == np.float32
+    # Same as mobilenet_v2.preprocess_input, which training uses
+    np.testing.assert_allclose(batch, np.stack(images) / 127.5 - 1.0, rtol=1e-6, atol=1e-6)
+    unit = BatchBuffer(4, scaling="unit").fill(images)
+    np.testing.assert_allclose(unit, np.stack(images) / 255.0, rtol=1e-6)
+    out = np.empty((224, 224, 3), dtype=np.float32)
+    assert scale_pixels(images[0], out=out) is out
+
+def test_load_contract_reads_sidecar(tmp_path):
+    model_path = tmp_path / "leaf_quality_model.h5"
+    assert load_contract(str(model_path)) == DEFAULT_CONTRACT
+
+    (tmp_path / "leaf_quality_model.json").write_text(
+        json.dumps({"input_size": [160, 160], "scaling": "unit", "class_names": ["A", "B"]})
+    )
+    contract = load_contract(str(model_path))
+    assert contract["input_size"] == [160, 160]
+    assert contract["scaling"] == "unit"
+    assert contract["class_names"] == ["A", "B"]
+
+    (tmp_path / "leaf_quality_model.json").write_text(json.dumps({"scaling": "caffe"}))
+    with pytest.raises(ValueError):
+        load_contract(str(model_path))
+
+def test_shipped_contract_matches_training_default():
+    models_dir = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "models")
+    assert load_contract(os.path.join(models_dir, "leaf_quality_model.h5")) == DEFAULT_CONTRACT
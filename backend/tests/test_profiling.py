@@ -0,0 +1,49 @@
+import pytest
+from fastapi.testclient import TestClient
+from app.main import app
+from app.services.ml_service import ml_service
+from app.services.profiling_service import profile_store
+
+client = TestClient(app)
+ROW = {"avg_quality": 1.5, "temperature": 25.0, "humidity": 70.0}
+
+ml_service.wait_until_loaded(timeout=300)
+pytestmark = pytest.mark.skipif(ml_service.yield_model is None, reason="Yield model not loaded")
+
+@pytest.fixture
+def profiling(tmp_path, monkeypatch):
+    monkeypatch.setattr("app.core.config.settings.PROFILING_ENABLED", True)
+    monkeypatch.setattr("app.core.config.settings.PROFILING_INTERVAL_MS", 1.0)
+    monkeypatch.setattr("app.core.config.settings.ADMIN_TOKEN", "secret")
+    monkeypatch.setattr(profile_store, "directory", str(tmp_path))
+    monkeypatch.setattr(profile_store, "max_files", 2)
+
+def test_flagged_request_is_profiled_and_downloadable(profiling):
+    response = client.post("/predict/yield", json=ROW, headers={"X-Profile": "1"})
+    assert response.status_code == 200
+    name = response.headers["X-Profile-Id"]
+
+    listing = client.get("/admin/profiles", headers={"X-Admin-Token": "secret"}).json()
+    assert [entry["name"] for entry in listing["profiles"]] == [name]
+    download = client.get(f"/admin/profiles/{name}", headers={"X-Admin-Token": "secret"})
+    assert download.status_code == 200
+    # Folded stacks: "thread;frame;...;frame count"
+    for line in download.text.splitlines():
+        assert line.rsplit(" ", 1)[1].isdigit()
+
+def test_streaming_response_is_profiled_until_done(profiling):
+    response = client.post("/predict/yield/batch?profile=1", json=[ROW, ROW])
+    assert response.status_code == 200
+    assert profile_store.path(response.headers["X-Profile-Id"]) is not None
+
+def test_ring_keeps_newest_files(profiling):
+    names = [client.post("/predict/yield", json=ROW, headers={"X-Profile": "1"}).headers["X-Profile-Id"] for _ in range(3)]
+    assert {entry["name"] for entry in profile_store.list()} <= set(names)
+    assert len(profile_store.list()) == 2
+
+def test_no_profile_without_flag_or_when_disabled(profiling, monkeypatch):
+    assert "X-Profile-Id" not in client.post("/predict/yield", json=ROW).headers
+    monkeypatch.setattr("app.core.config.settings.PROFILING_ENABLED", False)
+    assert "X-Profile-Id" not in client.post("/predict/yield", json=ROW, headers={"X-Profile": "1"}).headers
+    assert profile_store.list() == []
+    assert client.get("/admin/profiles/../main.py", headers={"X-Admin-Token": "secret"}).status_code == 404
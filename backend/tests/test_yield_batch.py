@@ -0,0 +1,64 @@
+import csv
+import io
+import json
+import pytest
+from fastapi.testclient import TestClient
+from app.main import app
+from app.services.ml_service import ml_service
+
+client = TestClient(app)
+
+ROWS = [
+    {"avg_quality": 1.5, "temperature": 25.0, "humidity": 70.0},
+    {"avg_quality": 0.2, "temperature": 33.5, "humidity": 55.0},
+    {"avg_quality": 1.9, "temperature": 22.1, "humidity": 88.0},
+]
+
+# Models load in the background at startup; wait for them here
+ml_service.wait_until_loaded(timeout=300)
+pytestmark = pytest.mark.skipif(ml_service.yield_model is None, reason="Yield model not loaded")
+
+def single_predictions():
+    return [client.post("/predict/yield", json=row).json()["estimated_yield"] for row in ROWS]
+
+def test_json_batch_matches_single_requests(monkeypatch):
+    """Chunked vectorized scoring returns the same values as one-row requests."""
+    monkeypatch.setattr("app.api.endpoints.prediction.settings.YIELD_BATCH_CHUNK_SIZE", 2)
+    response = client.post("/predict/yield/batch", json=ROWS)
+
+    assert response.status_code == 200
+    lines = [json.loads(line) for line in response.text.splitlines()]
+    assert [line["index"] for line in lines] == [0, 1, 2]
+    assert [line["estimated_yield"] for line in lines] == single_predictions()
+
+def test_csv_upload_streams_csv():
+    body = "temperature,humidity,avg_quality_score\n" + "".join(
+        f"{r['temperature']},{r['humidity']},{r['avg_quality']}\n" for r in ROWS
+    )
+    response = client.post(
+        "/predict/yield/batch?format=csv",
+        files={"file": ("batches.csv", body, "text/csv")},
+    )
+
+    assert response.status_code == 200
+    rows = list(csv.DictReader(io.StringIO(response.text)))
+    assert [float(r["estimated_yield"]) for r in rows] == single_predictions()
+    assert float(rows[1]["temperature"]) == 33.5
+
+def test_csv_missing_columns_is_rejected():
+    response = client.post(
+        "/predict/yield/batch",
+        content="temperature,humidity\n25,70\n",
+        headers={"content-type": "text/csv"},
+    )
+    assert response.status_code == 400
+
+def test_json_rows_are_limited_and_validated(monkeypatch):
+    monkeypatch.setattr("app.api.endpoints.prediction.settings.YIELD_BATCH_MAX_ROWS", 2)
+    response = client.post("/predict/yield/batch", json=ROWS)
+    assert response.status_code == 400
+
+    response = client.post(
+        "/predict/yield/batch", content="[{", headers={"content-type": "application/json"}
+    )
+    assert response.status_code == 400
@@ -0,0 +1,95 @@
+import numpy as np
+import pytest
+from fastapi.testclient import TestClient
+from sklearn.ensemble import RandomForestRegressor
+from sklearn.pipeline import Pipeline
+from sklearn.preprocessing import StandardScaler
+from app.main import app
+from app.services.ml_service import ml_service
+from app.utils.flat_forest import FlatForest
+from app.utils.yield_grid import YieldGrid, evaluate_on_grid, grid_axes, load_or_build
+
+client = TestClient(app)
+LOWER, UPPER, POINTS = [0.0, 15.0, 30.0], [2.0, 40.0, 100.0], [21, 26, 36]
+
+@pytest.fixture(scope="module")
+def forest():
+    rng = np.random.default_rng(0)
+    X = rng.uniform(LOWER, UPPER, size=(400, 3))
+    y = 50 + 25 * X[:, 0] - 1.5 * np.abs(X[:, 1] - 25) - 0.5 * np.abs(X[:, 2] - 70)
+    model = Pipeline([("scaler", StandardScaler()), ("regressor", RandomForestRegressor(n_estimators=10, random_state=0))])
+    return FlatForest.from_sklearn(model.fit(X, y))
+
+@pytest.fixture
+def grid_file(forest, tmp_path):
+    path = tmp_path / "yield_model.npz"
+    forest.save(path)
+    return str(path)
+
+def test_grid_values_are_exact_forest_predictions(forest):
+    axes = grid_axes(LOWER, UPPER, POINTS)
+    points = np.stack(np.meshgrid(*axes, indexing="ij"), axis=-1).reshape(-1, 3)
+
+    assert np.array_equal(evaluate_on_grid(forest, axes).reshape(-1), forest.predict(points))
+
+def test_interpolation_is_trilinear():
+    # A linear function is reproduced exactly by trilinear interpolation
+    axes = grid_axes(LOWER, UPPER, POINTS)
+    q, t, h = np.meshgrid(*axes, indexing="ij")
+    grid = YieldGrid((2 * q + 0.5 * t - 0.25 * h).astype(np.float32), LOWER, UPPER, model=None)
+    X = np.random.default_rng(1).uniform(LOWER, UPPER, size=(500, 3))
+    expected = 2 * X[:, 0] + 0.5 * X[:, 1] - 0.25 * X[:, 2]
+
+    assert np.allclose(grid.predict(X), expected, atol=1e-4)
+    assert np.allclose([grid.predict(row[np.newaxis])[0] for row in X[:50]], expected[:50], atol=1e-4)
+    assert np.isclose(grid.predict(np.array([UPPER]))[0], 2 * 2.0 + 0.5 * 40 - 0.25 * 100, atol=1e-4)
+
+def test_rows_outside_grid_use_the_model(forest, grid_file, tmp_path):
+    grid = load_or_build(forest, grid_file, LOWER, UPPER, POINTS, str(tmp_path / "grids"))
+    outside = np.array([[5.0, 25.0, 70.0], [1.0, 10.0, 70.0], [1.0, 25.0, 120.0]])
+    mixed = np.vstack([outside, [[1.0, 25.0, 70.0]]])
+
+    assert np.array_equal(grid.predict(outside), forest.predict(outside))
+    assert np.array_equal(grid.predict(outside[:1]), forest.predict(outside[:1]))
+    assert np.array_equal(grid.predict(mixed)[:3], forest.predict(outside))
+
+def test_grid_is_cached_and_memory_mapped(forest, grid_file, tmp_path):
+    first = load_or_build(forest, grid_file, LOWER, UPPER, POINTS, str(tmp_path / "grids"))
+    second = load_or_build(forest, grid_file, LOWER, UPPER, POINTS, str(tmp_path / "grids"))
+
+    assert isinstance(second.values, np.memmap)
+    assert second.values.dtype == np.float32
+    assert second.errors == first.errors
+    assert len(list((tmp_path / "grids").glob("*.npy"))) == 1
+
+    # The reported error is what the grid actually achieves
+    X = np.random.default_rng(2).uniform(LOWER, UPPER, size=(2000, 3))
+    assert np.abs(second.predict(X) - forest.predict(X)).max() <= first.errors["max_abs"] * 1.5
+    assert 0 <= first.errors["mean_abs"] <= first.errors["max_abs"]
+
+def test_service_serves_grid_within_error_budget(forest, grid_file, tmp_path, monkeypatch):
+    monkeypatch.setattr("app.core.config.settings.YIELD_GRID_DIR", str(tmp_path / "grids"))
+    monkeypatch.setattr("app.core.config.settings.YIELD_GRID_MIN", LOWER)
+    monkeypatch.setattr("app.core.config.settings.YIELD_GRID_MAX", UPPER)
+    monkeypatch.setattr("app.core.config.settings.YIELD_GRID_POINTS", POINTS)
+
+    grid = ml_service._load_yield_grid(forest, grid_file)
+    assert isinstance(grid, YieldGrid)
+
+    monkeypatch.setattr("app.core.config.settings.YIELD_GRID_MAX_ERROR", grid.errors["max_abs"] / 2)
+    assert ml_service._load_yield_grid(forest, grid_file) is forest
+
+def test_stats_report_grid_error(forest, grid_file, tmp_path, monkeypatch):
+    ml_service.wait_until_loaded(timeout=300)
+    if ml_service.bundle is None:
+        pytest.skip("Models not loaded")
+    grid = load_or_build(forest, grid_file, LOWER, UPPER, POINTS, str(tmp_path / "grids"))
+    monkeypatch.setattr(ml_service.bundle, "yield_model", grid)
+
+    stats = client.get("/stats").json()["yield_grid"]
+    assert stats["points"] == POINTS
+    assert stats["errors"]["max_abs"] == grid.errors["max_abs"]
+
+    response = client.post("/predict/yield", json={"avg_quality": 1.0, "temperature": 25.0, "humidity": 70.0})
+    assert response.status_code == 200
+    assert response.json()["estimated_yield"] == round(float(grid.predict(np.array([[1.0, 25.0, 70.0]]))[0]), 4)
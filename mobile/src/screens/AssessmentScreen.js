@@ -25,8 +25,9 @@ export default function AssessmentScreen({ navigation }) {
             // NOTE: In production, we would use TFLite here for offline inference.
             // For now, we will use the API bridge as a fallback/hybrid approach
             // checking if the model is loaded on device would go here.
+            // A leaf photo the server has already scored is not uploaded again.
 
-            const data = await mulberryApi.predictQuality(uri);
+            const data = await mulberryApi.predictQualityByHash(uri);
             setResult(data);
         } catch (error) {
             Alert.alert("Error", "Failed to analyze image. Please try again.");
@@ -68,22 +69,22 @@ export default function AssessmentScreen({ navigation }) {
                     {result && !loading && (
                         <BlurView intensity={30} tint="dark" style={styles.resultCard}>
                             <Text style={[theme.typography.h2, { color: theme.colors.primary }]}>
-                                {result.class_name || "Healthy"}
+                                {result.class_name || "Excellent"}
                             </Text>
                             <Text style={theme.typography.body}>
                                 Confidence: {(result.confidence * 100).toFixed(1)}%
                             </Text>
                             <View style={styles.divider} />
                             <Text style={theme.typography.body}>
-                                Based on the visual analysis, this leaf appears to be {result.class_name ? result.class_name.toLowerCase() : "healthy"}.
+                                Based on the visual analysis, this leaf appears to be {result.class_name ? result.class_name.toLowerCase() : "excellent"}.
                             </Text>
 
                             <TouchableOpacity
                                 style={[styles.actionButton, { marginTop: 15, backgroundColor: theme.colors.secondary }]}
                                 onPress={() => {
-                                    // Calculate score: 1.0 if Healthy (scaled by confidence), else low score
-                                    const isHealthy = (result.class_name || "Healthy").toLowerCase() === 'healthy';
-                                    const score = isHealthy ? result.confidence : (1 - result.confidence);
+                                    // Calculate score: 1.0 if Excellent (scaled by confidence), else low score
+                                    const isExcellent = (result.class_name || "Excellent").toLowerCase() === 'excellent';
+                                    const score = isExcellent ? result.confidence : (1 - result.confidence);
                                     navigation.navigate('Yield', {
                                         qualityScore: score.toFixed(2),
                                         imageUri: imageUri
@@ -0,0 +1,17 @@
+import * as Crypto from 'expo-crypto';
+import * as FileSystem from 'expo-file-system';
+
+// SHA-256 (lowercase hex) of a local image file's bytes; the same value the
+// server uses as image_hash, so a scan can be looked up before uploading.
+export const sha256OfFile = async (uri) => {
+    const base64 = await FileSystem.readAsStringAsync(uri, {
+        encoding: FileSystem.EncodingType.Base64,
+    });
+    const binary = atob(base64);
+    const bytes = new Uint8Array(binary.length);
+    for (let i = 0; i < binary.length; i += 1) {
+        bytes[i] = binary.charCodeAt(i);
+    }
+    const digest = await Crypto.digest(Crypto.CryptoDigestAlgorithm.SHA256, bytes);
+    return Array.from(new Uint8Array(digest), (byte) => byte.toString(16).padStart(2, '0')).join('');
+};
@@ -1,5 +1,6 @@
 import axios from 'axios';
 import Constants from 'expo-constants';
+import { sha256OfFile } from './imageHash';
 
 // Get API URL from app.json extra or fallback to localhost
 const getApiUrl = () => {
@@ -76,5 +77,109 @@ export const mulberryApi = {
             console.error("Quality prediction error:", error);
             throw error;
         }
+    },
+
+    /**
+     * Predict leaf quality, hash first: looks the image up by the SHA-256 of
+     * its bytes and only uploads it if the server has not scored it yet.
+     * @param {string} fileUri - local image file
+     */
+    predictQualityByHash: async (fileUri) => {
+        let imageHash;
+        try {
+            imageHash = await sha256OfFile(fileUri);
+        } catch (error) {
+            console.error("Image hashing error, uploading instead:", error);
+            return mulberryApi.predictQuality(fileUri);
+        }
+
+        try {
+            const response = await api.get(`/predict/leaf-quality/by-hash/${imageHash}`);
+            return response.data;
+        } catch (error) {
+            if (error.response && error.response.status === 404) {
+                return mulberryApi.predictQuality(fileUri);
+            }
+            console.error("Hash lookup error:", error);
+            throw error;
+        }
+    },
+
+    /**
+     * Scores many leaves in one upload. The server streams one NDJSON line
+     * per image as it finishes; onResult is called for each line as it
+     * arrives. React Native's fetch buffers the whole body, so the response
+     * is read incrementally through XMLHttpRequest progress events instead.
+     * @param {string[]} imageUris - local image files
+     * @param {function} onResult - called with each parsed result line
+     * @returns {Promise<object[]>} - every result, in arrival order
+     */
+    predictQualityBatch: (imageUris, onResult) => {
+        const formData = new FormData();
+        imageUris.forEach((uri, index) => {
+            formData.append('files', {
+                uri,
+                name: `leaf_${index}.jpg`,
+                type: 'image/jpeg',
+            });
+        });
+
+        return new Promise((resolve, reject) => {
+            const xhr = new XMLHttpRequest();
+            const results = [];
+            let parsedLength = 0;
+
+            // Parses the complete lines received since the last call
+            const readLines = (text) => {
+                const end = text.lastIndexOf('\n') + 1;
+                if (end <= parsedLength) {
+                    return;
+                }
+                text.slice(parsedLength, end)
+                    .split('\n')
+                    .filter((line) => line.trim().length > 0)
+                    .forEach((line) => {
+                        const result = JSON.parse(line);
+                        results.push(result);
+                        if (onResult) {
+                            onResult(result);
+                        }
+                    });
+                parsedLength = end;
+            };
+
+            const fail = (error) => {
+                console.error("Batch quality prediction error:", error);
+                reject(error);
+            };
+
+            xhr.open('POST', `${BASE_URL}/predict/leaf-quality/batch`);
+            xhr.onprogress = () => {
+                if (xhr.status !== 200) {
+                    return;
+                }
+                try {
+                    readLines(xhr.responseText);
+                } catch (error) {
+                    xhr.abort();
+                    fail(error);
+                }
+            };
+            xhr.onload = () => {
+                if (xhr.status !== 200) {
+                    fail(new Error(`Batch prediction failed with status ${xhr.status}`));
+                    return;
+                }
+                try {
+                    // The last line may not end with a newline
+                    readLines(xhr.responseText.endsWith('\n') ? xhr.responseText : `${xhr.responseText}\n`);
+                    resolve(results);
+                } catch (error) {
+                    fail(error);
+                }
+            };
+            xhr.onerror = () => fail(new Error('Batch prediction request failed'));
+            xhr.send(formData);
+        });
     }
 };
@@ -0,0 +1,29 @@
+import importlib.util
+import os
+import sys
+
+# -------------------------------------------------------------------------
+# Dependency-free modules under backend/app/utils (the preprocessing
+# contract, the flat forest) are shared with training and the Streamlit app
+# rather than copied: the backend image is built from backend/ alone.
+#
+# They are loaded by file path instead of by putting backend/ on sys.path,
+# because `streamlit run app/app.py` puts app/ first on the path and
+# `import app` would then find app/app.py rather than backend/app.
+# -------------------------------------------------------------------------
+
+UTILS_DIR = os.path.join(
+    os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "backend", "app", "utils"
+)
+
+
+def load_backend_module(name):
+    """Returns backend/app/utils/<name>.py as a module, reusing the backend's own import if present."""
+    for module_name in (f"app.utils.{name}", f"backend_utils.{name}"):
+        if module_name in sys.modules:
+            return sys.modules[module_name]
+    spec = importlib.util.spec_from_file_location(module_name, os.path.join(UTILS_DIR, f"{name}.py"))
+    module = importlib.util.module_from_spec(spec)
+    sys.modules[module_name] = module
+    spec.loader.exec_module(module)
+    return module
@@ -0,0 +1,131 @@
+import hashlib
+import json
+import os
+import time
+import numpy as np
+import tensorflow as tf
+from src.preprocessing import SCALINGS
+
+# -------------------------------------------------------------------------
+# tf.data input pipeline for train_vision.py.
+#
+# Files are decoded and resized in parallel once, cached as uint8 tensors to
+# a local file, then shuffled, batched, augmented in the graph and
+# prefetched. Later epochs read the cache instead of decoding JPEGs again.
+# -------------------------------------------------------------------------
+
+AUTOTUNE = tf.data.AUTOTUNE
+
+# Bump when what the cache file holds changes (2: images only, no labels)
+CACHE_FORMAT = 2
+
+
+def _cache_file(cache_dir, split, paths, input_size):
+    # Keyed by the files (name, size, mtime) and image size, so a regenerated
+    # dataset never reads a stale cache
+    files = [(path, os.path.getsize(path), os.path.getmtime(path)) for path in sorted(paths)]
+    key = hashlib.sha256(json.dumps([CACHE_FORMAT, files, list(input_size)]).encode()).hexdigest()[:12]
+    return os.path.join(cache_dir, f"{split}-{input_size[0]}x{input_size[1]}-{key}")
+
+
+def decode_and_resize(path, input_size):
+    """Reads an image file into a uint8 (height, width, 3) tensor at `input_size`."""
+    image = tf.io.decode_image(tf.io.read_file(path), channels=3, expand_animations=False)
+
+    def resize():
+        # Antialiased bicubic, close to the Pillow resize the backend serves with
+        resized = tf.image.resize(image, input_size, method="bicubic", antialias=True)
+        return tf.cast(tf.clip_by_value(tf.round(resized), 0, 255), tf.uint8)
+
+    already_sized = tf.reduce_all(tf.equal(tf.shape(image)[:2], input_size))
+    image = tf.cond(already_sized, lambda: image, resize)
+    image.set_shape((*input_size, 3))
+    return image
+
+
+def build_augmenter(seed=None):
+    """
+    Random horizontal flip and up to 20 degrees of rotation, the same as the
+    ImageDataGenerator this replaces, applied to whole batches in the graph.
+    """
+    return tf.keras.Sequential([
+        tf.keras.layers.RandomFlip("horizontal", seed=seed),
+        tf.keras.layers.RandomRotation(20 / 360, fill_mode="nearest", seed=seed),
+    ])
+
+
+def make_dataset(
+    df,
+    data_dir,
+    class_names,
+    input_size=(224, 224),
+    scaling="mobilenet_v2",
+    batch_size=32,
+    training=False,
+    cache_dir=None,
+    split="train",
+    seed=42,
+    targets=None,
+):
+    """
+    Builds a batched dataset of (scaled float32 images, one-hot labels) from
+    a labels.csv frame with `filename` and `quality` columns. `targets`
+    ((N, k) floats in frame order, e.g. a teacher's soft targets) replaces
+    the one-hot labels.
+
+    With `cache_dir`, decoded images are cached to a file there (filled
+    during the first epoch); otherwise they are cached in memory.
+    Training datasets are reshuffled every epoch and augmented.
+    """
+    input_size = tuple(input_size)
+    paths = [os.path.join(data_dir, name) for name in df["filename"]]
+    class_index = {name: i for i, name in enumerate(class_names)}
+    if targets is None:
+        labels = tf.one_hot([class_index[q] for q in df["quality"]], len(class_names))
+    else:
+        labels = tf.constant(targets, dtype=tf.float32)
+
+    # Only the decoded images are cached, so the same cache serves any labels
+    images = tf.data.Dataset.from_tensor_slices(paths).map(
+        lambda path: decode_and_resize(path, input_size),
+        num_parallel_calls=AUTOTUNE,
+        deterministic=True,
+    )
+    if cache_dir:
+        os.makedirs(cache_dir, exist_ok=True)
+        images = images.cache(_cache_file(cache_dir, split, paths, input_size))
+    else:
+        images = images.cache()
+    dataset = tf.data.Dataset.zip((images, tf.data.Dataset.from_tensor_slices(labels)))
+
+    if training:
+        dataset = dataset.shuffle(len(paths), seed=seed, reshuffle_each_iteration=True)
+    dataset = dataset.batch(batch_size)
+
+    multiplier, offset = SCALINGS[scaling]
+    augmenter = build_augmenter(seed) if training else None
+
+    def prepare(images, labels):
+        images = tf.cast(images, tf.float32)
+        if augmenter is not None:
+            images = augmenter(images, training=True)
+        return images * multiplier + offset, labels
+
+    dataset = dataset.map(prepare, num_parallel_calls=AUTOTUNE)
+    return dataset.prefetch(AUTOTUNE)
+
+
+def measure_throughput(batches, epochs):
+    """
+    Iterates `batches` (a dataset, or a callable returning a fresh iterable
+    per epoch) without training. Returns images/sec for each epoch.
+    """
+    rates = []
+    for _ in range(epochs):
+        iterable = batches() if callable(batches) else batches
+        started = time.perf_counter()
+        count = 0
+        for images, _ in iterable:
+            count += int(np.shape(images)[0])
+        rates.append(round(count / (time.perf_counter() - started), 1))
+    return rates
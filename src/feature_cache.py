@@ -0,0 +1,133 @@
+import hashlib
+import json
+import os
+import numpy as np
+import tensorflow as tf
+from src.data_pipeline import AUTOTUNE, decode_and_resize
+from src.preprocessing import SCALINGS
+
+# -------------------------------------------------------------------------
+# Cache of frozen-backbone embeddings for head-only training.
+#
+# The backbone (MobileNetV2 + global average pooling) is frozen, so its
+# output for an image never changes. Each image is run through it once and
+# the pooled embedding is stored in a memory-mapped array, keyed by the
+# SHA-256 of the image file. Later runs embed only images not seen before.
+# A cache directory belongs to one backbone (weights, input size, scaling)
+# and storage dtype.
+# -------------------------------------------------------------------------
+
+
+def file_digest(path):
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def backbone_key(feature_extractor, input_size, scaling, dtype):
+    """Identifies the embeddings a backbone produces, so caches of different backbones never mix."""
+    digest = hashlib.sha256(json.dumps([list(input_size), scaling, np.dtype(dtype).name]).encode())
+    for weights in feature_extractor.get_weights():
+        digest.update(np.ascontiguousarray(weights).tobytes())
+    return digest.hexdigest()[:16]
+
+
+class FeatureCache:
+    """
+    `features.npy` holds one embedding per row (memory-mapped when read) and
+    `index.json` maps file digests to rows. Both are replaced atomically
+    when new rows are added.
+    """
+
+    def __init__(self, directory, dim, dtype=np.float16):
+        self.directory = directory
+        self.dim = dim
+        self.dtype = np.dtype(dtype)
+        self.features_path = os.path.join(directory, "features.npy")
+        self.index_path = os.path.join(directory, "index.json")
+        self.index = {}
+        if os.path.exists(self.index_path):
+            with open(self.index_path) as f:
+                index = json.load(f)
+            # features.npy is replaced before index.json, so it may hold rows
+            # the index does not know yet, but never fewer; otherwise start over
+            rows = len(np.load(self.features_path, mmap_mode="r")) if os.path.exists(self.features_path) else 0
+            if all(row < rows for row in index.values()):
+                self.index = index
+
+    def __len__(self):
+        return len(self.index)
+
+    def features(self):
+        """All cached embeddings as a read-only memmap ((0, dim) when empty)."""
+        if not self.index:
+            return np.zeros((0, self.dim), dtype=self.dtype)
+        return np.load(self.features_path, mmap_mode="r")
+
+    def missing(self, digests):
+        return sorted(set(digests) - set(self.index))
+
+    def add(self, digests, embeddings):
+        """Appends embeddings for new digests."""
+        old = self.features()
+        os.makedirs(self.directory, exist_ok=True)
+        tmp_path = self.features_path + ".tmp"
+        merged = np.lib.format.open_memmap(
+            tmp_path, mode="w+", dtype=self.dtype, shape=(len(old) + len(digests), self.dim)
+        )
+        # Rows of features.npy, which can exceed len(self.index) (see __init__)
+        first_row = len(old)
+        merged[:first_row] = old
+        merged[first_row:] = embeddings
+        merged.flush()
+        del merged, old
+        os.replace(tmp_path, self.features_path)
+
+        index = dict(self.index)
+        for row, digest in enumerate(digests, start=first_row):
+            index[digest] = row
+        with open(self.index_path + ".tmp", "w") as f:
+            json.dump(index, f)
+        os.replace(self.index_path + ".tmp", self.index_path)
+        self.index = index
+
+    def lookup(self, digests):
+        """Embeddings for `digests`, in order, as float32."""
+        rows = np.array([self.index[digest] for digest in digests], dtype=np.intp)
+        return np.asarray(self.features()[rows], dtype=np.float32)
+
+
+def embed_images(feature_extractor, paths, input_size, scaling, batch_size=32):
+    """Runs the frozen backbone over image files (decode, resize, scale; no augmentation)."""
+    multiplier, offset = SCALINGS[scaling]
+    dataset = (
+        tf.data.Dataset.from_tensor_slices(list(paths))
+        .map(lambda path: decode_and_resize(path, tuple(input_size)), num_parallel_calls=AUTOTUNE)
+        .batch(batch_size)
+        .map(lambda images: tf.cast(images, tf.float32) * multiplier + offset, num_parallel_calls=AUTOTUNE)
+        .prefetch(AUTOTUNE)
+    )
+    return feature_extractor.predict(dataset, verbose=0)
+
+
+def cached_features(feature_extractor, paths, cache_root, input_size, scaling, dtype=np.float16, batch_size=32):
+    """
+    Returns (N, dim) float32 embeddings for image files, running the
+    backbone only on files whose content is not cached yet.
+    Returns: (features, number of newly embedded images)
+    """
+    dim = feature_extractor.output_shape[-1]
+    directory = os.path.join(cache_root, backbone_key(feature_extractor, input_size, scaling, dtype))
+    cache = FeatureCache(directory, dim, dtype)
+
+    digests = [file_digest(path) for path in paths]
+    missing = cache.missing(digests)
+    if missing:
+        path_by_digest = dict(zip(digests, paths))
+        embeddings = embed_images(
+            feature_extractor, [path_by_digest[d] for d in missing], input_size, scaling, batch_size
+        )
+        cache.add(missing, embeddings)
+    return cache.lookup(digests), len(missing)
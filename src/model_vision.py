@@ -1,10 +1,12 @@
 import tensorflow as tf
 from tensorflow.keras import layers, models, applications
+from src.preprocessing import DEFAULT_CONTRACT, scale_pixels
 
 class LeafQualityModel:
-    def __init__(self, input_shape=(224, 224, 3), num_classes=3):
+    def __init__(self, input_shape=(224, 224, 3), num_classes=3, weights='imagenet'):
         self.input_shape = input_shape
         self.num_classes = num_classes
+        self.weights = weights
         self.model = self._build_model()
     
     def _build_model(self):
@@ -12,7 +14,7 @@ class LeafQualityModel:
         base_model = applications.MobileNetV2(
             input_shape=self.input_shape,
             include_top=False,
-            weights='imagenet'
+            weights=self.weights
         )
         base_model.trainable = False  # Freeze base layers for initial training
 
@@ -26,8 +28,24 @@ class LeafQualityModel:
         
         return model
     
-    def compile(self, learning_rate=0.001):
-        self.model.compile(
+    def feature_extractor(self):
+        """The frozen part of the model: backbone + pooling, image -> 1280-d embedding."""
+        return models.Sequential(self.model.layers[:2])
+
+    def head(self):
+        """
+        The trainable layers on top of the embedding, as their own model.
+        The layers are shared with self.model, so training the head trains
+        the full model's head.
+        """
+        embedding = layers.Input(shape=self.model.layers[1].output.shape[1:])
+        x = embedding
+        for layer in self.model.layers[2:]:
+            x = layer(x)
+        return models.Model(embedding, x)
+
+    def compile(self, learning_rate=0.001, model=None):
+        (model if model is not None else self.model).compile(
             optimizer=tf.keras.optimizers.Adam(learning_rate=learning_rate),
             loss='categorical_crossentropy',
             metrics=['accuracy']
@@ -40,21 +58,46 @@ class LeafQualityModel:
         self.model.save(path)
     
     @staticmethod
-    def preprocess_image(img_path, target_size=(224, 224)):
+    def preprocess_image(img_path, contract=DEFAULT_CONTRACT):
         """
-        Loads and preprocesses a single image.
-        Returns: numpy array of shape (1, 224, 224, 3)
+        Loads and preprocesses a single image using the preprocessing contract.
+        Returns: float32 array of shape (1, height, width, 3)
         """
         # Load image
-        img = tf.keras.utils.load_img(img_path, target_size=target_size)
+        img = tf.keras.utils.load_img(img_path, target_size=tuple(contract["input_size"]))
         img_array = tf.keras.utils.img_to_array(img)
         
-        # MobileNetV2 expects inputs [-1, 1], but check specific preprocessing
-        # applications.mobilenet_v2.preprocess_input does scaling
-        img_array = applications.mobilenet_v2.preprocess_input(img_array)
-        img_array = tf.expand_dims(img_array, 0) # Create batch axis
+        # Scale exactly as in training (mobilenet_v2: [-1, 1])
+        img_array = scale_pixels(img_array[None], contract["scaling"])
         return img_array
 
+class CompactLeafModel(LeafQualityModel):
+    """
+    A small student for CPU serving: MobileNetV2 at reduced width (`alpha`)
+    and input size, with the classifier directly on the pooled features.
+    The whole network is trained, since it learns from the full model's
+    soft targets (see src/train_distill.py).
+    """
+
+    def __init__(self, input_shape=(128, 128, 3), num_classes=3, weights='imagenet', alpha=0.35):
+        self.alpha = alpha
+        super().__init__(input_shape=input_shape, num_classes=num_classes, weights=weights)
+
+    def _build_model(self):
+        base_model = applications.MobileNetV2(
+            input_shape=self.input_shape,
+            alpha=self.alpha,
+            include_top=False,
+            weights=self.weights
+        )
+
+        return models.Sequential([
+            base_model,
+            layers.GlobalAveragePooling2D(),
+            layers.Dropout(0.2),
+            layers.Dense(self.num_classes, activation='softmax')
+        ])
+
 if __name__ == "__main__":
     # Test instantation
     model = LeafQualityModel()
@@ -2,6 +2,10 @@ import joblib
 from sklearn.ensemble import RandomForestRegressor
 from sklearn.pipeline import Pipeline
 from sklearn.preprocessing import StandardScaler
+from src.backend_utils import load_backend_module
+
+# The flat-array export is evaluated by the API; backend/app/utils/flat_forest.py is the one copy
+FlatForest = load_backend_module("flat_forest").FlatForest
 
 class YieldModel:
     def __init__(self):
@@ -25,9 +29,17 @@ class YieldModel:
         
     def save(self, path):
         joblib.dump(self.model, path)
+
+    def export_flat(self, path):
+        """Saves the flat-array form served by the backend (same predictions, no sklearn)."""
+        FlatForest.from_sklearn(self.model).save(path)
         
     @staticmethod
     def load(path):
+        """Loads a pickled pipeline, or a flat export (.npz, memory-mapped) for prediction only."""
         loaded = YieldModel()
-        loaded.model = joblib.load(path)
+        if path.endswith(".npz"):
+            loaded.model = FlatForest.load(path, mmap_mode="r")
+        else:
+            loaded.model = joblib.load(path)
         return loaded
@@ -0,0 +1,39 @@
+import numpy as np
+from src.backend_utils import load_backend_module
+
+# -------------------------------------------------------------------------
+# Preprocessing contract shared by training, the Streamlit app and the API.
+#
+# The contract core (scalings, default contract, reading and writing the
+# `<model name>.json` saved next to the model, pixel scaling) lives in
+# backend/app/utils/contract.py, the one copy the API image also ships.
+# Training-side helpers are added here.
+# -------------------------------------------------------------------------
+
+_contract = load_backend_module("contract")
+SCALINGS = _contract.SCALINGS
+DEFAULT_CONTRACT = _contract.DEFAULT_CONTRACT
+contract_path = _contract.contract_path
+save_contract = _contract.save_contract
+load_contract = _contract.load_contract
+scale_pixels = _contract.scale_pixels
+
+
+def preprocess_batch(images, contract=DEFAULT_CONTRACT):
+    """
+    Turns a list of uint8 (H, W, 3) images already resized to the contract's
+    input size, or an (N, H, W, 3) array, into the model's float32 input batch.
+    """
+    return scale_pixels(np.asarray(images), contract["scaling"])
+
+
+def decode_predictions(probabilities, contract=DEFAULT_CONTRACT):
+    """
+    Maps an (N, num_classes) probability batch to class names and confidences.
+    Returns: (list of class names, (N,) confidences)
+    """
+    probabilities = np.asarray(probabilities)
+    indices = np.argmax(probabilities, axis=1)
+    confidences = probabilities[np.arange(len(indices)), indices]
+    class_names = np.asarray(contract["class_names"])[indices].tolist()
+    return class_names, confidences
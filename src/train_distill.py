@@ -0,0 +1,211 @@
+import argparse
+import json
+import os
+import time
+import numpy as np
+import pandas as pd
+import tensorflow as tf
+from sklearn.model_selection import train_test_split
+from tensorflow.keras import layers
+from src.data_pipeline import make_dataset
+from src.model_vision import CompactLeafModel
+from src.preprocessing import load_contract, save_contract
+
+# -------------------------------------------------------------------------
+# Knowledge distillation of the leaf quality model into a compact student.
+#
+# The trained LeafQualityModel (the teacher) labels every training image
+# once with its class probabilities. A reduced-width MobileNetV2 at a lower
+# input size (the student) is then trained on a mix of the teacher's
+# temperature-softened probabilities and the ground-truth labels. The
+# student is saved with its own preprocessing contract, so MLService serves
+# it like the full model.
+# -------------------------------------------------------------------------
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Distill the leaf quality model into a compact student.")
+    parser.add_argument("--data-dir", default="data/synthetic_leaves")
+    parser.add_argument("--teacher", default="models/leaf_quality_model.h5")
+    parser.add_argument("--output", default="models/leaf_quality_student.h5")
+    parser.add_argument("--input-size", type=int, default=128, help="Student input height and width")
+    parser.add_argument("--alpha", type=float, default=0.35, help="Student MobileNetV2 width multiplier")
+    parser.add_argument("--student-weights", choices=["imagenet", "none"], default="imagenet",
+                        help="Initial student backbone weights")
+    parser.add_argument("--temperature", type=float, default=4.0, help="Softens teacher and student probabilities")
+    parser.add_argument("--hard-weight", type=float, default=0.1,
+                        help="Weight of the ground-truth loss; the rest is the distillation loss")
+    parser.add_argument("--epochs", type=int, default=10)
+    parser.add_argument("--batch-size", type=int, default=32)
+    parser.add_argument("--learning-rate", type=float, default=0.001)
+    parser.add_argument("--cache-dir", default="data/cache",
+                        help="Where tf.data caches decoded images between epochs and runs")
+    parser.add_argument("--no-cache-file", action="store_true", help="Cache decoded images in memory instead")
+    parser.add_argument("--repeats", type=int, default=20, help="Timed calls per latency measurement")
+    parser.add_argument("--report", default=None, help="Write the comparison report to this path")
+    return parser.parse_args(argv)
+
+def distillation_loss(num_classes, temperature=4.0, hard_weight=0.1):
+    """
+    Loss for targets packed as [one-hot labels, teacher probabilities]:
+    KL divergence between the temperature-softened teacher and student
+    distributions (scaled by T^2 so its gradients do not shrink with T),
+    plus `hard_weight` times the cross-entropy with the true labels.
+    """
+    def loss(y_true, y_pred):
+        hard, soft = y_true[:, :num_classes], y_true[:, num_classes:]
+        # The models output softmax probabilities; their logs are logits up to a constant
+        teacher_log = tf.nn.log_softmax(tf.math.log(tf.clip_by_value(soft, 1e-7, 1.0)) / temperature)
+        student_log = tf.nn.log_softmax(tf.math.log(tf.clip_by_value(y_pred, 1e-7, 1.0)) / temperature)
+        kl = tf.reduce_sum(tf.exp(teacher_log) * (teacher_log - student_log), axis=-1)
+        ce = tf.keras.losses.categorical_crossentropy(hard, y_pred)
+        return hard_weight * ce + (1 - hard_weight) * temperature ** 2 * kl
+    return loss
+
+def distillation_metrics(num_classes):
+    """Accuracy against the true labels and top-1 agreement with the teacher."""
+    def accuracy(y_true, y_pred):
+        return tf.cast(tf.equal(tf.argmax(y_true[:, :num_classes], -1), tf.argmax(y_pred, -1)), tf.float32)
+
+    def teacher_agreement(y_true, y_pred):
+        return tf.cast(tf.equal(tf.argmax(y_true[:, num_classes:], -1), tf.argmax(y_pred, -1)), tf.float32)
+
+    return [accuracy, teacher_agreement]
+
+def count_flops(model):
+    """
+    FLOPs of one forward pass for a single image: 2 x the multiply-adds of
+    the convolution and dense layers, which dominate a MobileNet. Nested
+    models (the backbone) are counted layer by layer.
+    """
+    macs = 0
+    for layer in model.layers:
+        if hasattr(layer, "layers"):
+            macs += count_flops(layer) // 2
+        elif isinstance(layer, layers.DepthwiseConv2D):
+            _, height, width, channels = layer.output.shape
+            macs += height * width * channels * int(np.prod(layer.kernel_size))
+        elif isinstance(layer, layers.Conv2D):
+            _, height, width, filters = layer.output.shape
+            in_channels = layer.input.shape[-1]
+            macs += height * width * filters * int(np.prod(layer.kernel_size)) * in_channels // layer.groups
+        elif isinstance(layer, layers.Dense):
+            macs += int(np.prod(layer.kernel.shape))
+    return 2 * macs
+
+def measure_latency(model, batch_size, repeats):
+    """Median milliseconds per model.predict call (as KerasBackend serves it) on a random batch."""
+    batch = np.random.default_rng(0).uniform(-1, 1, size=(batch_size,) + tuple(model.input_shape[1:]))
+    batch = batch.astype(np.float32)
+    model.predict(batch, verbose=0)
+    times = []
+    for _ in range(repeats):
+        started = time.perf_counter()
+        model.predict(batch, verbose=0)
+        times.append((time.perf_counter() - started) * 1000)
+    return round(float(np.median(times)), 3)
+
+def predict_split(model, df, args, class_names, input_size, scaling, split):
+    """Class probabilities for a frame's images, in frame order, without augmentation."""
+    dataset = make_dataset(
+        df, args.data_dir, class_names, input_size, scaling, args.batch_size,
+        training=False, cache_dir=None if args.no_cache_file else args.cache_dir, split=split,
+    )
+    return model.predict(dataset.map(lambda images, labels: images), verbose=0)
+
+def describe(model, path, probabilities, labels, batch_size, repeats):
+    return {
+        "input_size": list(model.input_shape[1:3]),
+        "params": int(model.count_params()),
+        "mflops": round(count_flops(model) / 1e6, 1),
+        "file_kb": round(os.path.getsize(path) / 1024, 1),
+        "accuracy": round(float(np.mean(np.argmax(probabilities, axis=1) == labels)), 4),
+        "latency_ms": {
+            "single": measure_latency(model, 1, repeats),
+            f"batch_{batch_size}": measure_latency(model, batch_size, repeats),
+        },
+    }
+
+def distill(argv=None):
+    args = parse_args(argv)
+    csv_path = os.path.join(args.data_dir, "labels.csv")
+    if not os.path.exists(csv_path):
+        print(f"Error: Data not found at {csv_path}. Run src/data_generator.py first.")
+        return None
+    if not os.path.exists(args.teacher):
+        print(f"Error: Teacher model not found at {args.teacher}. Run src/train_vision.py first.")
+        return None
+
+    # Same split as train_vision.py, so the student is validated on images the teacher never saw
+    df = pd.read_csv(csv_path)
+    train_df, val_df = train_test_split(df, test_size=0.2, stratify=df['quality'], random_state=42)
+
+    print(f"Loading teacher from {args.teacher}...")
+    teacher = tf.keras.models.load_model(args.teacher)
+    contract = load_contract(args.teacher)
+    class_names = contract["class_names"]
+    num_classes = len(class_names)
+    teacher_size, scaling = tuple(contract["input_size"]), contract["scaling"]
+    student_size = (args.input_size, args.input_size)
+
+    # The teacher runs once per image; augmentation only flips and rotates,
+    # so the soft targets of the original image stand for its augmented copies
+    print("Computing teacher soft targets...")
+    class_index = {name: i for i, name in enumerate(class_names)}
+    targets = {}
+    for split, frame in (("train", train_df), ("val", val_df)):
+        soft = predict_split(teacher, frame, args, class_names, teacher_size, scaling, split)
+        hard = np.eye(num_classes, dtype=np.float32)[[class_index[q] for q in frame["quality"]]]
+        targets[split] = np.concatenate([hard, soft], axis=1)
+
+    student = CompactLeafModel(
+        input_shape=student_size + (3,),
+        num_classes=num_classes,
+        weights=None if args.student_weights == "none" else "imagenet",
+        alpha=args.alpha,
+    ).model
+    student.compile(
+        optimizer=tf.keras.optimizers.Adam(learning_rate=args.learning_rate),
+        loss=distillation_loss(num_classes, args.temperature, args.hard_weight),
+        metrics=distillation_metrics(num_classes),
+    )
+
+    cache_dir = None if args.no_cache_file else args.cache_dir
+    common = dict(class_names=class_names, input_size=student_size, scaling=scaling,
+                  batch_size=args.batch_size, cache_dir=cache_dir)
+    train_ds = make_dataset(train_df, args.data_dir, training=True, split="train",
+                            targets=targets["train"], **common)
+    val_ds = make_dataset(val_df, args.data_dir, training=False, split="val",
+                          targets=targets["val"], **common)
+
+    print(f"Distilling into a {args.alpha}x MobileNetV2 at {student_size[0]}x{student_size[1]}...")
+    student.fit(train_ds, validation_data=val_ds, epochs=args.epochs)
+
+    os.makedirs(os.path.dirname(args.output) or ".", exist_ok=True)
+    # Without the training config: the distillation loss is not needed to serve
+    # and would stop a plain load_model() (KerasBackend) from loading the file
+    student.save(args.output, include_optimizer=False)
+    save_contract(args.output, class_names, input_size=student_size, scaling=scaling)
+    print(f"Student saved to {args.output} with its preprocessing contract")
+
+    labels = np.argmax(targets["val"][:, :num_classes], axis=1)
+    teacher_probs = targets["val"][:, num_classes:]
+    student_probs = predict_split(student, val_df, args, class_names, student_size, scaling, "val")
+    teacher_report = describe(teacher, args.teacher, teacher_probs, labels, args.batch_size, args.repeats)
+    student_report = describe(student, args.output, student_probs, labels, args.batch_size, args.repeats)
+    report = {
+        "val_images": int(len(val_df)),
+        "teacher": teacher_report,
+        "student": student_report,
+        "top1_agreement": round(float(np.mean(np.argmax(student_probs, 1) == np.argmax(teacher_probs, 1))), 4),
+        "accuracy_delta": round(student_report["accuracy"] - teacher_report["accuracy"], 4),
+        "flops_ratio": round(teacher_report["mflops"] / student_report["mflops"], 1),
+        "speedup_single": round(teacher_report["latency_ms"]["single"] / student_report["latency_ms"]["single"], 2),
+    }
+    print(json.dumps(report, indent=2))
+    if args.report:
+        with open(args.report, "w") as f:
+            json.dump(report, f, indent=2)
+    return report
+
+if __name__ == "__main__":
+    distill()
@@ -1,18 +1,138 @@
+import argparse
+import itertools
+import json
 import os
+import tempfile
 import pandas as pd
 import tensorflow as tf
 from sklearn.model_selection import train_test_split
 from tensorflow.keras.preprocessing.image import ImageDataGenerator
+from src.data_pipeline import make_dataset, measure_throughput
+from src.feature_cache import cached_features
 from src.model_vision import LeafQualityModel
+from src.preprocessing import DEFAULT_CONTRACT, save_contract, scale_pixels
 
-def train_model():
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Train the leaf quality model.")
+    parser.add_argument("--data-dir", default="data/synthetic_leaves")
+    parser.add_argument("--batch-size", type=int, default=32)
+    parser.add_argument("--epochs", type=int, default=1)
+    parser.add_argument("--pipeline", choices=["tfdata", "generator"], default="tfdata",
+                        help="tfdata (cached, parallel) or the legacy ImageDataGenerator")
+    parser.add_argument("--cache-dir", default="data/cache",
+                        help="Where tf.data caches decoded images between epochs and runs")
+    parser.add_argument("--no-cache-file", action="store_true", help="Cache decoded images in memory instead")
+    parser.add_argument("--feature-cache", action="store_true",
+                        help="Run the frozen backbone once per image and train only the head on cached "
+                             "embeddings (no augmentation)")
+    parser.add_argument("--feature-dtype", choices=["float16", "float32"], default="float16",
+                        help="Storage type of cached embeddings")
+    parser.add_argument("--benchmark-input", type=int, metavar="EPOCHS", default=None,
+                        help="Only measure input images/sec of both pipelines over EPOCHS epochs, then exit")
+    parser.add_argument("--output", default=None, help="Write the benchmark report to this path")
+    return parser.parse_args(argv)
+
+def make_generators(train_df, val_df, data_dir, input_size, batch_size, scaling):
+    """The original ImageDataGenerator input path, kept for comparison."""
+    datagen = ImageDataGenerator(
+        preprocessing_function=lambda img: scale_pixels(img, scaling),
+        rotation_range=20,
+        horizontal_flip=True
+    )
+    train_generator = datagen.flow_from_dataframe(
+        dataframe=train_df,
+        directory=data_dir,
+        x_col="filename",
+        y_col="quality",
+        target_size=input_size,
+        batch_size=batch_size,
+        class_mode="categorical",
+        shuffle=True
+    )
+    val_generator = datagen.flow_from_dataframe(
+        dataframe=val_df,
+        directory=data_dir,
+        x_col="filename",
+        y_col="quality",
+        target_size=input_size,
+        batch_size=batch_size,
+        class_mode="categorical",
+        shuffle=False
+    )
+    return train_generator, val_generator
+
+def make_datasets(train_df, val_df, args, class_names, input_size, scaling):
+    cache_dir = None if args.no_cache_file else args.cache_dir
+    common = dict(class_names=class_names, input_size=input_size, scaling=scaling,
+                  batch_size=args.batch_size, cache_dir=cache_dir)
+    train_ds = make_dataset(train_df, args.data_dir, training=True, split="train", **common)
+    val_ds = make_dataset(val_df, args.data_dir, training=False, split="val", **common)
+    return train_ds, val_ds
+
+def train_head_on_cached_features(lq_model, train_df, val_df, args, class_names, input_size, scaling):
+    """
+    Embeds each image with the frozen backbone once (cached under
+    <cache-dir>/features by file hash) and fits only the head layers on the
+    embeddings. The head is shared with lq_model.model, which is what gets saved.
+    """
+    extractor = lq_model.feature_extractor()
+    class_index = {name: i for i, name in enumerate(class_names)}
+    splits = {}
+    for split, frame in (("train", train_df), ("val", val_df)):
+        paths = [os.path.join(args.data_dir, name) for name in frame["filename"]]
+        features, embedded = cached_features(
+            extractor, paths, os.path.join(args.cache_dir, "features"), input_size, scaling,
+            dtype=args.feature_dtype, batch_size=args.batch_size,
+        )
+        print(f"{split}: {len(paths)} embeddings, {embedded} newly computed")
+        labels = tf.one_hot([class_index[q] for q in frame["quality"]], len(class_names))
+        splits[split] = (features, labels)
+
+    head = lq_model.head()
+    lq_model.compile(model=head)
+    print("Training head on cached features...")
+    head.fit(
+        *splits["train"],
+        validation_data=splits["val"],
+        epochs=args.epochs,
+        batch_size=args.batch_size,
+        shuffle=True
+    )
+
+def benchmark_input(train_df, val_df, args, class_names, input_size, scaling):
+    """Images/sec of the training input alone (no model), per epoch, for both pipelines."""
+    generator, _ = make_generators(train_df, val_df, args.data_dir, input_size, args.batch_size, scaling)
+    generator_rates = measure_throughput(lambda: itertools.islice(generator, len(generator)), args.benchmark_input)
+
+    # A fresh cache, so the first epoch includes decoding and writing it
+    with tempfile.TemporaryDirectory() as cache_dir:
+        dataset = make_dataset(train_df, args.data_dir, class_names, input_size, scaling,
+                               args.batch_size, training=True, cache_dir=cache_dir)
+        tfdata_rates = measure_throughput(dataset, args.benchmark_input)
+
+    warm = tfdata_rates[1:] or tfdata_rates
+    report = {
+        "images": len(train_df),
+        "batch_size": args.batch_size,
+        "cpu_count": os.cpu_count(),
+        "images_per_sec": {"generator": generator_rates, "tfdata": tfdata_rates},
+        # Later epochs read decoded images from the cache
+        "speedup_warm": round(min(warm) / max(generator_rates), 1),
+    }
+    print(json.dumps(report, indent=2))
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+    return report
+
+def train_model(argv=None):
+    args = parse_args(argv)
     try:
         # settings
-        DATA_DIR = "data/synthetic_leaves"
-        CSV_PATH = os.path.join(DATA_DIR, "labels.csv")
+        CSV_PATH = os.path.join(args.data_dir, "labels.csv")
         MODEL_SAVE_PATH = "models/leaf_quality_model.h5"
-        BATCH_SIZE = 4 # Reduced batch
-        EPOCHS = 1 # Reduced epochs for testing
+        input_size = tuple(DEFAULT_CONTRACT["input_size"])
+        scaling = DEFAULT_CONTRACT["scaling"]
         
         if not os.path.exists(CSV_PATH):
             print(f"Error: Data not found at {CSV_PATH}. Run src/data_generator.py first.")
@@ -23,51 +143,35 @@ def train_model():
         
         # Stratified split
         train_df, val_df = train_test_split(df, test_size=0.2, stratify=df['quality'], random_state=42)
-        
-        # Data Generators
-        datagen = ImageDataGenerator(
-            preprocessing_function=tf.keras.applications.mobilenet_v2.preprocess_input,
-            rotation_range=20,
-            horizontal_flip=True
-        )
-        
-        print("Preparing Data Generators...")
-        train_generator = datagen.flow_from_dataframe(
-            dataframe=train_df,
-            directory=DATA_DIR,
-            x_col="filename",
-            y_col="quality",
-            target_size=(224, 224),
-            batch_size=BATCH_SIZE,
-            class_mode="categorical",
-            shuffle=True
-        )
-        
-        val_generator = datagen.flow_from_dataframe(
-            dataframe=val_df,
-            directory=DATA_DIR,
-            x_col="filename",
-            y_col="quality",
-            target_size=(224, 224),
-            batch_size=BATCH_SIZE,
-            class_mode="categorical",
-            shuffle=False
-        )
-        
-        # Initialize Model
-        class_indices = train_generator.class_indices
-        print(f"Class mapping: {class_indices}")
-        
-        lq_model = LeafQualityModel(num_classes=len(class_indices))
-        lq_model.compile()
-        
-        # Train
-        print("Starting training...")
-        lq_model.model.fit(
-            train_generator,
-            validation_data=val_generator,
-            epochs=EPOCHS
-        )
+
+        # Alphabetical, the order flow_from_dataframe assigns
+        class_names = sorted(df['quality'].unique())
+
+        if args.benchmark_input:
+            benchmark_input(train_df, val_df, args, class_names, input_size, scaling)
+            return
+
+        print(f"Class mapping: {dict((name, i) for i, name in enumerate(class_names))}")
+        lq_model = LeafQualityModel(num_classes=len(class_names))
+
+        if args.feature_cache:
+            train_head_on_cached_features(lq_model, train_df, val_df, args, class_names, input_size, scaling)
+        else:
+            print(f"Preparing {args.pipeline} input pipeline...")
+            if args.pipeline == "generator":
+                train_data, val_data = make_generators(train_df, val_df, args.data_dir, input_size, args.batch_size, scaling)
+            else:
+                train_data, val_data = make_datasets(train_df, val_df, args, class_names, input_size, scaling)
+
+            lq_model.compile()
+
+            # Train
+            print("Starting training...")
+            lq_model.model.fit(
+                train_data,
+                validation_data=val_data,
+                epochs=args.epochs
+            )
         
         # Save
         if not os.path.exists("models"):
@@ -76,6 +180,10 @@ def train_model():
         lq_model.save(MODEL_SAVE_PATH)
         print(f"Model saved to {MODEL_SAVE_PATH}")
 
+        # Save the preprocessing contract (scaling + label order) with the model
+        save_contract(MODEL_SAVE_PATH, class_names, input_size=input_size, scaling=scaling)
+        print(f"Preprocessing contract saved with classes {class_names}")
+
     except Exception as e:
         import traceback
         traceback.print_exc()
@@ -7,6 +7,7 @@ from src.model_yield import YieldModel
 def train_yield_model():
     DATA_PATH = "data/cocoon_yield.csv"
     MODEL_SAVE_PATH = "models/yield_model.pkl"
+    FLAT_SAVE_PATH = "models/yield_model.npz"
     
     if not os.path.exists(DATA_PATH):
         print(f"Error: {DATA_PATH} not found.")
@@ -39,5 +40,8 @@ def train_yield_model():
     model.save(MODEL_SAVE_PATH)
     print(f"Yield model saved to {MODEL_SAVE_PATH}")
 
+    model.export_flat(FLAT_SAVE_PATH)
+    print(f"Flat yield model saved to {FLAT_SAVE_PATH}")
+
 if __name__ == "__main__":
     train_yield_model()